@@ -1,20 +1,70 @@
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.core.exceptions import ValidationError
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.db import transaction
-from django.db.models import Q
 from django.utils.html import format_html
 
-from .models import User, Course, Group, Lesson, Attendance, Payment
+from .models import User, Course, Group, Lesson, Attendance, Payment, AttendanceMonthly, RevenueMonthly, ArchivedLesson
 from .forms import GroupAdminForm, LessonAdminForm, CourseAdminForm
+from . import archive, membership, rollups, schedule
+from .matrix import CODES
+from .scope import get_scope
+from .search import search_queryset
+
+# главная страница: KPI (dashboard.py) над списком моделей jazzmin
+admin.site.index_template = "admin/dashboard_index.html"
+
+
+class IndexedSearchMixin:
+    """Поиск в списке и автодополнении через индексы (см. search.py)."""
+    search_documents = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        if not self.search_documents:
+            return super().get_search_results(request, queryset, search_term)
+        return search_queryset(queryset, search_term, self.search_documents), False
+
+
+class FastDeleteMixin:
+    """
+    Удаление через archive.py (DELETE пачками, без Collector) вместо каскада
+    Django; страница подтверждения показывает число связанных строк, а не
+    их полный список.
+    """
+    fast_delete = None  # staticmethod: (ids) -> Counter удалённых строк
+
+    def related_querysets(self, ids):
+        return []
+
+    def get_deleted_objects(self, objs, request):
+        ids = [obj.pk for obj in objs]
+        to_delete = [str(obj) for obj in objs]
+        model_count = {self.model._meta.verbose_name_plural: len(ids)}
+        perms_needed = set()
+        for queryset in self.related_querysets(ids):
+            opts = queryset.model._meta
+            count = queryset.count()
+            if not count:
+                continue
+            model_count[opts.verbose_name_plural] = count
+            model_admin = self.admin_site._registry.get(queryset.model)
+            if model_admin is not None and not model_admin.has_delete_permission(request):
+                perms_needed.add(opts.verbose_name)
+        return to_delete, model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.fast_delete([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        self.fast_delete(list(queryset.values_list("pk", flat=True)))
 
 
 # =========================
 # USER ADMIN
 # =========================
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(IndexedSearchMixin, BaseUserAdmin):
     model = User
     list_display = ("username", "full_name", "email", "phone", "role", "is_staff", "is_active", "date_joined")
     list_filter = ("role", "is_staff", "is_active", "date_joined")
@@ -23,13 +73,8 @@ class UserAdmin(BaseUserAdmin):
         qs = super().get_queryset(request)
 
         if request.user.role == "student":
-            groups = Group.objects.filter(students=request.user)
-            student_ids = User.objects.filter(student_groups__in=groups).values_list("id", flat=True)
-            teacher_ids = User.objects.filter(courses__groups__in=groups).values_list("id", flat=True)
-
-            return qs.filter(
-                Q(id=request.user.id) | Q(id__in=student_ids) | Q(id__in=teacher_ids)
-            ).distinct()
+            scope = get_scope(request)
+            return qs.filter(pk__in=sorted(scope.student_ids | scope.teacher_ids | {request.user.pk}))
 
         return qs
 
@@ -45,8 +90,16 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
     search_fields = ("id", "email", "full_name", "username", "phone")
+    actions = ["revoke_feed_tokens"]
+    search_documents = {"pk": "user"}
     ordering = ("id",)
 
+    @admin.action(description="Отозвать ссылки на календарные фиды", permissions=["change"])
+    def revoke_feed_tokens(self, request, queryset):
+        user_ids = list(queryset.values_list("pk", flat=True))
+        schedule.revoke_feed_tokens(user_ids)
+        self.message_user(request, f"Ссылки на фиды отозваны у пользователей: {len(user_ids)}.")
+
 
 # ==========================================
 # VALIDATION: student must belong to lesson's group
@@ -62,7 +115,7 @@ class AttendanceAdminForm(forms.ModelForm):
         student = cleaned.get("student")
 
         if lesson and student:
-            if not hasattr(lesson.group, "students") or not lesson.group.students.filter(pk=student.pk).exists():
+            if not membership.is_member(lesson.group_id, student.pk):
                 raise ValidationError("Этот ученик не состоит в группе, к которой относится урок.")
         return cleaned
 
@@ -71,21 +124,48 @@ class AttendanceAdminForm(forms.ModelForm):
 # GROUP ADMIN
 # =================
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(FastDeleteMixin, IndexedSearchMixin, admin.ModelAdmin):
     form = GroupAdminForm
-    filter_horizontal = ("students",)
+    autocomplete_fields = ("course", "students")
     list_display = ("display_name", "students_count")
     search_fields = ("name", "course__title")  # <-- ислоҳ шуд
+    search_documents = {"pk": "group", "course": "course"}
+    ordering = ("-pk",)  # как у списка по умолчанию; автодополнение листает страницами
     readonly_fields = ['show_lessons']
+    actions = ["archive_lessons"]
+    fast_delete = staticmethod(archive.fast_delete_groups)
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        if request.user.role == "teacher":
-            return qs.filter(course__teacher=request.user)
-        if request.user.role == "student":
-            return qs.filter(students=request.user)
+        if request.user.role in ("teacher", "student"):
+            return get_scope(request).groups(qs)
         return qs
 
+    def related_querysets(self, ids):
+        return [
+            Lesson.objects.filter(group_id__in=ids),
+            Attendance.objects.filter(lesson__group_id__in=ids),
+            Payment.objects.filter(group_id__in=ids),
+        ]
+
+    @admin.action(description="Перенести уроки и посещаемость в архив", permissions=["delete"])
+    def archive_lessons(self, request, queryset):
+        # только завершённые группы: у действующей уроки нужны для расчёта циклов оплаты
+        completed = archive.completed_groups(group_ids=queryset.values_list("pk", flat=True))
+        totals = {"lessons": 0, "attendance": 0}
+        for group_id in completed:
+            for key, value in archive.archive_group(group_id).items():
+                totals[key] += value
+        self.message_user(request, f"В архив перенесено уроков: {totals['lessons']}, отметок: {totals['attendance']}.")
+        skipped = queryset.exclude(pk__in=completed).order_by("name").values_list("name", flat=True)
+        if skipped:
+            self.message_user(
+                request,
+                f"Пропущены группы с уроками за последние {archive.ARCHIVE_AFTER_DAYS} дней "
+                f"или без уроков: {', '.join(skipped)}.",
+                messages.WARNING,
+            )
+
     def display_name(self, obj):
         return getattr(obj, "name", None) or str(obj)
     display_name.short_description = "Группа"
@@ -123,10 +203,14 @@ class GroupAdmin(admin.ModelAdmin):
 # COURSE ADMIN
 # =================
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(FastDeleteMixin, IndexedSearchMixin, admin.ModelAdmin):
     form = CourseAdminForm
     list_display = ("display_title", "get_teacher_name")
-    search_fields = ("title", "name", "description", "teacher__full_name")
+    search_fields = ("title", "description", "teacher__full_name")
+    search_documents = {"pk": "course", "teacher": "user"}
+    autocomplete_fields = ("teacher",)
+    ordering = ("-pk",)
+    fast_delete = staticmethod(archive.fast_delete_courses)
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -134,6 +218,14 @@ class CourseAdmin(admin.ModelAdmin):
             return qs.filter(teacher=request.user)
         return qs
 
+    def related_querysets(self, ids):
+        return [
+            Group.objects.filter(course_id__in=ids),
+            Lesson.objects.filter(group__course_id__in=ids),
+            Attendance.objects.filter(lesson__group__course_id__in=ids),
+            Payment.objects.filter(course_id__in=ids),
+        ]
+
     def display_title(self, obj):
         return getattr(obj, "title", None) or getattr(obj, "name", None) or str(obj)
     display_title.short_description = "Курс"
@@ -158,8 +250,8 @@ class AttendanceInline(admin.TabularInline):
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "student" and getattr(self, "parent_obj", None):
-            if hasattr(self.parent_obj.group, "students"):
-                kwargs["queryset"] = self.parent_obj.group.students.all()
+            if self.parent_obj.group_id:
+                kwargs["queryset"] = User.objects.filter(pk__in=membership.group_students(self.parent_obj.group_id))
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
@@ -171,12 +263,10 @@ def _ensure_attendance_for_lesson(lesson, *, default_status="present") -> int:
     Создаёт Attendance для всех студентов lesson.group, если отсутствуют.
     Возвращает количество созданных записей.
     """
-    if not getattr(lesson, "group_id", None) or not hasattr(lesson.group, "students"):
+    if not getattr(lesson, "group_id", None):
         return 0
 
-    student_ids = list(
-        lesson.group.students.only("id").values_list("id", flat=True)
-    )
+    student_ids = membership.group_students(lesson.group_id)
     if not student_ids:
         return 0
 
@@ -191,6 +281,7 @@ def _ensure_attendance_for_lesson(lesson, *, default_status="present") -> int:
     ]
     if to_create:
         Attendance.objects.bulk_create(to_create)
+        rollups.record_attendances(to_create)
     return len(to_create)
 
 
@@ -205,11 +296,15 @@ def create_for_all(modeladmin, request, queryset):
     modeladmin.message_user(request, f"Создано записей Attendance: {created_total}")
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(FastDeleteMixin, IndexedSearchMixin, admin.ModelAdmin):
     form = LessonAdminForm
     list_display = ('topic', 'date', 'teacher', 'group')
     search_fields = ['topic']
+    search_documents = {"pk": "lesson"}
+    autocomplete_fields = ("teacher", "group")
+    ordering = ("-pk",)
     actions = [create_for_all]
+    fast_delete = staticmethod(archive.fast_delete_lessons)
     # (по желанию) показать инлайн:
     # inlines = [AttendanceInline]
 
@@ -220,7 +315,7 @@ class LessonAdmin(admin.ModelAdmin):
             return qs.filter(teacher=request.user)
         
         if request.user.role == "student":
-            return qs.filter(group__students=request.user)
+            return get_scope(request).groups(qs, field="group_id")
 
         return qs
 
@@ -236,7 +331,7 @@ class LessonAdmin(admin.ModelAdmin):
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "group" and getattr(request.user, "role", None) == 'teacher':
-            kwargs["queryset"] = Group.objects.filter(course__teacher=request.user)
+            kwargs["queryset"] = get_scope(request).groups(Group.objects.all())
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     @transaction.atomic
@@ -262,7 +357,7 @@ class LessonAdmin(admin.ModelAdmin):
 # ATTENDANCE ADMIN
 # =================
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(IndexedSearchMixin, admin.ModelAdmin):
     form = AttendanceAdminForm
     list_editable = ('status',)
     list_display = (
@@ -279,6 +374,7 @@ class AttendanceAdmin(admin.ModelAdmin):
         "student__email",
         "lesson__topic",
     )
+    search_documents = {"student": "user", "lesson": "lesson"}
     autocomplete_fields = ("student", "lesson")
 
     list_filter = (
@@ -319,18 +415,13 @@ class AttendanceAdmin(admin.ModelAdmin):
                 kwargs["queryset"] = Lesson.objects.filter(teacher=request.user)
 
         if db_field.name == "student":
-            lesson_id = request.GET.get("lesson")
-            if lesson_id:
-                try:
-                    lesson = Lesson.objects.select_related("group").get(pk=lesson_id)
-                    if hasattr(lesson.group, "students"):
-                        kwargs["queryset"] = lesson.group.students.all()
-                    else:
-                        kwargs["queryset"] = User.objects.filter(role="student")
-                except Lesson.DoesNotExist:
-                    kwargs["queryset"] = User.objects.filter(role="student")
-            else:
-                kwargs["queryset"] = User.objects.filter(role="student")
+            # виджет автодополнения не выводит список, queryset нужен только для проверки значения
+            kwargs["queryset"] = User.objects.filter(role="student")
+            lesson_id = request.GET.get("lesson", "")
+            if lesson_id.isdigit():
+                group_id = Lesson.objects.filter(pk=lesson_id).values_list("group_id", flat=True).first()
+                if group_id:
+                    kwargs["queryset"] = kwargs["queryset"].filter(pk__in=membership.group_students(group_id))
 
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
     
@@ -346,6 +437,7 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ('group', 'course', 'is_paid')
     search_fields = ('student__full_name', 'group__name', 'course__title')
     search_help_text = "Поиск по имени студента, названию группы или курса"
+    autocomplete_fields = ('student', 'group', 'course')
     list_per_page = 20
     ordering = ('group__name', 'student__full_name')
 
@@ -384,3 +476,94 @@ class PaymentAdmin(admin.ModelAdmin):
 
     class Media:
         css = {'all': ('admin/css/payment_admin.css',)}
+
+
+# =========================
+# REPORTS (месячные сводки, см. rollups.py)
+# =========================
+class RollupAdmin(admin.ModelAdmin):
+    """Отчёт только для чтения: строки сводок, фильтры по месяцу и курсу."""
+    date_hierarchy = "month"
+    list_filter = ("month", "course")
+    list_select_related = ("group", "course")
+    ordering = ("-month", "group__name")
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser or request.user.role == "admin":
+            return qs
+        if request.user.role == "teacher":
+            return get_scope(request).groups(qs, field="group_id")
+        return qs.none()
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AttendanceMonthly)
+class AttendanceMonthlyAdmin(RollupAdmin):
+    list_display = ("month_label", "group", "course", "teacher", "present", "absent", "rate")
+    list_select_related = ("group", "course", "teacher")
+
+    @admin.display(description="Месяц", ordering="month")
+    def month_label(self, obj):
+        return f"{obj.month:%Y-%m}"
+
+    @admin.display(description="Посещаемость")
+    def rate(self, obj):
+        total = obj.present + obj.absent
+        return f"{obj.present / total:.0%}" if total else "—"
+
+
+@admin.register(RevenueMonthly)
+class RevenueMonthlyAdmin(RollupAdmin):
+    list_display = ("month_label", "group", "course", "payments", "paid_payments", "amount_due", "amount_paid", "debt")
+
+    @admin.display(description="Месяц", ordering="month")
+    def month_label(self, obj):
+        return f"{obj.month:%Y-%m}"
+
+    @admin.display(description="Долг")
+    def debt(self, obj):
+        return obj.amount_due - obj.amount_paid
+
+
+# =========================
+# ARCHIVE (уроки завершённых групп, см. archive.py)
+# =========================
+@admin.register(ArchivedLesson)
+class ArchivedLessonAdmin(admin.ModelAdmin):
+    list_display = ("topic", "date", "group", "teacher", "present", "absent", "archived_at")
+    list_filter = (("date", admin.DateFieldListFilter),)
+    list_select_related = ("group", "teacher")
+    search_fields = ("topic", "group__name")
+    ordering = ("group", "-date")  # по индексу group+date, в том числе для групп учителя
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser or request.user.role == "admin":
+            return qs
+        if request.user.role == "teacher":
+            return get_scope(request).groups(qs, field="group_id")
+        return qs.none()
+
+    @admin.display(description="Присутствовали")
+    def present(self, obj):
+        return sum(code == CODES["present"] for code in obj.attendance.values())
+
+    @admin.display(description="Отсутствовали")
+    def absent(self, obj):
+        return sum(code == CODES["absent"] for code in obj.attendance.values())
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
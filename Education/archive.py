@@ -0,0 +1,189 @@
+"""
+Архив завершённых групп и быстрое удаление групп и курсов.
+
+Архив: уроки группы вместе с посещаемостью переносятся в ArchivedLesson —
+одна строка на урок, отметки упакованы в JSON {student_id: код} — и
+удаляются из Lesson и Attendance. Перенос идёт пачками уроков
+(ARCHIVE_BATCH_SIZE), по транзакции на пачку, поэтому блокировки короткие,
+а прерванный архив можно просто запустить снова. Горячие таблицы, по которым работают
+выборки областей видимости, расписания и матрица, остаются небольшими.
+Месячные сводки (rollups.py) не меняются: отчёты за архивные месяцы
+остаются прежними, а rebuild() учитывает и архив.
+
+Быстрое удаление: Lesson, Attendance и Payment удаляются DELETE ... WHERE
+id IN (...) пачками, без загрузки строк в память и без сигналов каждой
+записи; после этого сама группа (курс) удаляется обычным delete(), которому
+остаётся только каскад по таблицам без сигналов (состав, сводки, архив) —
+тоже одной командой на таблицу. Уроки без группы (fast_delete_lessons)
+удаляются так же, их ячейки сводок пересчитываются. Кэши, которые сбросили
+бы пропущенные сигналы, сбрасываются здесь. Через эти функции удаляют и
+админка (FastDeleteMixin), и API, и команда fast_delete.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+ARCHIVE_AFTER_DAYS = getattr(settings, "ARCHIVE_AFTER_DAYS", 180)
+ARCHIVE_BATCH_SIZE = getattr(settings, "ARCHIVE_BATCH_SIZE", 500)
+FAST_DELETE_CHUNK_SIZE = getattr(settings, "FAST_DELETE_CHUNK_SIZE", 5_000)
+
+
+def _raw_delete(queryset):
+    # DELETE по условию queryset: без Collector, каскадов и сигналов
+    return queryset._raw_delete(queryset.db)
+
+
+def _invalidate(teacher_ids, group_ids):
+    from .dashboard import invalidate_kpis
+    from .schedule import invalidate_schedule
+
+    invalidate_schedule(teacher_ids=teacher_ids, group_ids=group_ids)
+    invalidate_kpis()
+
+
+# -----------------------
+# Архив
+# -----------------------
+def completed_groups(days=ARCHIVE_AFTER_DAYS, group_ids=None):
+    """id групп (из group_ids или всех), последний урок которых был больше days дней назад."""
+    from .models import Group
+
+    cutoff = timezone.localdate() - timedelta(days=days)
+    groups = Group.objects.all() if group_ids is None else Group.objects.filter(pk__in=list(group_ids))
+    return list(
+        groups.annotate(last_lesson=Max("lessons__date"))
+        .filter(last_lesson__lt=cutoff).order_by("pk").values_list("pk", flat=True)
+    )
+
+
+def _archive_batch(group_id, batch_size):
+    """Переносит в архив до batch_size уроков группы. Возвращает (уроков, отметок, id учителей)."""
+    from .matrix import CODES, MISSING
+    from .models import ArchivedLesson, Attendance, Lesson
+
+    with transaction.atomic():
+        lessons = list(
+            Lesson.objects.filter(group_id=group_id).order_by("pk")
+            .values_list("pk", "topic", "date", "teacher_id")[:batch_size]
+        )
+        if not lessons:
+            return 0, 0, set()
+        lesson_ids = [pk for pk, _, _, _ in lessons]
+        archived = {
+            pk: ArchivedLesson(id=pk, group_id=group_id, teacher_id=teacher_id, topic=topic, date=date)
+            for pk, topic, date, teacher_id in lessons
+        }
+        marks = Attendance.objects.filter(lesson_id__in=lesson_ids).values_list("lesson_id", "student_id", "status", "comment")
+        for lesson_id, student_id, status, comment in marks.iterator():
+            archived[lesson_id].attendance[str(student_id)] = CODES.get(status, MISSING)
+            if comment:
+                archived[lesson_id].comments[str(student_id)] = comment
+        # ignore_conflicts: урок мог попасть в архив при прерванном запуске
+        ArchivedLesson.objects.bulk_create(archived.values(), ignore_conflicts=True)
+        attendance = _raw_delete(Attendance.objects.filter(lesson_id__in=lesson_ids))
+        _raw_delete(Lesson.objects.filter(pk__in=lesson_ids))
+    return len(lessons), attendance, {teacher_id for _, _, _, teacher_id in lessons}
+
+
+def archive_group(group_id, batch_size=ARCHIVE_BATCH_SIZE, days=ARCHIVE_AFTER_DAYS):
+    """
+    Переносит все уроки завершённой группы с посещаемостью в архив.
+    Возвращает {"lessons": n, "attendance": m}; если у группы есть уроки
+    за последние days дней — ValueError, ничего не переносится.
+    """
+    from .models import Lesson
+
+    if Lesson.objects.filter(group_id=group_id, date__gte=timezone.localdate() - timedelta(days=days)).exists():
+        # уроки действующей группы нужны для расчёта циклов оплаты и расписания
+        raise ValueError(f"Группа {group_id} не завершена: есть уроки за последние {days} дней.")
+    totals, teacher_ids = Counter(), set()
+    while True:
+        lessons, attendance, teachers = _archive_batch(group_id, batch_size)
+        if not lessons:
+            break
+        totals.update(lessons=lessons, attendance=attendance)
+        teacher_ids |= teachers
+    _invalidate(teacher_ids, [group_id])
+    return {"lessons": totals["lessons"], "attendance": totals["attendance"]}
+
+
+# -----------------------
+# Быстрое удаление
+# -----------------------
+def _delete_in_chunks(queryset, chunk_size, before_delete=None):
+    """Удаляет строки queryset пачками по pk, каждая пачка — своя транзакция."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                return total
+            if before_delete is not None:
+                before_delete(ids)
+            total += _raw_delete(queryset.model.objects.filter(pk__in=ids))
+
+
+def fast_delete_lessons(lesson_ids, chunk_size=FAST_DELETE_CHUNK_SIZE):
+    """
+    Удаляет уроки с посещаемостью и пересчитывает их ячейки сводок.
+    Возвращает число удалённых строк по моделям.
+    """
+    from .models import Attendance, Lesson
+    from .rollups import month_of, rebuild_attendance
+
+    deleted = Counter()
+    lessons = Lesson.objects.filter(pk__in=sorted(set(lesson_ids)))
+    owners = set(lessons.order_by().values_list("teacher_id", "group_id", "date"))
+    if not owners:
+        return deleted
+
+    def delete_attendance(ids):
+        deleted["attendance"] += _raw_delete(Attendance.objects.filter(lesson_id__in=ids))
+
+    deleted["lessons"] += _delete_in_chunks(lessons, chunk_size, before_delete=delete_attendance)
+    rebuild_attendance({(group_id, month_of(day)) for _, group_id, day in owners})
+    _invalidate({teacher_id for teacher_id, _, _ in owners}, {group_id for _, group_id, _ in owners})
+    return deleted
+
+
+def fast_delete_groups(group_ids, chunk_size=FAST_DELETE_CHUNK_SIZE):
+    """
+    Удаляет группы со всеми уроками, посещаемостью и платежами.
+    Возвращает число удалённых строк по моделям.
+    """
+    from .models import Attendance, Group, Lesson, Payment
+
+    group_ids = sorted(set(group_ids))
+    deleted = Counter()
+    if not group_ids:
+        return deleted
+    lessons = Lesson.objects.filter(group_id__in=group_ids)
+    teacher_ids = set(lessons.order_by().values_list("teacher_id", flat=True).distinct())
+
+    def delete_attendance(lesson_ids):
+        deleted["attendance"] += _raw_delete(Attendance.objects.filter(lesson_id__in=lesson_ids))
+
+    deleted["lessons"] += _delete_in_chunks(lessons, chunk_size, before_delete=delete_attendance)
+    deleted["payments"] += _delete_in_chunks(Payment.objects.filter(group_id__in=group_ids), chunk_size)
+    with transaction.atomic():
+        # остаток каскада — таблицы без сигналов, по одной команде; сигналы самих групп — как обычно
+        deleted["groups"] += Group.objects.filter(pk__in=group_ids).delete()[1].get(Group._meta.label, 0)
+    _invalidate(teacher_ids, group_ids)
+    return deleted
+
+
+def fast_delete_courses(course_ids, chunk_size=FAST_DELETE_CHUNK_SIZE):
+    """Удаляет курсы с их группами (см. fast_delete_groups). Возвращает число удалённых строк по моделям."""
+    from .models import Course, Group, Payment
+
+    course_ids = sorted(set(course_ids))
+    deleted = fast_delete_groups(Group.objects.filter(course_id__in=course_ids).values_list("pk", flat=True), chunk_size)
+    # платежи по курсу, выставленные в группах других курсов
+    deleted["payments"] += _delete_in_chunks(Payment.objects.filter(course_id__in=course_ids), chunk_size)
+    with transaction.atomic():
+        deleted["courses"] += Course.objects.filter(pk__in=course_ids).delete()[1].get(Course._meta.label, 0)
+    return deleted
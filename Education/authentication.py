@@ -0,0 +1,103 @@
+"""
+JWT без загрузки пользователя на каждый запрос.
+
+В токен при выдаче и обновлении пишутся роль и флаги staff/superuser, и
+StatelessJWTAuthentication собирает из них экземпляр User без запроса к БД
+(остальные поля отложены и подгрузятся только при обращении). Активность и
+актуальность ролей проверяются по локальному кэшу процесса
+(JWT_USER_STATE_TTL секунд): после деактивации или смены роли старый токен
+перестаёт действовать без User-запроса на каждый вызов API.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+CLAIMS = ("role", "is_staff", "is_superuser")
+MAX_ENTRIES = 10_000
+
+
+def add_user_claims(token, user):
+    token["username"] = user.username
+    for claim in CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class UserStateCache:
+    """
+    is_active, роль и версия ссылок на фиды пользователя из БД, не старше
+    JWT_USER_STATE_TTL секунд (в памяти процесса).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        state = User.objects.filter(pk=user_id).values("is_active", "feed_token_version", *CLAIMS).first()
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                self._entries = {key: value for key, value in self._entries.items() if value[0] > now}
+            self._entries[user_id] = (now + getattr(settings, "JWT_USER_STATE_TTL", 30), state)
+        return state
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+user_states = UserStateCache()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or any(claim not in validated_token for claim in CLAIMS):
+            # токен выдан до появления claims — обычная загрузка пользователя
+            return super().get_user(validated_token)
+
+        user_id = User._meta.pk.to_python(user_id)  # в токене id хранится строкой
+        state = user_states.get(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if any(state[claim] != validated_token[claim] for claim in CLAIMS):
+            # роль поменялась после выдачи токена: верим БД, а не claims
+            return super().get_user(validated_token)
+
+        values = {"id": user_id, "is_active": True, **{claim: validated_token[claim] for claim in CLAIMS}}
+        if "username" in validated_token:
+            values["username"] = validated_token["username"]
+        # from_db ожидает значения в порядке полей модели
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return User.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        # новый access получает актуальные роль и флаги, а не копию из refresh
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if user is not None:
+            attrs = {**attrs, "refresh": str(add_user_claims(refresh, user))}
+        return super().validate(attrs)
@@ -0,0 +1,125 @@
+"""
+/api/batch/ — несколько запросов к API за один HTTP-вызов.
+
+Каждый подзапрос вызывает view напрямую (resolve по пути), минуя цепочку
+middleware, nginx и TLS; аутентификация внешнего запроса передаётся
+подзапросам как уже выполненная (force_authenticate), поэтому JWT
+разбирается один раз. Ответы DRF возвращаются как есть (response.data)
+и сериализуются один раз вместе с остальными.
+
+atomic: true — все подзапросы в одной транзакции: на первом ответе с
+ошибкой (4xx/5xx) выполнение останавливается и транзакция откатывается.
+Без atomic чтения до первой записи могут идти с реплики (см. db_router.py).
+"""
+import io
+import json
+from functools import partial
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.exception import convert_exception_to_response
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, get_resolver
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import db_router
+from .compression import SECRET_ROUTES
+
+BATCH_MAX_REQUESTS = getattr(settings, "BATCH_MAX_REQUESTS", 20)
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+API_PREFIX = "/api/"
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=METHODS, default="GET")
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith(API_PREFIX):
+            raise serializers.ValidationError(f"Путь должен начинаться с {API_PREFIX}")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False, max_length=BATCH_MAX_REQUESTS)
+    atomic = serializers.BooleanField(default=False)
+
+
+def _sub_request(request, item):
+    """WSGI-запрос для подзапроса: заголовки внешнего запроса + метод, путь и тело подзапроса."""
+    url = urlsplit(item["path"])
+    body = b"" if "body" not in item else json.dumps(item["body"]).encode()
+    environ = {
+        **request.META,
+        "REQUEST_METHOD": item["method"],
+        "PATH_INFO": url.path,
+        "QUERY_STRING": url.query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+    }
+    sub = WSGIRequest(environ)
+    if hasattr(request, "urlconf"):
+        sub.urlconf = request.urlconf
+    # аутентификация уже выполнена для внешнего запроса
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    if isinstance(response, Response):
+        return response.data
+    content = b"".join(response) if response.streaming else response.content
+    if response.get("Content-Type", "").startswith("application/json"):
+        return json.loads(content or b"null")
+    return content.decode(response.charset)
+
+
+class BatchView(APIView):
+    @extend_schema(request=BatchSerializer, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items, atomic = serializer.validated_data["requests"], serializer.validated_data["atomic"]
+
+        if atomic:
+            with transaction.atomic():
+                results = self.execute(request, items, stop_on_error=True)
+                committed = results[-1]["status"] < 400
+                if not committed:
+                    transaction.set_rollback(True)
+            return Response({"atomic": True, "committed": committed, "responses": results})
+
+        db_router.allow_replica(request._request)
+        return Response({"atomic": False, "responses": self.execute(request, items)})
+
+    def execute(self, request, items, stop_on_error=False):
+        resolver = get_resolver(getattr(request._request, "urlconf", None))
+        results = []
+        for item in items:
+            sub = _sub_request(request._request, item)
+            try:
+                match = resolver.resolve(sub.path_info)
+            except Resolver404:
+                results.append({"status": 404, "body": {"detail": "Not found."}})
+            else:
+                if getattr(match.func, "view_class", None) is BatchView:
+                    results.append({"status": 400, "body": {"detail": "Вложенный batch не поддерживается."}})
+                else:
+                    sub.resolver_match = match
+                    if match.url_name in SECRET_ROUTES:
+                        request._request.contains_secrets = True  # не сжимать ответ (compression.py)
+                    view = convert_exception_to_response(partial(match.func, *match.args, **match.kwargs))
+                    response = view(sub)
+                    results.append({"status": response.status_code, "body": _body(response)})
+            if stop_on_error and results[-1]["status"] >= 400:
+                break
+        return results
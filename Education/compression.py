@@ -0,0 +1,26 @@
+"""
+gzip для больших JSON-ответов API (списки посещаемости, уроков и т.п.).
+
+HTML админки не сжимаем: в нём CSRF-токен рядом с данными из запроса (BREACH).
+По той же причине не сжимаем JSON с секретами в теле: выдачу и обновление
+JWT и расписания со ссылкой на фид (подписанный токен), а также /api/batch/,
+если среди подзапросов был такой маршрут (batch ставит request.contains_secrets).
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+# маршруты, в теле ответа которых есть токены
+SECRET_ROUTES = {"token_obtain_pair", "token_refresh", "timetable-teacher", "timetable-group"}
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if not response.get("Content-Type", "").startswith("application/json"):
+            return response
+        match = getattr(request, "resolver_match", None)
+        if getattr(request, "contains_secrets", False) or (match and match.url_name in SECRET_ROUTES):
+            return response
+        # маленькие ответы сжимать дороже, чем передать как есть
+        if not response.streaming and len(response.content) < getattr(settings, "API_GZIP_MIN_BYTES", 1024):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,83 @@
+"""
+KPI на главной странице админки: активные студенты, группы, уроки сегодня,
+посещаемость за месяц и непогашенный долг.
+
+Значения считаются несколькими агрегирующими запросами (посещаемость и долг —
+по месячным сводкам rollups.py, а не по Attendance/Payment) и хранятся в
+кэше DASHBOARD_CACHE_TIMEOUT секунд. Изменения групп, уроков, состава групп
+и студентов (см. models.py) после COMMIT увеличивают версию в кэше — одна
+операция с кэшем на транзакцию; запись другой версии пересчитывается, но
+не чаще раза в DASHBOARD_REFRESH_INTERVAL секунд, поэтому поток изменений
+не превращается в пересчёт на каждый показ страницы. Отметки и платежи
+версию не меняют (их слишком много): посещаемость и долг обновляются по TTL.
+Время расчёта показывается на странице.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .db_router import primary
+from .metrics import record_cache
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 60)
+DASHBOARD_REFRESH_INTERVAL = getattr(settings, "DASHBOARD_REFRESH_INTERVAL", 5)
+CACHE_KEY = "dashboard:kpis"
+VERSION_KEY = "dashboard:version"
+
+
+def get_kpis():
+    """Словарь KPI для главной страницы админки (из кэша, если есть)."""
+    today = timezone.localdate()
+    cached = cache.get_many([CACHE_KEY, VERSION_KEY])
+    kpis, version = cached.get(CACHE_KEY), cached.get(VERSION_KEY, 0)
+    # «уроки сегодня» и «текущий месяц» устаревают с полуночью
+    hit = kpis is not None and kpis["today"] == today and not _outdated(kpis, version)
+    record_cache("dashboard", hit)
+    if not hit:
+        # с primary: отставшая реплика не должна попасть в кэш на весь TTL
+        with primary():
+            kpis = compute_kpis(today)
+        kpis["version"] = version  # версия до расчёта: изменение во время расчёта даст ещё один
+        cache.set(CACHE_KEY, kpis, DASHBOARD_CACHE_TIMEOUT)
+    return kpis
+
+
+def _outdated(kpis, version):
+    age = (timezone.now() - kpis["computed_at"]).total_seconds()
+    return kpis.get("version") != version and age >= DASHBOARD_REFRESH_INTERVAL
+
+
+def compute_kpis(today):
+    from .models import AttendanceMonthly, Group, Lesson, RevenueMonthly, Role, User
+    from .rollups import month_of
+
+    month = month_of(today)
+    attendance = AttendanceMonthly.objects.filter(month=month).aggregate(present=Sum("present"), absent=Sum("absent"))
+    present, absent = attendance["present"] or 0, attendance["absent"] or 0
+    debt = RevenueMonthly.objects.aggregate(debt=Sum(F("amount_due") - F("amount_paid")))["debt"] or 0
+    return {
+        "today": today,
+        "computed_at": timezone.now(),
+        "active_students": User.objects.filter(
+            role=Role.STUDENT, is_active=True, student_groups__isnull=False,
+        ).distinct().count(),
+        "groups": Group.objects.count(),
+        "lessons_today": Lesson.objects.filter(date=today).count(),
+        "attendance_month": month,
+        "attendance_rate": round(present / (present + absent), 4) if present + absent else None,
+        "debt": debt,
+    }
+
+
+def invalidate_kpis():
+    """Отмечает KPI устаревшими после COMMIT (пересчёт — при следующем показе, см. _outdated)."""
+    transaction.on_commit(_bump_version)
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # ключа ещё нет (или вытеснен)
+        cache.set(VERSION_KEY, 1, None)
@@ -0,0 +1,117 @@
+"""
+Чтение с реплик (settings.DATABASE_REPLICAS).
+
+Реплика выбирается только для безопасного HTTP-запроса (GET/HEAD/OPTIONS,
+см. ReplicaMiddleware) и только до первой записи: после неё запрос до конца
+читает с primary (read-your-writes). Всё остальное — записи, транзакции,
+manage.py, сигналы биллинга (on_primary) — идёт в default.
+
+После записи клиент ещё REPLICA_PIN_SECONDS читает с primary, чтобы
+следующий запрос не показал данные с отставшей реплики. Браузер (админка)
+получает для этого cookie. Клиенты API с JWT cookie не хранят: ответ на
+запрос с записью несёт заголовок X-Edora-Primary: <секунды>, и клиент
+присылает X-Edora-Primary: 1 в запросах этого окна (или всегда, если ему
+нужно читать только с primary).
+"""
+import random
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+PIN_COOKIE = "edora_primary"
+PIN_HEADER = "X-Edora-Primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# сессии — всегда с primary: выход из системы не должен «отставать» вместе с репликой
+PRIMARY_APPS = {"sessions"}
+
+# replica — алиас реплики текущего запроса (None — primary), wrote — в запросе была запись
+_state = Local()
+
+
+def get_replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+@contextmanager
+def primary():
+    """Все чтения внутри блока — с primary (расчёты, которые затем пишутся в БД)."""
+    _state.forced = getattr(_state, "forced", 0) + 1
+    try:
+        yield
+    finally:
+        _state.forced -= 1
+
+
+def is_pinned(request):
+    """Клиент недавно писал (cookie админки или заголовок API) — читаем с primary."""
+    return PIN_COOKIE in request.COOKIES or request.headers.get(PIN_HEADER, "0") not in ("", "0")
+
+
+def allow_replica(request):
+    """
+    Разрешает чтения с реплики до первой записи для запроса с небезопасным
+    методом, который сам состоит из чтений и записей (/api/batch/).
+    """
+    replicas = get_replicas()
+    if replicas and not is_pinned(request) and not getattr(_state, "wrote", False):
+        _state.replica = random.choice(replicas)
+
+
+def on_primary(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with primary():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, "replica", None)
+        if (
+            replica is None
+            or getattr(_state, "forced", 0)
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # закрепляем запрос за primary: дальше он должен видеть свою запись
+        _state.replica = None
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = get_replicas()
+        use_replica = replicas and request.method in SAFE_METHODS and not is_pinned(request)
+        _state.replica = random.choice(replicas) if use_replica else None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.replica = None
+            _state.wrote = False
+
+        if wrote and replicas:
+            seconds = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+            response.set_cookie(PIN_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax")
+            response[PIN_HEADER] = str(seconds)
+        return response
@@ -0,0 +1,111 @@
+"""
+Зачисление студентов в группы и перевод между группами.
+
+Состав меняется одним bulk-запросом (students.add/remove), а платежи за
+текущий цикл создаются для всех новых студентов сразу: одна выборка числа
+уроков, одна — уже существующих платежей и один bulk_create. Пропорция
+(оставшиеся уроки цикла / 12 от цены курса) считается один раз на группу.
+Тот же расчёт используется сигналами models.py, поэтому зачисление через
+сериализатор группы или админку даёт те же платежи.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+LESSONS_PER_CYCLE = 12
+
+
+def current_cycle(total_lessons, price):
+    """(номер текущего цикла, сумма за него для нового студента) по числу проведённых уроков."""
+    cycle_index = total_lessons // LESSONS_PER_CYCLE + 1
+    lessons_in_cycle = total_lessons % LESSONS_PER_CYCLE
+    if lessons_in_cycle == 0:
+        return cycle_index, price
+    remaining = LESSONS_PER_CYCLE - lessons_in_cycle
+    return cycle_index, round((Decimal(remaining) / Decimal(LESSONS_PER_CYCLE)) * price, 2)
+
+
+def create_cycle_payments(group, student_ids, cycle_index, amount_due):
+    """Неоплаченные платежи за цикл для студентов, у которых их ещё нет. Возвращает число созданных."""
+    from .models import Payment
+    from .rollups import record_payments
+
+    student_ids = set(student_ids)
+    if not student_ids or group.course_id is None:
+        return 0
+    existing = set(
+        Payment.objects.filter(group=group, cycle_index=cycle_index, student_id__in=student_ids)
+        .order_by().values_list("student_id", flat=True)
+    )
+    payments = [
+        Payment(student_id=student_id, group=group, course_id=group.course_id,
+                cycle_index=cycle_index, amount_due=amount_due, is_paid=False)
+        for student_id in sorted(student_ids - existing)
+    ]
+    Payment.objects.bulk_create(payments)
+    record_payments(payments)  # bulk_create не вызывает сигналы сводок
+    return len(payments)
+
+
+def create_enrollment_payments(group, student_ids):
+    """Платежи за текущий цикл (с пропорцией) для студентов, только что зачисленных в группу."""
+    course = group.course
+    if course is None:
+        return 0
+    cycle_index, amount_due = current_cycle(group.lessons.count(), course.price)
+    return create_cycle_payments(group, student_ids, cycle_index, amount_due)
+
+
+# -----------------------
+# Операции
+# -----------------------
+def _student_ids(ids):
+    from .models import Role, User
+
+    ids = set(ids)
+    found = set(User.objects.filter(pk__in=ids, role=Role.STUDENT).values_list("pk", flat=True))
+    return found, sorted(ids - found)
+
+
+def _member_ids(group, ids):
+    return set(group.students.through.objects.filter(group=group, user_id__in=ids).values_list("user_id", flat=True))
+
+
+def enroll(group, add=(), remove=()):
+    """
+    Зачисляет студентов add и отчисляет remove одной транзакцией.
+
+    Возвращает {"added": [...], "removed": [...], "invalid": [...]}; invalid —
+    id, которые не принадлежат студентам (тогда ничего не меняется).
+    """
+    with transaction.atomic():
+        students, invalid = _student_ids(add)
+        if invalid:
+            return {"added": [], "removed": [], "invalid": invalid}
+        new_ids = sorted(students - _member_ids(group, students))
+        removed_ids = sorted(_member_ids(group, set(remove) - students))
+        if removed_ids:
+            group.students.remove(*removed_ids)
+        if new_ids:
+            group.students.add(*new_ids)  # платежи создаёт сигнал (create_enrollment_payments)
+    return {"added": new_ids, "removed": removed_ids, "invalid": []}
+
+
+def transfer(source, target, student_ids):
+    """
+    Переводит студентов из source в target одной транзакцией.
+
+    Платежи source остаются как есть (история оплат); в target создаются
+    платежи за текущий цикл с пропорцией. Возвращает {"moved": [...],
+    "not_members": [...]} — id, которых не было в source (тогда ничего не меняется).
+    """
+    with transaction.atomic():
+        student_ids = set(student_ids)
+        members = _member_ids(source, student_ids)
+        not_members = sorted(student_ids - members)
+        if not_members:
+            return {"moved": [], "not_members": not_members}
+        moved = sorted(members)
+        source.students.remove(*moved)
+        target.students.add(*sorted(members - _member_ids(target, members)))
+    return {"moved": moved, "not_members": []}
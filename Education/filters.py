@@ -0,0 +1,29 @@
+from rest_framework.filters import SearchFilter
+
+from .search import search_queryset
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    ?search= через индексированный поиск (см. search.py).
+    Вьюха задаёт search_documents; без него работает обычный SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        documents = getattr(view, "search_documents", None)
+        if not documents:
+            return super().filter_queryset(request, queryset, view)
+        return search_queryset(queryset, " ".join(self.get_search_terms(request)), documents)
+
+    def get_schema_operation_parameters(self, view):
+        if not getattr(view, "search_documents", None):
+            return super().get_schema_operation_parameters(view)
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": str(self.search_description),
+                "schema": {"type": "string"},
+            },
+        ]
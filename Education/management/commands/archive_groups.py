@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Education import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит уроки и посещаемость завершённых групп (последний урок старше --days дней; "
+        "с --group — только из указанных) в архив ArchivedLesson пачками по --batch-size уроков."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=archive.ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--group", type=int, action="append", dest="groups", help="id группы (можно несколько раз).")
+        parser.add_argument("--batch-size", type=int, default=archive.ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, какие группы попадут в архив.")
+
+    def handle(self, *args, **options):
+        group_ids = archive.completed_groups(options["days"], group_ids=options["groups"])
+        skipped = sorted(set(options["groups"] or ()) - set(group_ids))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Пропущены незавершённые группы (уроки за последние {options['days']} дней "
+                f"или нет уроков): {skipped}"
+            ))
+        if options["dry_run"]:
+            self.stdout.write(f"Групп к архивации: {len(group_ids)}: {group_ids}")
+            return
+
+        started = time.perf_counter()
+        totals = {"lessons": 0, "attendance": 0}
+        for group_id in group_ids:
+            result = archive.archive_group(group_id, batch_size=options["batch_size"], days=options["days"])
+            for key, value in result.items():
+                totals[key] += value
+            self.stdout.write(f"  группа {group_id}: {result}")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {elapsed:.1f} с: {len(group_ids)} групп, {totals['lessons']} уроков, "
+            f"{totals['attendance']} отметок посещаемости."
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Education import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает месячные сводки посещаемости и выручки (AttendanceMonthly, "
+        "RevenueMonthly) из Attendance и Payment одним агрегирующим запросом на таблицу. "
+        "Нужен после первого деплоя сводок и после массовой загрузки в обход сигналов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        attendance, revenue = rollups.rebuild(batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {elapsed:.1f} с: {attendance} строк посещаемости, {revenue} строк выручки."
+        ))
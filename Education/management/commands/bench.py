@@ -0,0 +1,257 @@
+import json
+import logging
+import statistics
+import subprocess
+import time
+import warnings
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Education.authentication import add_user_claims
+from Education.models import Course, Group, Lesson, Role, User
+
+ROLES = ("admin", "teacher", "student")
+
+
+def _user_payload(n, ctx):
+    return {
+        "username": f"bench_user_{n}", "full_name": f"Bench User {n}", "email": f"bench_{n}@example.com",
+        "role": Role.STUDENT, "password": "bench-password",
+    }
+
+
+def _group_payload(n, ctx):
+    return {"name": f"Bench group {n}", "course": ctx["course"].pk, "students": ctx["student_ids"]}
+
+
+def _course_payload(n, ctx):
+    return {"title": f"Bench course {n}", "description": "bench", "teacher": ctx["teacher"].pk}
+
+
+def _lesson_payload(n, ctx):
+    return {
+        "topic": f"Bench lesson {n}", "date": date.today().isoformat(),
+        "teacher": ctx["teacher"].pk, "group": ctx["group"].pk,
+    }
+
+
+# basename роутера -> (данные для create, данные для partial_update)
+# AttendanceSerializer не принимает student/lesson, поэтому create для посещаемости не меряем
+WRITE_PAYLOADS = {
+    "user": (_user_payload, {"full_name": "Bench Updated"}),
+    "group": (_group_payload, {"name": "Bench Updated"}),
+    "course": (_course_payload, {"title": "Bench Updated"}),
+    "lesson": (_lesson_payload, {"topic": "Bench Updated"}),
+    "attendance": (None, {"status": "absent"}),
+}
+
+
+class RowCounter:
+    """execute_wrapper: считает строки, прочитанные SELECT-ами (по cursor.rowcount)."""
+
+    def __init__(self):
+        self.rows = 0
+        self.supported = connection.vendor != "sqlite"  # sqlite3 не сообщает rowcount для SELECT
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if self.supported and sql.lstrip().upper().startswith("SELECT"):
+            self.rows += max(context["cursor"].rowcount, 0)
+        return result
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет все эндпоинты роутера (list/retrieve/create/update) для каждой роли через "
+        "тестовый клиент и пишет JSON-отчёт: p50/p95, число запросов и прочитанных строк. "
+        "Записи откатываются. Данные — см. seed_bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--output", default="bench_report.json")
+        parser.add_argument("--compare", help="Предыдущий отчёт: вывести разницу и регрессии.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Рост p95 больше этой доли считается регрессией (по умолчанию 20%%).")
+        parser.add_argument("--only", action="append", help="Ограничить basename роутера (можно несколько).")
+        for role in ROLES:
+            parser.add_argument(f"--{role}", help=f"username пользователя с ролью {role}.")
+
+    def handle(self, *args, **options):
+        from base.urls_api import router
+
+        setup_test_environment()  # ALLOWED_HOSTS += testserver
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        warnings.filterwarnings("ignore", category=UnorderedObjectListWarning)
+
+        users = {role: self._pick_user(role, options[role]) for role in ROLES}
+        ctx = self._write_context(users)
+        results = {}
+
+        with transaction.atomic():
+            for prefix, viewset, basename in router.registry:
+                if options["only"] and basename not in options["only"]:
+                    continue
+                for role, user in users.items():
+                    client = APIClient()
+                    # токен с claims, как выдаёт /api/auth/token/: меряем путь без запроса пользователя
+                    token = add_user_claims(AccessToken.for_user(user), user)
+                    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+                    pk = self._visible_pk(viewset, user)
+                    cases = [("list", "get", reverse(f"{basename}-list"), None)]
+                    if pk is not None:
+                        cases.append(("retrieve", "get", reverse(f"{basename}-detail", args=[pk]), None))
+                    create, update = WRITE_PAYLOADS.get(basename, (None, None))
+                    if create:
+                        cases.append(("create", "post", reverse(f"{basename}-list"), create))
+                    if update and pk is not None:
+                        cases.append(("update", "patch", reverse(f"{basename}-detail", args=[pk]), update))
+
+                    for action, method, url, payload in cases:
+                        key = f"{basename}.{action}.{role}"
+                        results[key] = self._run_case(client, method, url, payload, ctx, options["repeat"])
+                        self.stdout.write(self._format_row(key, results[key]))
+            transaction.set_rollback(True)
+
+        report = {"meta": self._meta(options, users), "results": results}
+        with open(options["output"], "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Отчёт: {options['output']}"))
+
+        if options["compare"]:
+            self._compare(options["compare"], results, options["threshold"])
+
+    # -----------------------
+    # Подготовка
+    # -----------------------
+    def _pick_user(self, role, username):
+        if username:
+            return User.objects.get(username=username)
+        if role == "admin":
+            user = User.objects.filter(role=Role.ADMIN, is_active=True).order_by("pk").first()
+        elif role == "teacher":
+            user = User.objects.filter(role=Role.TEACHER, courses__groups__isnull=False).order_by("pk").first()
+        else:
+            user = User.objects.filter(role=Role.STUDENT, student_groups__isnull=False).order_by("pk").first()
+        if user is None:
+            raise CommandError(f"Нет пользователя с ролью {role} — запустите seed_bulk или укажите --{role}.")
+        return user
+
+    def _write_context(self, users):
+        teacher = users["teacher"]
+        group = Group.objects.filter(course__teacher=teacher).order_by("pk").first()
+        if group is None:
+            raise CommandError(f"У учителя {teacher.username} нет групп — запустите seed_bulk или укажите другого --teacher.")
+        return {
+            "teacher": teacher,
+            "course": group.course,
+            "group": group,
+            "student_ids": list(
+                User.objects.filter(role=Role.STUDENT).order_by("pk").values_list("pk", flat=True)[:2]
+            ),
+            "counter": 0,
+        }
+
+    def _visible_pk(self, viewset, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        view = viewset(request=request, action="list", format_kwarg=None)
+        return view.get_queryset().order_by("pk").values_list("pk", flat=True).first()
+
+    # -----------------------
+    # Замеры
+    # -----------------------
+    def _run_case(self, client, method, url, payload, ctx, repeat):
+        timings, queries, rows, statuses = [], [], [], {}
+        for i in range(repeat + 1):  # первый прогон — прогрев, не учитывается
+            data = payload
+            if callable(payload):
+                ctx["counter"] += 1
+                data = payload(ctx["counter"], ctx)
+            counter = RowCounter()
+            with CaptureQueriesContext(connection) as captured, connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        response = getattr(client, method)(url, data, format="json")
+                    status = str(response.status_code)
+                except Exception as exc:  # ошибка во вьюхе тоже результат замера
+                    status = f"error: {type(exc).__name__}"
+                elapsed = (time.perf_counter() - started) * 1000
+            if i == 0:
+                continue
+            timings.append(elapsed)
+            queries.append(len(captured))
+            rows.append(counter.rows)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        return {
+            "url": url,
+            "method": method.upper(),
+            "status": statuses,
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(_percentile(timings, 95), 2),
+            "queries": statistics.median(queries),
+            "rows": statistics.median(rows) if counter.supported else None,
+        }
+
+    def _format_row(self, key, result):
+        rows = "-" if result["rows"] is None else result["rows"]
+        statuses = ",".join(sorted(result["status"]))
+        return (
+            f"{key:<32} {statuses:<10} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+            f"queries {result['queries']:>5}  rows {rows}"
+        )
+
+    def _meta(self, options, users):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "users": {role: user.username for role, user in users.items()},
+            "volumes": {
+                "users": User.objects.count(),
+                "courses": Course.objects.count(),
+                "groups": Group.objects.count(),
+                "lessons": Lesson.objects.count(),
+            },
+        }
+
+    def _compare(self, path, results, threshold):
+        with open(path, encoding="utf-8") as fh:
+            previous = json.load(fh)["results"]
+        regressions = []
+        for key in sorted(set(previous) & set(results)):
+            old, new = previous[key], results[key]
+            query_delta = new["queries"] - old["queries"]
+            p95_ratio = new["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0
+            if query_delta > 0 or p95_ratio > threshold:
+                regressions.append(key)
+            self.stdout.write(
+                f"{key:<32} p95 {old['p95_ms']:8.2f} -> {new['p95_ms']:8.2f} ms ({p95_ratio:+.0%})  "
+                f"queries {old['queries']} -> {new['queries']}"
+            )
+        if regressions:
+            raise CommandError(f"Регрессии: {', '.join(regressions)}")
+        else:
+            self.stdout.write(self.style.SUCCESS("Регрессий нет."))
@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from Education.models import User
+
+from .bench import _percentile
+
+# режим -> (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+MODES = {
+    "new connection per request": (0, False),
+    "persistent": (600, False),
+    "persistent + health check": (600, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Оценивает накладные расходы на соединение с БД в расчёте на запрос: имитирует "
+        "жизненный цикл запроса (request_started -> маленький SELECT -> request_finished) "
+        "без переиспользования соединений, с CONN_MAX_AGE и с проверкой живости."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        original = {key: connection.settings_dict[key] for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection.alias == options["database"]:
+                opened.append(connection.alias)
+
+        connection_created.connect(count)
+        self.stdout.write(
+            f"{connection.vendor} ({connection.settings_dict.get('HOST') or connection.settings_dict['NAME']}), "
+            f"{options['requests']} запросов на режим"
+        )
+        results = {}
+        try:
+            if connection.settings_dict.get("OPTIONS", {}).get("pool"):
+                results["psycopg pool (as configured)"] = self._run(connection, options["requests"], opened)
+            else:
+                for mode, (max_age, health_checks) in MODES.items():
+                    connection.close()
+                    connection.settings_dict["CONN_MAX_AGE"] = max_age
+                    connection.settings_dict["CONN_HEALTH_CHECKS"] = health_checks
+                    results[mode] = self._run(connection, options["requests"], opened)
+        finally:
+            connection_created.disconnect(count)
+            connection.close()
+            connection.settings_dict.update(original)
+
+        baseline = next(iter(results.values()))["p50_ms"]
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<30} p50 {result['p50_ms']:7.3f} ms  p95 {result['p95_ms']:7.3f} ms  "
+                f"новых соединений {result['connections']:>5}  ({result['p50_ms'] - baseline:+.3f} ms к первому)"
+            )
+
+    def _run(self, connection, requests, opened):
+        user_pk = User.objects.using(connection.alias).values_list("pk", flat=True).first()
+        opened.clear()
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            # как WSGIHandler: close_old_connections() до и после запроса
+            request_started.send(sender=self.__class__)
+            User.objects.using(connection.alias).filter(pk=user_pk).exists()
+            request_finished.send(sender=self.__class__)
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            "p50_ms": statistics.median(timings),
+            "p95_ms": _percentile(timings, 95),
+            "connections": len(opened),
+        }
@@ -0,0 +1,74 @@
+import logging
+import time
+import warnings
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import UnorderedObjectListWarning
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Education.authentication import add_user_claims
+from Education.models import Role, User
+from Education.sparse import SparseFieldsMixin
+
+# эндпоинт -> набор полей, который обычно нужен клиенту
+ENDPOINTS = {
+    "/api/attendances/": "id,status",
+    "/api/users/": "id,full_name,role",
+    "/api/lessons/": "id,topic,date",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность одного воркера (запросов/с) на списках: обычный "
+        "ModelSerializer, list через .values() и ?fields= с двумя-тремя полями."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=3.0, help="Длительность замера одного режима.")
+        parser.add_argument("--user", help="username (по умолчанию первый администратор).")
+
+    def handle(self, *args, **options):
+        setup_test_environment()  # ALLOWED_HOSTS += testserver
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        warnings.filterwarnings("ignore", category=UnorderedObjectListWarning)
+
+        if options["user"]:
+            user = User.objects.get(username=options["user"])
+        else:
+            user = User.objects.filter(role=Role.ADMIN, is_active=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("Нет администратора — запустите seed_bulk или укажите --user.")
+        client = APIClient()
+        token = add_user_claims(AccessToken.for_user(user), user)  # как выдаёт /api/auth/token/
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        for url, fields in ENDPOINTS.items():
+            modes = {
+                "serializer": (url, True),
+                ".values()": (url, False),
+                f"?fields={fields}": (f"{url}?fields={fields}", False),
+            }
+            baseline = None
+            for mode, (target, use_serializer) in modes.items():
+                if use_serializer:
+                    with mock.patch.object(SparseFieldsMixin, "get_values_plan", return_value=None):
+                        rate = self._measure(client, target, options["seconds"])
+                else:
+                    rate = self._measure(client, target, options["seconds"])
+                baseline = baseline or rate
+                self.stdout.write(f"{url:<20} {mode:<28} {rate:8.1f} запр/с  (x{rate / baseline:.2f})")
+
+    def _measure(self, client, url, seconds):
+        response = client.get(url)  # прогрев
+        if response.status_code != 200:
+            raise CommandError(f"{url}: HTTP {response.status_code}")
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            client.get(url)
+            count += 1
+        return count / (time.perf_counter() - started)
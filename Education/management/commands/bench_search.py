@@ -0,0 +1,74 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from Education.models import Role, User
+from Education.search import SEARCH_DOCUMENTS, search_queryset
+
+FIRST_NAMES = ["Алишер", "Иван", "Мария", "Дильноза", "Фарход", "Анна", "Умар", "Сабина", "Олег", "Нигора"]
+LAST_NAMES = ["Каримов", "Петров", "Иванова", "Юсупова", "Рахимов", "Смирнова", "Назаров", "Ахмедова"]
+DEFAULT_TERMS = ["Каримов", "user_4242", "иванова", "@example.com", "998901"]
+
+
+class Command(BaseCommand):
+    help = "Сравнивает icontains и индексированный поиск пользователей на N синтетических записях."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--term", action="append", dest="terms")
+        parser.add_argument("--keep", action="store_true", help="Не откатывать созданных пользователей.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._create_users(options["users"], options["seed"])
+            for term in options["terms"] or DEFAULT_TERMS:
+                naive = self._measure(lambda: self._naive(term), options["repeat"])
+                indexed = self._measure(
+                    lambda: search_queryset(User.objects.all(), term, {"pk": "user"}), options["repeat"]
+                )
+                self.stdout.write(
+                    f"{term!r:>18}: icontains {naive[0]:8.2f} ms ({naive[1]} rows) | "
+                    f"indexed {indexed[0]:8.2f} ms ({indexed[1]} rows)"
+                )
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def _create_users(self, count, seed):
+        rng = random.Random(seed)
+        offset = User.objects.count()
+        batch = []
+        for i in range(offset, offset + count):
+            batch.append(User(
+                username=f"user_{i}",
+                password="!",
+                full_name=f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+                email=f"user_{i}@example.com",
+                phone=f"99890{rng.randint(1000000, 9999999)}",
+                role=Role.STUDENT,
+            ))
+            if len(batch) == 5000:
+                User.objects.bulk_create(batch)
+                batch = []
+        User.objects.bulk_create(batch)
+
+    def _naive(self, term):
+        condition = Q()
+        for field in SEARCH_DOCUMENTS["user"].fields:
+            condition |= Q(**{f"{field}__icontains": term})
+        return User.objects.filter(condition).order_by("pk")
+
+    def _measure(self, make_queryset, repeat):
+        timings, rows = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = make_queryset()
+            rows = queryset.count()
+            list(queryset[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), rows
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Education.openapi import build_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует OpenAPI-схему (YAML и JSON) в OPENAPI_SCHEMA_DIR. Запускается при сборке "
+        "образа; вне DEBUG /api/schema/ отдаёт эти файлы, а не строит схему на каждый запрос."
+    )
+
+    def handle(self, *args, **options):
+        for path in build_schema():
+            self.stdout.write(self.style.SUCCESS(f"Схема: {path}"))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Education import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет группы (--group) и/или курсы (--course) со всеми уроками, посещаемостью и "
+        "платежами: DELETE пачками по --chunk-size строк, без загрузки записей в память."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", type=int, action="append", dest="groups", default=[])
+        parser.add_argument("--course", type=int, action="append", dest="courses", default=[])
+        parser.add_argument("--chunk-size", type=int, default=archive.FAST_DELETE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if not options["groups"] and not options["courses"]:
+            raise CommandError("Укажите хотя бы один --group или --course.")
+
+        started = time.perf_counter()
+        deleted = archive.fast_delete_groups(options["groups"], options["chunk_size"])
+        deleted.update(archive.fast_delete_courses(options["courses"], options["chunk_size"]))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Готово за {elapsed:.1f} с: удалено {dict(deleted)}."))
@@ -0,0 +1,154 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Education.authentication import add_user_claims
+from Education.models import Role, User
+
+from .bench import _percentile
+
+DEFAULT_URLS = ["/api/lessons/", "/api/users/", "/api/groups/", "/api/courses/"]
+
+
+def _pss_mb(pid):
+    """Сумма PSS мастера и воркеров (Linux): общие после fork страницы делятся между процессами."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as fh:
+            pids = [pid] + [int(child) for child in fh.read().split()]
+        total_kb = 0
+        for process in pids:
+            with open(f"/proc/{process}/smaps_rollup") as fh:
+                total_kb += next(int(line.split()[1]) for line in fh if line.startswith("Pss:"))
+    except (OSError, StopIteration):
+        return None
+    return total_kb / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест моделей воркеров gunicorn.conf.py: для каждой модели поднимает "
+        "gunicorn на локальном порту и гоняет GET-запросы к API из --concurrency потоков "
+        "(keep-alive, JWT). Выводит запросов/с, p50/p95, ошибки и память процессов. "
+        "Без preload: GUNICORN_PRELOAD=False. uvicorn выполняет синхронные view по одному "
+        "на воркер (sync_to_async thread_sensitive), поэтому сравнивать его стоит с sync, а не с gthread."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("models", nargs="*", default=["sync", "gthread", "uvicorn"])
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--seconds", type=float, default=10.0)
+        parser.add_argument("--url", action="append", dest="urls", help="Путь (можно несколько).")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--user", help="username (по умолчанию первый администратор).")
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            user = User.objects.get(username=options["user"])
+        else:
+            user = User.objects.filter(role=Role.ADMIN, is_active=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("Нет администратора — запустите seed_bulk или укажите --user.")
+        token = add_user_claims(AccessToken.for_user(user), user)  # как выдаёт /api/auth/token/
+        headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+        urls = options["urls"] or DEFAULT_URLS
+
+        baseline = None
+        for model in options["models"]:
+            server = self._start(model, options)
+            try:
+                result = self._load(options["port"], urls, headers, options["concurrency"], options["seconds"])
+                memory = _pss_mb(server.pid)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            baseline = baseline or result["rps"]
+            self.stdout.write(
+                f"{model:<8} {result['rps']:8.1f} запр/с (x{result['rps'] / baseline:.2f})  "
+                f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+                f"ошибок {result['errors']}  память (PSS) {'-' if memory is None else f'{memory:.0f} MB'}"
+            )
+
+    # -----------------------
+    # Сервер
+    # -----------------------
+    def _start(self, model, options):
+        env = {
+            **os.environ,
+            "GUNICORN_WORKER_CLASS": model,
+            "GUNICORN_BIND": f"127.0.0.1:{options['port']}",
+            "GUNICORN_WORKERS": str(options["workers"]),
+            "GUNICORN_THREADS": str(options["threads"]),
+            "DJANGO_SLOW_LOG_SAMPLE_RATE": "0",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", str(settings.BASE_DIR / "gunicorn.conf.py")],
+            env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn ({model}) завершился с кодом {server.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", options["port"]), timeout=1).close()
+                time.sleep(1)  # воркеры ещё запускаются после открытия порта
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.kill()
+        raise CommandError(f"gunicorn ({model}) не открыл порт за 30 с")
+
+    # -----------------------
+    # Нагрузка
+    # -----------------------
+    def _load(self, port, urls, headers, concurrency, seconds):
+        timings, errors = [], []
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def client(offset):
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            local_timings, local_errors, n = [], 0, offset
+            while time.monotonic() < deadline:
+                url = urls[n % len(urls)]
+                n += 1
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", url, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        local_errors += 1
+                except (OSError, http.client.HTTPException):
+                    local_errors += 1
+                    connection.close()
+                    continue
+                local_timings.append((time.perf_counter() - started) * 1000)
+            connection.close()
+            with lock:
+                timings.extend(local_timings)
+                errors.append(local_errors)
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        return {
+            "rps": len(timings) / elapsed,
+            "p50_ms": statistics.median(timings) if timings else 0,
+            "p95_ms": _percentile(timings, 95) if timings else 0,
+            "errors": sum(errors),
+        }
@@ -0,0 +1,68 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# выполняется в отдельном процессе: то же, что делает gunicorn-воркер до первого запроса
+CHILD = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns  # импорт всех view
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as fh:
+        rss_kb = next(int(line.split()[1]) for line in fh if line.startswith("VmRSS:"))
+except OSError:
+    pass
+from django.conf import settings
+print(json.dumps({
+    "startup_ms": elapsed * 1000,
+    "rss_mb": rss_kb / 1024,
+    "modules": len(sys.modules),
+    "apps": len(settings.INSTALLED_APPS),
+    "middleware": len(settings.MIDDLEWARE),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает время старта воркера (импорт приложения и всех URL), RSS и число "
+        "загруженных модулей для разных модулей настроек, например base.settings и "
+        "base.settings_api. Каждый замер — в новом процессе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("modules", nargs="*", default=["base.settings", "base.settings_api"],
+                            help="Модули настроек (по умолчанию base.settings base.settings_api).")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        baseline = None
+        for module in options["modules"]:
+            runs = [self._run(module) for _ in range(options["repeat"])]
+            result = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            baseline = baseline or result
+            self.stdout.write(
+                f"{module:<24} старт {result['startup_ms']:7.1f} ms ({result['startup_ms'] / baseline['startup_ms']:.0%})  "
+                f"RSS {result['rss_mb']:6.1f} MB ({result['rss_mb'] / baseline['rss_mb']:.0%})  "
+                f"модулей {result['modules']:>5.0f}  приложений {result['apps']:.0f}  "
+                f"middleware {result['middleware']:.0f}"
+            )
+
+    def _run(self, module):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": module}
+        completed = subprocess.run(
+            [sys.executable, "-c", CHILD], env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"{module}: {completed.stderr.strip().splitlines()[-1]}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+STATIC_STAMP = ".collectstatic.sha256"
+
+
+class Command(BaseCommand):
+    help = (
+        "Подготовка контейнера перед запуском gunicorn: migrate — только если есть "
+        "непримененные миграции, collectstatic — только если исходные статические "
+        "файлы изменились с прошлого раза (отпечаток хранится в STATIC_ROOT)."
+    )
+
+    def handle(self, *args, **options):
+        self.migrate()
+        self.collectstatic()
+
+    def migrate(self):
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write("migrate: все миграции применены, пропускаем.")
+            return
+        self.stdout.write(f"migrate: {len(plan)} новых миграций.")
+        call_command("migrate", interactive=False)
+
+    def collectstatic(self):
+        digest = self.static_digest()
+        stamp = os.path.join(settings.STATIC_ROOT, STATIC_STAMP)
+        try:
+            with open(stamp) as fh:
+                if fh.read().strip() == digest:
+                    self.stdout.write("collectstatic: статика не менялась, пропускаем.")
+                    return
+        except FileNotFoundError:
+            pass
+        call_command("collectstatic", interactive=False, verbosity=0)
+        with open(stamp, "w") as fh:
+            fh.write(digest)
+        self.stdout.write("collectstatic: готово.")
+
+    def static_digest(self):
+        """Отпечаток всех файлов, которые собрал бы collectstatic (пути и содержимое)."""
+        sha = hashlib.sha256()
+        files = {}
+        for finder in get_finders():
+            for path, storage in finder.list(["CVS", ".*", "*~"]):
+                # как collectstatic: при совпадении пути побеждает первый найденный файл
+                files.setdefault(path, storage.path(path))
+        for path in sorted(files):
+            sha.update(path.encode())
+            with open(files[path], "rb") as fh:
+                sha.update(hashlib.sha256(fh.read()).digest())
+        return sha.hexdigest()
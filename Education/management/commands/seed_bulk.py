@@ -0,0 +1,171 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Education import rollups
+from Education.models import Attendance, Course, Group, Lesson, Payment, Role, User
+
+LESSONS_PER_CYCLE = 12
+TOPICS = ["Грамматика", "Лексика", "Аудирование", "Разговорная практика", "Письмо", "Чтение", "Контрольная"]
+FIRST_NAMES = ["Алишер", "Иван", "Мария", "Дильноза", "Фарход", "Анна", "Умар", "Сабина", "Олег", "Нигора"]
+LAST_NAMES = ["Каримов", "Петров", "Иванова", "Юсупова", "Рахимов", "Смирнова", "Назаров", "Ахмедова"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетические данные production-объёма (bulk_create батчами, "
+        "детерминированно по --seed). По умолчанию: 100k студентов, 5k групп, "
+        "500k уроков, 10M записей посещаемости и платежи за все циклы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=100_000)
+        parser.add_argument("--teachers", type=int, default=500)
+        parser.add_argument("--courses", type=int, default=200)
+        parser.add_argument("--groups", type=int, default=5_000)
+        parser.add_argument("--group-size", type=int, default=20)
+        parser.add_argument("--lessons-per-group", type=int, default=100)
+        parser.add_argument("--scale", type=float, default=1.0,
+                            help="Множитель для студентов, учителей, курсов и групп (например 0.01 локально).")
+        parser.add_argument("--absent-rate", type=float, default=0.1)
+        parser.add_argument("--paid-rate", type=float, default=0.8)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="seed", help="Префикс username сгенерированных пользователей.")
+        parser.add_argument("--password", default="seed-password", help="Пароль всех сгенерированных пользователей.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.prefix = options["prefix"]
+        scale = options["scale"]
+        counts = {
+            name: max(1, int(options[name] * scale))
+            for name in ("students", "teachers", "courses", "groups")
+        }
+
+        if User.objects.filter(username__startswith=f"{self.prefix}_").exists():
+            raise CommandError(f"Пользователи с префиксом '{self.prefix}_' уже есть — укажите другой --prefix.")
+
+        started = time.perf_counter()
+        password = make_password(options["password"])
+        with transaction.atomic():
+            User.objects.create(
+                username=f"{self.prefix}_admin", password=password, full_name="Seed Admin",
+                role=Role.ADMIN, is_staff=True, is_superuser=True,
+            )
+            teachers = self._create_users(Role.TEACHER, counts["teachers"], password)
+            students = self._create_users(Role.STUDENT, counts["students"], password)
+            courses = Course.objects.bulk_create([
+                Course(
+                    title=f"Курс {i + 1}",
+                    teacher_id=teachers[i % len(teachers)],
+                    price=Decimal(self.rng.choice([300, 400, 500, 600])),
+                )
+                for i in range(counts["courses"])
+            ], batch_size=self.batch_size)
+
+        totals = {"lessons": 0, "attendance": 0, "payments": 0, "memberships": 0}
+        self.rng.shuffle(students)
+        group_size = min(options["group_size"], len(students))
+        for chunk_start in range(0, counts["groups"], 100):
+            chunk_end = min(chunk_start + 100, counts["groups"])
+            with transaction.atomic():
+                chunk_totals = self._create_groups(
+                    range(chunk_start, chunk_end), courses, students, group_size, options,
+                )
+            for key, value in chunk_totals.items():
+                totals[key] += value
+            self.stdout.write(f"  группы {chunk_end}/{counts['groups']}: {totals}")
+
+        # bulk_create обходит сигналы сводок — пересчитываем их одним проходом
+        rollups.rebuild(batch_size=self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {elapsed:.1f} с: {counts['teachers']} учителей, {counts['students']} студентов, "
+            f"{counts['courses']} курсов, {counts['groups']} групп, {totals['memberships']} участников, "
+            f"{totals['lessons']} уроков, {totals['attendance']} посещений, {totals['payments']} платежей. "
+            f"Логины: {self.prefix}_admin / {self.prefix}_teacher_N / {self.prefix}_student_N."
+        ))
+
+    def _create_users(self, role, count, password):
+        ids = []
+        for start in range(0, count, self.batch_size):
+            batch = [
+                User(
+                    username=f"{self.prefix}_{role}_{i}",
+                    password=password,
+                    full_name=f"{self.rng.choice(LAST_NAMES)} {self.rng.choice(FIRST_NAMES)}",
+                    email=f"{self.prefix}_{role}_{i}@example.com",
+                    phone=f"99890{self.rng.randint(1000000, 9999999)}",
+                    role=role,
+                )
+                for i in range(start, min(start + self.batch_size, count))
+            ]
+            ids += [user.pk for user in User.objects.bulk_create(batch)]
+        return ids
+
+    def _create_groups(self, indexes, courses, students, group_size, options):
+        groups = Group.objects.bulk_create([
+            Group(name=f"Группа {i + 1}", course=self.rng.choice(courses)) for i in indexes
+        ])
+
+        memberships, lessons = [], []
+        members_by_group = {}
+        for i, group in zip(indexes, groups):
+            offset = i * group_size
+            members = [students[(offset + k) % len(students)] for k in range(group_size)]
+            members_by_group[group.pk] = members
+            memberships += [Group.students.through(group_id=group.pk, user_id=sid) for sid in members]
+
+            day = date(2024, 9, 1) + timedelta(days=self.rng.randint(0, 60))
+            for n in range(options["lessons_per_group"]):
+                lessons.append(Lesson(
+                    topic=f"{self.rng.choice(TOPICS)} {n + 1}", date=day,
+                    teacher_id=group.course.teacher_id, group_id=group.pk,
+                ))
+                day += timedelta(days=self.rng.choice([2, 2, 3]))
+
+        Group.students.through.objects.bulk_create(memberships, batch_size=self.batch_size)
+        lessons = Lesson.objects.bulk_create(lessons, batch_size=self.batch_size)
+
+        attendance_count = 0
+        batch = []
+        for lesson in lessons:
+            for sid in members_by_group[lesson.group_id]:
+                status = "absent" if self.rng.random() < options["absent_rate"] else "present"
+                batch.append(Attendance(student_id=sid, lesson_id=lesson.pk, status=status))
+                if len(batch) >= self.batch_size:
+                    Attendance.objects.bulk_create(batch)
+                    attendance_count += len(batch)
+                    batch = []
+        Attendance.objects.bulk_create(batch)
+        attendance_count += len(batch)
+
+        # как в сигналах: цикл 1 при создании группы и новый цикл после каждых 12 уроков
+        cycles = options["lessons_per_group"] // LESSONS_PER_CYCLE + 1
+        payments = []
+        for group in groups:
+            for sid in members_by_group[group.pk]:
+                for cycle in range(1, cycles + 1):
+                    is_last = cycle == cycles
+                    paid_rate = options["paid_rate"] / 2 if is_last else options["paid_rate"]
+                    payments.append(Payment(
+                        student_id=sid, group_id=group.pk, course_id=group.course_id,
+                        cycle_index=cycle, amount_due=group.course.price,
+                        is_paid=self.rng.random() < paid_rate,
+                    ))
+        Payment.objects.bulk_create(payments, batch_size=self.batch_size)
+
+        return {
+            "memberships": len(memberships),
+            "lessons": len(lessons),
+            "attendance": attendance_count,
+            "payments": len(payments),
+        }
@@ -0,0 +1,58 @@
+"""
+Матрица посещаемости группы: студенты × уроки.
+
+Уроки группы за период и их посещаемость выбираются одним запросом
+(Lesson LEFT JOIN Attendance по индексу group+date), имена студентов —
+вторым. Статусы кодируются одной строкой на студента, символ на урок
+(см. CODES), поэтому годовая сетка группы — несколько килобайт JSON.
+"""
+from .models import Lesson, User
+
+CODES = {"present": "P", "absent": "A"}
+MISSING = "-"
+
+
+def build_attendance_matrix(group, start=None, end=None, student_ids=None):
+    """
+    {"lessons": [...], "students": [...], "codes": {...}, "matrix": ["PPA-", ...]}.
+
+    Строки — текущие студенты группы и те, у кого есть отметки за период
+    (переведённые), по id; student_ids ограничивает строки (студент видит только себя).
+    """
+    from .membership import group_students
+
+    lessons = Lesson.objects.filter(group=group)
+    if start is not None:
+        lessons = lessons.filter(date__gte=start)
+    if end is not None:
+        lessons = lessons.filter(date__lte=end)
+    rows = lessons.order_by("date", "id").values_list(
+        "id", "date", "topic", "attendances__student_id", "attendances__status",
+    )
+
+    lesson_list, marks = [], {}
+    for lesson_id, date, topic, student_id, status in rows:
+        if not lesson_list or lesson_list[-1]["id"] != lesson_id:
+            lesson_list.append({"id": lesson_id, "date": date, "topic": topic})
+        if student_id is not None:
+            marks.setdefault(student_id, {})[len(lesson_list) - 1] = CODES.get(status, MISSING)
+
+    ids = set(group_students(group.pk)) | set(marks)
+    if student_ids is not None:
+        ids &= set(student_ids)
+    students = list(User.objects.filter(pk__in=ids).order_by("pk").values("id", "full_name"))
+
+    width = len(lesson_list)
+    matrix = []
+    for student in students:
+        row = [MISSING] * width
+        for index, code in marks.get(student["id"], {}).items():
+            row[index] = code
+        matrix.append("".join(row))
+
+    return {
+        "lessons": lesson_list,
+        "students": students,
+        "codes": {**{code: status for status, code in CODES.items()}, MISSING: None},
+        "matrix": matrix,
+    }
@@ -0,0 +1,94 @@
+"""
+Индекс состава групп: группа → отсортированный массив id студентов.
+
+Проверка «состоит ли студент в группе урока» отвечает по массиву в памяти
+процесса (bisect) вместо запроса к Group.students.through. Массив группы
+загружается при первом обращении (с primary: запись живёт в кэше сутки, и
+отставшая реплика не должна в него попасть) и хранится в общем кэше (для
+всех воркеров) и локально в процессе не дольше MEMBERSHIP_LOCAL_TTL секунд.
+m2m_changed и удаление группы сбрасывают записи (см. models.py) после
+COMMIT транзакции (до него параллельный запрос снова загрузил бы в кэш
+прежний состав на сутки); в процессе, который сделал изменение, — сразу
+после COMMIT.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .db_router import primary
+from .metrics import record_cache
+
+MEMBERSHIP_CACHE_TIMEOUT = getattr(settings, "MEMBERSHIP_CACHE_TIMEOUT", 60 * 60 * 24)
+MEMBERSHIP_LOCAL_TTL = getattr(settings, "MEMBERSHIP_LOCAL_TTL", 5)
+
+_lock = threading.Lock()
+_local = {}  # ключ → (истекает, array)
+
+
+def _cache_key(key):
+    return f"membership:{key}"
+
+
+def _load(key, query):
+    now = time.monotonic()
+    entry = _local.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    data = cache.get(_cache_key(key))
+    record_cache("membership", data is not None)
+    if data is None:
+        with primary():
+            ids = array("q", sorted(query()))
+        cache.set(_cache_key(key), ids.tobytes(), MEMBERSHIP_CACHE_TIMEOUT)
+    else:
+        ids = array("q")
+        ids.frombytes(data)
+    with _lock:
+        _local[key] = (now + MEMBERSHIP_LOCAL_TTL, ids)
+    return ids
+
+
+def _contains(ids, value):
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+# -----------------------
+# API
+# -----------------------
+def group_students(group_id):
+    """Отсортированный массив id студентов группы."""
+    from .models import Group
+
+    return _load(group_id, lambda: Group.students.through.objects.filter(group_id=group_id).values_list("user_id", flat=True))
+
+
+def is_member(group_id, student_id):
+    return group_id is not None and _contains(group_students(group_id), student_id)
+
+
+# -----------------------
+# Сброс
+# -----------------------
+def invalidate(keys):
+    keys = [key for key in set(keys) if key is not None]
+    if keys:
+        transaction.on_commit(lambda: _forget(keys))
+
+
+def _forget(keys):
+    with _lock:
+        for key in keys:
+            _local.pop(key, None)
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+def invalidate_groups(group_ids):
+    invalidate(group_ids)
+
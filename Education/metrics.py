@@ -0,0 +1,369 @@
+"""
+Метрики в формате Prometheus без внешних зависимостей.
+
+Каждый процесс копит значения в памяти и раз в METRICS_FLUSH_INTERVAL
+секунд сбрасывает их в свой файл METRICS_DIR/<hostname>-<pid>.json.
+Эндпоинт /metrics суммирует файлы всех gunicorn-воркеров; METRICS_DIR
+может быть общим томом нескольких контейнеров (web и api), тогда /metrics
+любого из них показывает все. Без METRICS_DIR метрики видны только в
+текущем процессе (runserver).
+
+Файл умершего (перезапущенного) воркера складывается в
+METRICS_DIR/aggregate.json (счётчики и гистограммы, без gauge) и
+удаляется, поэтому число файлов не растёт с перезапусками. Складывает его
+мастер gunicorn (child_exit в gunicorn.conf.py, fold_worker) или сбор
+/metrics — для файлов своего контейнера, где pid можно проверить. Файл
+помнит время запуска процесса: если pid занял новый процесс, старый файл
+считается файлом умершего воркера и тоже складывается в aggregate.
+"""
+import atexit
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    # имя: (тип, описание, бакеты гистограммы)
+    "edora_http_requests_total": ("counter", "HTTP requests by route, method and status.", None),
+    "edora_http_request_duration_seconds": ("histogram", "Request latency by route.", LATENCY_BUCKETS),
+    "edora_http_response_size_bytes": ("histogram", "Response body size by route.", SIZE_BUCKETS),
+    "edora_db_queries_per_request": ("histogram", "SQL queries issued per request by route.", QUERY_BUCKETS),
+    "edora_db_queries_total": ("counter", "SQL queries by route.", None),
+    "edora_db_query_duration_seconds_total": ("counter", "Time spent in SQL by route.", None),
+    "edora_cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss).", None),
+    "edora_db_connections_opened_total": ("counter", "New database connections by alias.", None),
+    "edora_db_connections_open": ("gauge", "Persistent database connections held by workers.", None),
+    "edora_db_pool_size": ("gauge", "Connections in the psycopg pool (open, in use or idle).", None),
+    "edora_db_pool_available": ("gauge", "Idle connections in the psycopg pool.", None),
+    "edora_db_pool_requests_waiting": ("gauge", "Requests waiting for a pooled connection.", None),
+}
+
+
+AGGREGATE_FILE = "aggregate.json"
+LOCK_FILE = "aggregate.lock"
+# pid уникален только внутри контейнера: имя файла включает hostname
+HOST = socket.gethostname()
+
+
+def _worker_file(pid):
+    return f"{HOST}-{pid}.json"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._instance = _process_instance(self._pid)
+        self._values = {}
+        self._last_flush = time.monotonic()
+
+    def _check_fork(self):
+        # после fork (preload_app) потомок не должен повторно отдавать значения родителя
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._instance = _process_instance(self._pid)
+            self._values = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self._values[key] = value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(buckets), "sum": 0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    # -----------------------
+    # Общее хранилище воркеров
+    # -----------------------
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return [[name, list(labels), value] for (name, labels), value in self._values.items()]
+
+    def maybe_flush(self):
+        directory = getattr(settings, "METRICS_DIR", None)
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+        if directory and time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._last_flush = time.monotonic()
+        values = self.snapshot()  # заодно обновляет pid и _instance после fork
+        path = os.path.join(directory, _worker_file(self._pid))
+        previous = _read(path)
+        if previous is not None and previous["instance"] != self._instance:
+            # pid достался от умершего воркера: его счётчики не затираем, а складываем в aggregate
+            _fold(directory, path, self._instance)
+        _write(path, {"instance": self._instance, "values": values})
+
+    def collect(self):
+        """Значения всех процессов: {(имя, метки): значение}."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return {(name, tuple(map(tuple, labels))): value for name, labels, value in self.snapshot()}
+
+        self.flush()
+        merged = {}
+        for filename in os.listdir(directory):
+            host, _, pid = filename[:-len(".json")].rpartition("-")
+            if not (filename.endswith(".json") and pid.isdigit()):
+                continue
+            path = os.path.join(directory, filename)
+            entry = _read(path)
+            if entry is None:
+                continue
+            # живость проверяем только у своих процессов; "" — файл прежнего формата <pid>.json
+            if host in (HOST, "") and not _is_alive(int(pid), entry["instance"]):
+                _fold(directory, path)
+                continue
+            _merge_values(merged, entry["values"])
+        aggregate = _read(os.path.join(directory, AGGREGATE_FILE))
+        if aggregate is not None:
+            _merge_values(merged, aggregate["values"])
+        return merged
+
+
+def fold_worker(pid):
+    """Складывает файл завершившегося воркера этого контейнера в aggregate.json (мастер gunicorn)."""
+    directory = getattr(settings, "METRICS_DIR", None)
+    if directory and os.path.exists(os.path.join(directory, _worker_file(pid))):
+        _fold(directory, os.path.join(directory, _worker_file(pid)))
+
+
+def _process_instance(pid):
+    """
+    Метка процесса: время запуска из /proc (по ней pid, занятый новым
+    процессом, отличается от умершего воркера); без /proc — случайная.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as fh:
+            # поле 22 (starttime); имя процесса в скобках может содержать пробелы
+            return "start:" + fh.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return "uuid:" + uuid.uuid4().hex
+
+
+def _is_alive(pid, instance=None):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # процесс есть, но принадлежит другому пользователю
+        pass
+    if instance and instance.startswith("start:"):
+        # pid жив, но это может быть другой процесс с тем же номером
+        return _process_instance(pid) == instance
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as fh:
+            entry = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if isinstance(entry, list):  # файл прежнего формата: только значения
+        entry = {"instance": None, "values": entry}
+    return entry
+
+
+def _write(path, entry):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(entry, fh)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _aggregate_lock(directory):
+    import fcntl  # только Unix: METRICS_DIR задаётся для gunicorn
+
+    with open(os.path.join(directory, LOCK_FILE), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _fold(directory, path, keep_instance=None):
+    """Прибавляет счётчики и гистограммы файла умершего процесса к aggregate.json и удаляет файл."""
+    with _aggregate_lock(directory):
+        # файл мог уже сложить другой воркер, пока мы ждали блокировку
+        entry = _read(path)
+        if entry is None or (keep_instance is not None and entry["instance"] == keep_instance):
+            return
+        aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+        totals = {}
+        aggregate = _read(aggregate_path)
+        if aggregate is not None:
+            _merge_values(totals, aggregate["values"])
+        # текущее состояние (gauge) умершего воркера уже неактуально
+        _merge_values(totals, [item for item in entry["values"] if METRICS[item[0]][0] != "gauge"])
+        _write(aggregate_path, {
+            "instance": None,
+            "values": [[name, list(labels), value] for (name, labels), value in totals.items()],
+        })
+        os.remove(path)
+
+
+def _merge_values(merged, entries):
+    for name, labels, value in entries:
+        key = (name, tuple(map(tuple, labels)))
+        merged[key] = _merge(merged.get(key), value)
+
+
+def _merge(current, value):
+    if current is None:
+        return value
+    if isinstance(value, dict):
+        return {
+            "buckets": [a + b for a, b in zip(current["buckets"], value["buckets"])],
+            "sum": current["sum"] + value["sum"],
+            "count": current["count"] + value["count"],
+        }
+    return current + value
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def record_cache(cache_name, hit):
+    registry.inc("edora_cache_requests_total", {"cache": cache_name, "result": "hit" if hit else "miss"})
+
+
+def _count_connection(sender, connection, **kwargs):
+    registry.inc("edora_db_connections_opened_total", {"alias": connection.alias})
+
+
+connection_created.connect(_count_connection)
+
+
+def record_db_connections():
+    """Соединения этого процесса: открытые постоянные и состояние пула psycopg 3."""
+    for connection in connections.all(initialized_only=True):
+        labels = {"alias": connection.alias}
+        if connection.settings_dict.get("OPTIONS", {}).get("pool"):
+            stats = connection.pool.get_stats()
+            registry.set("edora_db_pool_size", labels, stats.get("pool_size", 0))
+            registry.set("edora_db_pool_available", labels, stats.get("pool_available", 0))
+            registry.set("edora_db_pool_requests_waiting", labels, stats.get("requests_waiting", 0))
+        else:
+            registry.set("edora_db_connections_open", labels, int(connection.connection is not None))
+
+
+# -----------------------
+# Текстовый формат Prometheus
+# -----------------------
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+def render():
+    values = registry.collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        if not series:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in series:
+            if kind == "histogram":
+                for bound, count in zip(buckets, value["buckets"]):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------
+# Middleware
+# -----------------------
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Время ответа, размер ответа и SQL-запросы по маршрутам (view_name)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # до запроса: соединения уже закрыты/проверены по CONN_MAX_AGE (request_started)
+        record_db_connections()
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match else "unmatched"  # без сырых путей: ограниченное число меток
+        labels = {"route": route, "method": request.method}
+        registry.inc("edora_http_requests_total", {**labels, "status": str(response.status_code)})
+        registry.observe("edora_http_request_duration_seconds", labels, elapsed)
+        if not response.streaming:
+            registry.observe("edora_http_response_size_bytes", labels, len(response.content))
+        registry.observe("edora_db_queries_per_request", labels, stats.count)
+        registry.inc("edora_db_queries_total", labels, stats.count)
+        registry.inc("edora_db_query_duration_seconds_total", labels, stats.duration)
+        registry.maybe_flush()
+        return response
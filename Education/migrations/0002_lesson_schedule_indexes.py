@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['teacher', 'date'], name='lesson_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['group', 'date'], name='lesson_group_date_idx'),
+        ),
+    ]
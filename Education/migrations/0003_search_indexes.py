@@ -0,0 +1,101 @@
+from django.db import migrations
+
+# DDL скопирован из Education/search.py на момент создания миграции:
+# дальнейшие изменения search.py не должны менять уже применённую миграцию.
+# Выражения документов должны совпадать с теми, что строит
+# SearchDocument.pg_document(), иначе PostgreSQL не использует индексы.
+USER_DOCUMENT = (
+    "coalesce(\"username\", '') || ' ' || coalesce(\"full_name\", '') || ' ' || "
+    "coalesce(\"email\", '') || ' ' || coalesce(\"phone\", '')"
+)
+COURSE_DOCUMENT = "coalesce(\"title\", '') || ' ' || coalesce(\"description\", '')"
+LESSON_DOCUMENT = "coalesce(\"topic\", '')"
+
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS education_user_search_tsv ON \"Education_user\" USING gin (to_tsvector('simple', {USER_DOCUMENT}))",
+    f'CREATE INDEX IF NOT EXISTS education_user_search_trgm ON "Education_user" USING gin (({USER_DOCUMENT}) gin_trgm_ops)',
+    f"CREATE INDEX IF NOT EXISTS education_course_search_tsv ON \"Education_course\" USING gin (to_tsvector('simple', {COURSE_DOCUMENT}))",
+    f'CREATE INDEX IF NOT EXISTS education_course_search_trgm ON "Education_course" USING gin (({COURSE_DOCUMENT}) gin_trgm_ops)',
+    f"CREATE INDEX IF NOT EXISTS education_lesson_search_tsv ON \"Education_lesson\" USING gin (to_tsvector('simple', {LESSON_DOCUMENT}))",
+    f'CREATE INDEX IF NOT EXISTS education_lesson_search_trgm ON "Education_lesson" USING gin (({LESSON_DOCUMENT}) gin_trgm_ops)',
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS education_user_search_tsv",
+    "DROP INDEX IF EXISTS education_user_search_trgm",
+    "DROP INDEX IF EXISTS education_course_search_tsv",
+    "DROP INDEX IF EXISTS education_course_search_trgm",
+    "DROP INDEX IF EXISTS education_lesson_search_tsv",
+    "DROP INDEX IF EXISTS education_lesson_search_trgm",
+]
+
+SQLITE_CREATE = [
+    # пользователи
+    "CREATE VIRTUAL TABLE education_user_fts USING fts5(username, full_name, email, phone, "
+    "content='Education_user', content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER education_user_fts_ai AFTER INSERT ON "Education_user" BEGIN '
+    "INSERT INTO education_user_fts(rowid, username, full_name, email, phone) "
+    "VALUES (new.id, new.username, new.full_name, new.email, new.phone); END",
+    'CREATE TRIGGER education_user_fts_ad AFTER DELETE ON "Education_user" BEGIN '
+    "INSERT INTO education_user_fts(education_user_fts, rowid, username, full_name, email, phone) "
+    "VALUES ('delete', old.id, old.username, old.full_name, old.email, old.phone); END",
+    'CREATE TRIGGER education_user_fts_au AFTER UPDATE OF username, full_name, email, phone ON "Education_user" BEGIN '
+    "INSERT INTO education_user_fts(education_user_fts, rowid, username, full_name, email, phone) "
+    "VALUES ('delete', old.id, old.username, old.full_name, old.email, old.phone); "
+    "INSERT INTO education_user_fts(rowid, username, full_name, email, phone) "
+    "VALUES (new.id, new.username, new.full_name, new.email, new.phone); END",
+    "INSERT INTO education_user_fts(education_user_fts) VALUES ('rebuild')",
+    # курсы
+    "CREATE VIRTUAL TABLE education_course_fts USING fts5(title, description, "
+    "content='Education_course', content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER education_course_fts_ai AFTER INSERT ON "Education_course" BEGIN '
+    "INSERT INTO education_course_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    'CREATE TRIGGER education_course_fts_ad AFTER DELETE ON "Education_course" BEGIN '
+    "INSERT INTO education_course_fts(education_course_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    'CREATE TRIGGER education_course_fts_au AFTER UPDATE OF title, description ON "Education_course" BEGIN '
+    "INSERT INTO education_course_fts(education_course_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO education_course_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO education_course_fts(education_course_fts) VALUES ('rebuild')",
+    # уроки
+    "CREATE VIRTUAL TABLE education_lesson_fts USING fts5(topic, "
+    "content='Education_lesson', content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER education_lesson_fts_ai AFTER INSERT ON "Education_lesson" BEGIN '
+    "INSERT INTO education_lesson_fts(rowid, topic) VALUES (new.id, new.topic); END",
+    'CREATE TRIGGER education_lesson_fts_ad AFTER DELETE ON "Education_lesson" BEGIN '
+    "INSERT INTO education_lesson_fts(education_lesson_fts, rowid, topic) VALUES ('delete', old.id, old.topic); END",
+    'CREATE TRIGGER education_lesson_fts_au AFTER UPDATE OF topic ON "Education_lesson" BEGIN '
+    "INSERT INTO education_lesson_fts(education_lesson_fts, rowid, topic) VALUES ('delete', old.id, old.topic); "
+    "INSERT INTO education_lesson_fts(rowid, topic) VALUES (new.id, new.topic); END",
+    "INSERT INTO education_lesson_fts(education_lesson_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    f"DROP {kind} IF EXISTS education_{name}_fts{suffix}"
+    for name in ("user", "course", "lesson")
+    for kind, suffix in (("TRIGGER", "_ai"), ("TRIGGER", "_ad"), ("TRIGGER", "_au"), ("TABLE", ""))
+]
+
+FORWARD = {"postgresql": POSTGRES_CREATE, "sqlite": SQLITE_CREATE}
+BACKWARD = {"postgresql": POSTGRES_DROP, "sqlite": SQLITE_DROP}
+
+
+def create_search_indexes(apps, schema_editor):
+    for sql in FORWARD.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for sql in BACKWARD.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0002_lesson_schedule_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
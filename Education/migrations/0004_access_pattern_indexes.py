@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0003_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['lesson', 'status'], name='attendance_lesson_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', 'is_paid'], name='payment_student_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['group', 'student', 'cycle_index'], name='payment_group_order_idx'),
+        ),
+        # Group.students — автоматическая through-таблица, индекс задаём вручную:
+        # группы студента (user_id -> group_id) читаются только из индекса
+        migrations.RunSQL(
+            'CREATE INDEX group_students_user_group_idx ON "Education_group_students" (user_id, group_id)',
+            'DROP INDEX group_students_user_group_idx',
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# DDL индекса групп скопирован из Education/search.py на момент создания
+# миграции (см. 0003_search_indexes): миграция не меняется вместе с search.py
+GROUP_DOCUMENT = "coalesce(\"name\", '')"
+
+FORWARD = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS education_group_search_tsv ON \"Education_group\" USING gin (to_tsvector('simple', {GROUP_DOCUMENT}))",
+        f'CREATE INDEX IF NOT EXISTS education_group_search_trgm ON "Education_group" USING gin (({GROUP_DOCUMENT}) gin_trgm_ops)',
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE education_group_fts USING fts5(name, "
+        "content='Education_group', content_rowid='id', tokenize='trigram')",
+        'CREATE TRIGGER education_group_fts_ai AFTER INSERT ON "Education_group" BEGIN '
+        "INSERT INTO education_group_fts(rowid, name) VALUES (new.id, new.name); END",
+        'CREATE TRIGGER education_group_fts_ad AFTER DELETE ON "Education_group" BEGIN '
+        "INSERT INTO education_group_fts(education_group_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+        'CREATE TRIGGER education_group_fts_au AFTER UPDATE OF name ON "Education_group" BEGIN '
+        "INSERT INTO education_group_fts(education_group_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO education_group_fts(rowid, name) VALUES (new.id, new.name); END",
+        "INSERT INTO education_group_fts(education_group_fts) VALUES ('rebuild')",
+    ],
+}
+BACKWARD = {
+    "postgresql": [
+        "DROP INDEX IF EXISTS education_group_search_tsv",
+        "DROP INDEX IF EXISTS education_group_search_trgm",
+    ],
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS education_group_fts_ai",
+        "DROP TRIGGER IF EXISTS education_group_fts_ad",
+        "DROP TRIGGER IF EXISTS education_group_fts_au",
+        "DROP TABLE IF EXISTS education_group_fts",
+    ],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    for sql in FORWARD.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for sql in BACKWARD.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0004_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='teacher',
+            field=models.ForeignKey(limit_choices_to={'role': 'teacher'}, on_delete=django.db.models.deletion.CASCADE, related_name='courses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='students',
+            field=models.ManyToManyField(limit_choices_to={'role': 'student'}, related_name='student_groups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
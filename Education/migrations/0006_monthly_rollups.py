@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0005_autocomplete_choices_group_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Education.course')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Education.group')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Посещаемость по месяцам',
+                'verbose_name_plural': 'Посещаемость по месяцам',
+                'indexes': [models.Index(fields=['month', 'course'], name='attendance_monthly_course_idx'), models.Index(fields=['month', 'teacher'], name='attendance_monthly_teacher_idx')],
+                'unique_together': {('month', 'group', 'teacher')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('payments', models.IntegerField(default=0)),
+                ('paid_payments', models.IntegerField(default=0)),
+                ('amount_due', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Education.course')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Education.group')),
+            ],
+            options={
+                'verbose_name': 'Выручка по месяцам',
+                'verbose_name_plural': 'Выручка по месяцам',
+                'indexes': [models.Index(fields=['month', 'course'], name='revenue_monthly_course_idx')],
+                'unique_together': {('month', 'group', 'course')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0006_monthly_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['date'], name='lesson_date_idx'),
+        ),
+    ]
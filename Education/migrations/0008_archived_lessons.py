@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0007_lesson_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLesson',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('attendance', models.JSONField(default=dict)),
+                ('comments', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_lessons', to='Education.group')),
+                ('teacher', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Архивный урок',
+                'verbose_name_plural': 'Архив уроков',
+                'indexes': [models.Index(fields=['group', 'date'], name='archived_lesson_group_date_idx')],
+            },
+        ),
+    ]
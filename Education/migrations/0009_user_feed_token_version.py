@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:39
+
+from django.db import migrations, models
+
+
+def _field():
+    field = models.PositiveIntegerField(default=0, editable=False)
+    field.set_attributes_from_name('feed_token_version')
+    return field
+
+
+def add_feed_token_version(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        # AddField в SQLite пересобирает таблицу, и вместе со старой таблицей
+        # пропали бы триггеры FTS-индекса поиска пользователей (0003)
+        schema_editor.execute(
+            'ALTER TABLE "Education_user" ADD COLUMN "feed_token_version" integer unsigned '
+            'NOT NULL DEFAULT 0 CHECK ("feed_token_version" >= 0)'
+        )
+    else:
+        schema_editor.add_field(apps.get_model('Education', 'User'), _field())
+
+
+def remove_feed_token_version(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('ALTER TABLE "Education_user" DROP COLUMN "feed_token_version"')
+    else:
+        schema_editor.remove_field(apps.get_model('Education', 'User'), _field())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0008_archived_lessons'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='user',
+                    name='feed_token_version',
+                    field=models.PositiveIntegerField(default=0, editable=False),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_feed_token_version, remove_feed_token_version),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0009_user_feed_token_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancemonthly',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, post_init, m2m_changed
 from django.dispatch import receiver
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 
+from .db_router import on_primary, primary
+
 # Роли пользователей
 class Role(models.TextChoices):
     ADMIN = 'admin', 'Админ'
@@ -14,6 +16,8 @@ class User(AbstractUser):
     full_name = models.CharField(max_length=255)
     phone = models.CharField(max_length=20, blank=True, null=True)
     role = models.CharField(max_length=20, choices=Role.choices)
+    # версия ссылок на календарные фиды (schedule.py): увеличение отзывает все выданные ссылки
+    feed_token_version = models.PositiveIntegerField(default=0, editable=False)
 
     REQUIRED_FIELDS = ['full_name', 'email', 'role']
 
@@ -25,7 +29,7 @@ class User(AbstractUser):
 class Course(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses')
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses', limit_choices_to={'role': Role.TEACHER})
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
     def __str__(self):
@@ -37,7 +41,7 @@ class Course(models.Model):
 class Group(models.Model):
     name = models.CharField(max_length=255)
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='groups', null=True, blank=True)
-    students = models.ManyToManyField(User, related_name='student_groups')
+    students = models.ManyToManyField(User, related_name='student_groups', limit_choices_to={'role': Role.STUDENT})
 
     def __str__(self):
         return self.name
@@ -52,10 +56,32 @@ class Lesson(models.Model):
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lessons', limit_choices_to={'role':Role.TEACHER})
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='lessons')
 
+    class Meta:
+        # Расписание учителя/группы выбирается по диапазону дат
+        indexes = [
+            models.Index(fields=['teacher', 'date'], name='lesson_teacher_date_idx'),
+            models.Index(fields=['group', 'date'], name='lesson_group_date_idx'),
+            # уроки на дату (KPI «уроки сегодня» в админке)
+            models.Index(fields=['date'], name='lesson_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.topic} - {self.group.name} - {self.date}"
     
 
+class AttendanceQuerySet(models.QuerySet):
+    def delete(self):
+        # сводки уменьшаются здесь, а не в post_delete: с получателем сигнала
+        # Django удалял бы отметки каскадом построчно, а не одной командой
+        from .rollups import attendances_deleted
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = list(self.values_list(*ATTENDANCE_ROLLUP_FIELDS))
+            deleted = super().delete()
+            attendances_deleted(rows)
+        return deleted
+
+
 class Attendance(models.Model):
     STATUS_CHOICES = (
         ('present', 'Присутствовал'),
@@ -66,13 +92,41 @@ class Attendance(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='attendances')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     comment = models.TextField(blank=True, null=True)
+
+    objects = AttendanceQuerySet.as_manager()
     
     class Meta:
         unique_together = ('student', 'lesson')
+        indexes = [
+            # посещаемость урока с фильтром по статусу (отчёты, show_lessons)
+            models.Index(fields=['lesson', 'status'], name='attendance_lesson_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name} - {self.lesson.topic} - {self.status}"
 
+    def delete(self, *args, **kwargs):
+        # см. AttendanceQuerySet.delete; каскад от урока, группы и студента — сигналы ниже
+        from .rollups import attendance_changed
+
+        with transaction.atomic(savepoint=False):
+            state = _saved_rollup_state(self, ATTENDANCE_ROLLUP_FIELDS, None)
+            deleted = super().delete(*args, **kwargs)
+            attendance_changed(state, None)
+        return deleted
+
+
+class PaymentQuerySet(models.QuerySet):
+    def delete(self):
+        # см. AttendanceQuerySet.delete
+        from .rollups import payments_deleted
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = list(self.values_list(*PAYMENT_ROLLUP_FIELDS))
+            deleted = super().delete()
+            payments_deleted(rows)
+        return deleted
+
 
 class Payment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role':Role.STUDENT}, related_name='payments')
@@ -84,66 +138,131 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PaymentQuerySet.as_manager()
+
     class Meta:
         unique_together = ('student', 'group', 'cycle_index')
         ordering = ['group', 'student', 'cycle_index']
+        indexes = [
+            # долги студента (is_paid=False) и сортировка списка платежей по умолчанию
+            models.Index(fields=['student', 'is_paid'], name='payment_student_paid_idx'),
+            models.Index(fields=['group', 'student', 'cycle_index'], name='payment_group_order_idx'),
+        ]
 
     def __str__(self):
         status = "✅" if self.is_paid else "❌"
         return f"{self.student.full_name} - {self.group.name} (Цикл {self.cycle_index}) {status}"
 
+    def delete(self, *args, **kwargs):
+        from .rollups import payment_changed
 
-@receiver(post_save, sender=Group)
-def create_payments_for_new_group(sender, instance, created, **kwargs):
-    if created and instance.course and instance.students.exists():
-        course = instance.course
-        students = instance.students.all()
-        for student in students:
-            Payment.objects.create(
-                student=student,
-                group=instance,
-                course=course,
-                cycle_index=1,
-                amount_due=course.price,
-                is_paid=False
-            )
+        with transaction.atomic(savepoint=False):
+            state = _saved_rollup_state(self, PAYMENT_ROLLUP_FIELDS, None)
+            deleted = super().delete(*args, **kwargs)
+            payment_changed(state, None)
+        return deleted
 
 
-@receiver(m2m_changed, sender=Group.students.through)
-def create_payment_for_new_student(sender, instance, action, pk_set, **kwargs):
-    if action == 'post_add':
-        from decimal import Decimal
-        course = instance.course
-        if not course:
-            return
-
-        total_lessons = instance.lessons.count()
-        current_cycle_index = total_lessons // 12 + 1
-        lessons_in_current_cycle = total_lessons % 12
+# -----------------------
+# Месячные сводки для отчётов (поддерживаются сигналами, см. rollups.py)
+# -----------------------
+class AttendanceMonthly(models.Model):
+    month = models.DateField()  # первое число месяца урока
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='+')
+    # NULL — учитель удалён, а отметки архивных уроков (ArchivedLesson) остались
+    teacher = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Посещаемость по месяцам'
+        verbose_name_plural = 'Посещаемость по месяцам'
+        unique_together = ('month', 'group', 'teacher')
+        indexes = [
+            models.Index(fields=['month', 'course'], name='attendance_monthly_course_idx'),
+            models.Index(fields=['month', 'teacher'], name='attendance_monthly_teacher_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.group} - {self.month:%Y-%m}"
+
+
+class RevenueMonthly(models.Model):
+    month = models.DateField()  # первое число месяца выставления платежа (created_at)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='+')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    payments = models.IntegerField(default=0)
+    paid_payments = models.IntegerField(default=0)
+    amount_due = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Выручка по месяцам'
+        verbose_name_plural = 'Выручка по месяцам'
+        unique_together = ('month', 'group', 'course')
+        indexes = [
+            models.Index(fields=['month', 'course'], name='revenue_monthly_course_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.group} - {self.month:%Y-%m}"
+
+
+# -----------------------
+# Архив уроков завершённых групп (см. archive.py)
+# -----------------------
+class ArchivedLesson(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # id исходного урока
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='archived_lessons')
+    teacher = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True)
+    topic = models.CharField(max_length=255)
+    date = models.DateField()
+    # посещаемость урока одной строкой: {"<student_id>": "P" | "A"} (коды matrix.CODES)
+    attendance = models.JSONField(default=dict)
+    comments = models.JSONField(default=dict, blank=True)  # только непустые: {"<student_id>": "..."}
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Архивный урок'
+        verbose_name_plural = 'Архив уроков'
+        indexes = [
+            models.Index(fields=['group', 'date'], name='archived_lesson_group_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} - {self.date}"
 
-        for student_id in pk_set:
-            student = User.objects.get(pk=student_id)
 
-            if Payment.objects.filter(student=student, group=instance, cycle_index=current_cycle_index).exists():
-                continue
+# -----------------------
+# Платежи (расчёт читает только с primary)
+# -----------------------
+@receiver(post_save, sender=Group)
+@on_primary
+def create_payments_for_new_group(sender, instance, created, **kwargs):
+    if created and instance.course:
+        from .enrollment import create_cycle_payments
 
-            if lessons_in_current_cycle == 0:
-                amount_due = course.price
-            else:
-                remaining_lessons = 12 - lessons_in_current_cycle
-                amount_due = (Decimal(remaining_lessons) / Decimal(12)) * course.price
+        student_ids = instance.students.values_list('pk', flat=True)
+        create_cycle_payments(instance, student_ids, cycle_index=1, amount_due=instance.course.price)
 
-            Payment.objects.create(
-                student=student,
-                group=instance,
-                course=course,
-                cycle_index=current_cycle_index,
-                amount_due=round(amount_due, 2),
-                is_paid=False
-            )
+
+@receiver(m2m_changed, sender=Group.students.through)
+@on_primary
+def create_payment_for_new_student(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    from .enrollment import create_enrollment_payments
+
+    if reverse:  # user.student_groups.add(...)
+        for group in Group.objects.filter(pk__in=pk_set).select_related('course'):
+            create_enrollment_payments(group, [instance.pk])
+    else:
+        create_enrollment_payments(instance, pk_set)
 
 
 @receiver(post_save, sender=Lesson)
+@on_primary
 def create_payments_after_cycle_complete(sender, instance, created, **kwargs):
     if not created:
         return
@@ -156,19 +275,296 @@ def create_payments_after_cycle_complete(sender, instance, created, **kwargs):
     total_lessons = group.lessons.count()
 
     if total_lessons % 12 == 0:
-        current_cycle_index = total_lessons // 12 + 1 
-        students = group.students.all()
-
-        for student in students:
-            if Payment.objects.filter(student=student, group=group, cycle_index=current_cycle_index).exists():
-                continue
-
-            Payment.objects.create(
-                student=student,
-                group=group,
-                course=course,
-                cycle_index=current_cycle_index,
-                amount_due=course.price,
-                is_paid=False
-            )
+        from .enrollment import create_cycle_payments
+
+        current_cycle_index = total_lessons // 12 + 1
+        student_ids = group.students.values_list('pk', flat=True)
+        create_cycle_payments(group, student_ids, current_cycle_index, course.price)
+
+
+# -----------------------
+# Сброс кэша расписания
+# -----------------------
+@receiver(pre_save, sender=Lesson)
+def remember_saved_lesson(sender, instance, update_fields=None, **kwargs):
+    # сохранённые учитель, группа и дата: при переносе урока сбрасываем и прежнее
+    # расписание, и пересчитываем прежнюю ячейку сводок (update_lesson_rollup)
+    instance._saved_lesson = None
+    if instance._state.adding or (update_fields is not None and not {'teacher', 'group', 'date'} & set(update_fields)):
+        return
+    with primary():
+        instance._saved_lesson = Lesson.objects.filter(pk=instance.pk).values_list('teacher_id', 'group_id', 'date').first()
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_schedule(sender, instance, **kwargs):
+    from .schedule import invalidate_schedule
+
+    old_teacher_id, old_group_id, _ = getattr(instance, '_saved_lesson', None) or (None, None, None)
+    invalidate_schedule(
+        teacher_ids=[old_teacher_id, instance.teacher_id],
+        group_ids=[old_group_id, instance.group_id],
+    )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_schedule(sender, instance, created, **kwargs):
+    # название группы входит в расписание учителей
+    if created:
+        return
+    from .schedule import invalidate_schedule
+
+    teacher_ids = Lesson.objects.filter(group=instance).values_list('teacher_id', flat=True).distinct()
+    invalidate_schedule(teacher_ids=list(teacher_ids), group_ids=[instance.pk])
+
+
+@receiver(post_save, sender=User)
+def invalidate_teacher_schedule(sender, instance, created, update_fields=None, **kwargs):
+    # имя учителя входит в описание событий (обновление last_login при входе пропускаем)
+    if update_fields is not None and 'full_name' not in update_fields:
+        return
+    if not created and instance.role == Role.TEACHER:
+        from .schedule import invalidate_schedule
+
+        group_ids = Lesson.objects.filter(teacher=instance).values_list('group_id', flat=True).distinct()
+        invalidate_schedule(teacher_ids=[instance.pk], group_ids=list(group_ids))
+
+
+# -----------------------
+# Сброс кэша области видимости (scope.py)
+# -----------------------
+@receiver(m2m_changed, sender=Group.students.through)
+def invalidate_enrollment_scope(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    from .scope import group_audience, invalidate_scope
+
+    if reverse:  # user.student_groups.add(...)
+        group_ids = pk_set if pk_set is not None else instance.student_groups.values_list('pk', flat=True)
+        user_ids = {instance.pk}
+    else:
+        group_ids, user_ids = [instance.pk], set(pk_set or ())
+    invalidate_scope(user_ids | group_audience(group_ids))
+
+
+@receiver(post_init, sender=Group)
+def remember_group_course(sender, instance, **kwargs):
+    # общий для областей видимости и сводок (update_group_rollup_course);
+    # через __dict__: отложенное поле (.only()/.defer()) не грузится запросом на каждую строку,
+    # а при сохранении считается изменённым
+    instance._old_course_id = instance.__dict__.get('course_id')
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_scope(sender, instance, created, **kwargs):
+    old_course_id = getattr(instance, '_old_course_id', None)
+    if created or old_course_id != instance.course_id:
+        from .scope import group_audience, invalidate_scope
+
+        old_teacher_ids = Course.objects.filter(pk=old_course_id).values_list('teacher_id', flat=True)
+        invalidate_scope(group_audience([instance.pk]) | set(old_teacher_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_scope(sender, instance, **kwargs):
+    # состав группы удаляется каскадом без m2m_changed
+    from .scope import group_audience, invalidate_scope
+
+    invalidate_scope(group_audience([instance.pk]))
+
+
+@receiver(post_init, sender=Course)
+def remember_course_teacher(sender, instance, **kwargs):
+    instance._scope_teacher_id = instance.__dict__.get('teacher_id')  # см. remember_group_course
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_scope(sender, instance, **kwargs):
+    old_teacher_id = getattr(instance, '_scope_teacher_id', None)
+    if kwargs.get('created') is False and old_teacher_id == instance.teacher_id:
+        return
+    from .scope import group_audience, invalidate_scope
+
+    group_ids = Group.objects.filter(course=instance).values_list('pk', flat=True)
+    invalidate_scope({old_teacher_id, instance.teacher_id} | group_audience(group_ids))
+    instance._scope_teacher_id = instance.teacher_id
+
+
+# -----------------------
+# Сброс индекса состава групп (membership.py)
+# -----------------------
+@receiver(m2m_changed, sender=Group.students.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    from .membership import invalidate_groups
+
+    if not reverse:
+        invalidate_groups([instance.pk])
+    elif pk_set is not None:
+        invalidate_groups(pk_set)
+    else:  # user.student_groups.clear(): группы известны только до очистки
+        invalidate_groups(instance.student_groups.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_membership(sender, instance, **kwargs):
+    from .membership import invalidate_groups
+
+    invalidate_groups([instance.pk])
+
+
+# -----------------------
+# Сброс кэша состояния пользователя (JWT)
+# -----------------------
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_state(sender, instance, **kwargs):
+    from .authentication import user_states
+
+    transaction.on_commit(lambda: user_states.invalidate(instance.pk))
+
+
+# -----------------------
+# Месячные сводки (rollups.py)
+# -----------------------
+ATTENDANCE_ROLLUP_FIELDS = ('lesson_id', 'status')
+PAYMENT_ROLLUP_FIELDS = ('created_at', 'group_id', 'course_id', 'amount_due', 'is_paid')
+
+
+def _attendance_state(instance):
+    return tuple(getattr(instance, name) for name in ATTENDANCE_ROLLUP_FIELDS)
+
+
+def _payment_state(instance):
+    return tuple(getattr(instance, name) for name in PAYMENT_ROLLUP_FIELDS)
+
+
+def _saved_rollup_state(instance, fields, update_fields):
+    # сохранённые значения — одним запросом по pk и только при изменении
+    # существующей строки (не в post_init: он срабатывает на каждую строку выборки)
+    if instance._state.adding:
+        return None
+    if update_fields is not None:
+        names = {name for field in fields for name in (field, field.removesuffix('_id'))}
+        if not names & set(update_fields):
+            return None
+    with primary():
+        return type(instance)._base_manager.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_attendance_rollup(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_state = _saved_rollup_state(instance, ATTENDANCE_ROLLUP_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Attendance)
+@on_primary
+def update_attendance_rollup(sender, instance, created, **kwargs):
+    # удаление — в Attendance.delete / AttendanceQuerySet.delete, каскады — сигналами урока и пользователя
+    from .rollups import attendance_changed
+
+    old = None if created else instance._rollup_state
+    if created or old is not None:
+        attendance_changed(old, _attendance_state(instance))
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_rollup(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_state = _saved_rollup_state(instance, PAYMENT_ROLLUP_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Payment)
+@on_primary
+def update_payment_rollup(sender, instance, created, **kwargs):
+    from .rollups import payment_changed
+
+    old = None if created else instance._rollup_state
+    if created or old is not None:
+        payment_changed(old, _payment_state(instance))
+
+
+@receiver(post_save, sender=Lesson)
+@on_primary
+def update_lesson_rollup(sender, instance, created, **kwargs):
+    # перенос урока в другой месяц, группу или к другому учителю
+    saved = getattr(instance, '_saved_lesson', None)
+    if not created and saved is not None:
+        from .rollups import lesson_moved
+
+        teacher_id, group_id, day = saved
+        lesson_moved((day, group_id, teacher_id), (instance.date, instance.group_id, instance.teacher_id))
+
+
+@receiver(post_delete, sender=Lesson)
+@on_primary
+def update_deleted_lesson_rollup(sender, instance, **kwargs):
+    # отметки урока удалены каскадом одной командой (без сигналов) — пересчитываем его ячейку
+    from .rollups import lesson_deleted
+
+    lesson_deleted(instance.group_id, instance.date)
+
+
+@receiver(pre_delete, sender=User)
+@on_primary
+def remember_user_rollup_cells(sender, instance, **kwargs):
+    from .rollups import user_cells
+
+    instance._rollup_cells = user_cells(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+@on_primary
+def update_deleted_user_rollup(sender, instance, **kwargs):
+    # отметки и платежи студента удалены каскадом без сигналов — пересчитываем их ячейки
+    from .rollups import rebuild_attendance, rebuild_revenue
+
+    attendance_cells, revenue_cells = getattr(instance, '_rollup_cells', (set(), set()))
+    rebuild_attendance(attendance_cells)
+    rebuild_revenue(revenue_cells)
+
+
+@receiver(post_save, sender=Group)
+def update_group_rollup_course(sender, instance, created, **kwargs):
+    # _old_course_id запоминает remember_group_course; этот получатель подключён
+    # после invalidate_group_scope и обновляет значение для следующего save()
+    if not created and instance._old_course_id != instance.course_id:
+        from .rollups import group_course_changed
+
+        group_course_changed(instance.pk, instance.course_id)
+    instance._old_course_id = instance.course_id
+
+
+# -----------------------
+# KPI админки (dashboard.py)
+# -----------------------
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_dashboard(sender, **kwargs):
+    from .dashboard import invalidate_kpis
+
+    invalidate_kpis()
+
+
+@receiver(m2m_changed, sender=Group.students.through)
+def invalidate_enrollment_dashboard(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        from .dashboard import invalidate_kpis
+
+        invalidate_kpis()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_student_dashboard(sender, instance, update_fields=None, **kwargs):
+    # активные студенты; обновление last_login при входе пропускаем
+    if update_fields is not None and not {'role', 'is_active'} & set(update_fields):
+        return
+    if instance.role == Role.STUDENT:
+        from .dashboard import invalidate_kpis
 
+        invalidate_kpis()
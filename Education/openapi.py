@@ -0,0 +1,103 @@
+"""
+OpenAPI-схема как готовый файл.
+
+manage.py build_schema (шаг сборки образа) один раз генерирует схему
+drf-spectacular в OPENAPI_SCHEMA_DIR (schema.yaml и schema.json).
+/api/schema/ отдаёт файл из памяти с ETag и Cache-Control; живая генерация
+на каждый запрос — только при DEBUG.
+
+Расширения ниже описывают наши подклассы simplejwt так же, как исходные
+классы (drf-spectacular сопоставляет расширения по точному классу).
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from drf_spectacular.contrib.rest_framework_simplejwt import (
+    SimpleJWTScheme,
+    TokenObtainPairSerializerExtension,
+    TokenRefreshSerializerExtension,
+)
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+logger = logging.getLogger(__name__)
+
+RENDERERS = {"yaml": OpenApiYamlRenderer, "json": OpenApiJsonRenderer}
+CACHE_MAX_AGE = 60 * 60
+
+# формат -> (mtime файла, содержимое, etag)
+_loaded = {}
+
+
+class StatelessJWTScheme(SimpleJWTScheme):
+    target_class = "Education.authentication.StatelessJWTAuthentication"
+
+
+class ClaimsTokenObtainPairSerializerExtension(TokenObtainPairSerializerExtension):
+    target_class = "Education.authentication.ClaimsTokenObtainPairSerializer"
+
+
+class ClaimsTokenRefreshSerializerExtension(TokenRefreshSerializerExtension):
+    target_class = "Education.authentication.ClaimsTokenRefreshSerializer"
+
+
+def schema_path(fmt):
+    return os.path.join(settings.OPENAPI_SCHEMA_DIR, f"schema.{fmt}")
+
+
+def render_schema():
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return {fmt: renderer().render(schema, renderer_context={}) for fmt, renderer in RENDERERS.items()}
+
+
+def build_schema():
+    os.makedirs(settings.OPENAPI_SCHEMA_DIR, exist_ok=True)
+    paths = []
+    for fmt, content in render_schema().items():
+        path = schema_path(fmt)
+        with open(path, "wb") as fh:
+            fh.write(content)
+        paths.append(path)
+    return paths
+
+
+def load_schema(fmt):
+    """Содержимое файла схемы и его ETag; файл перечитывается, только если изменился."""
+    path = schema_path(fmt)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        mtime = None
+    cached = _loaded.get(fmt)
+    if cached is None or cached[0] != mtime:
+        if mtime is None:
+            # образ собран без build_schema: генерируем один раз на процесс, а не на каждый запрос
+            logger.warning("OpenAPI schema %s not found, run 'manage.py build_schema'", path)
+            content = render_schema()[fmt]
+        else:
+            with open(path, "rb") as fh:
+                content = fh.read()
+        cached = _loaded[fmt] = (mtime, content, f'"{hashlib.md5(content).hexdigest()}"')
+    return cached[1], cached[2]
+
+
+class PrecomputedSchemaView(SpectacularAPIView):
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if settings.DEBUG:
+            return super().get(request, *args, **kwargs)
+
+        media_type = request.accepted_renderer.media_type
+        content, etag = load_schema("json" if "json" in media_type else "yaml")
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=media_type)
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=CACHE_MAX_AGE)
+        return response
@@ -4,5 +4,5 @@ from .models import Role
 class GroupPermission(BasePermission):
     def has_permission(self, request, view):
         if request.user.is_authenticated and request.user.role == Role.TEACHER:
-            return view.action in ['list', 'retrieve']
+            return view.action in ['list', 'retrieve', 'attendance_matrix']
         return True
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Профилирование отдельного запроса по требованию (только staff/superuser).
+
+?_profile=1 (или заголовок X-Profile: 1) — вместо обычного ответа вернуть
+отчёт cProfile и список SQL; ?_profile=json — то же в JSON;
+?_profile=store — сохранить .prof в PROFILER_DIR (открывается snakeviz/pstats)
+и вернуть обычный ответ с заголовком X-Profile-Id.
+Работает и для админки, и для API (JWT проверяется здесь же).
+Включается только явно: PROFILER_ENABLED (DJANGO_PROFILER_ENABLED=True).
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+
+from .slowlog import call_site
+
+PARAM = "_profile"
+HEADER = "X-Profile"
+TOP_FUNCTIONS = 40
+
+# cProfile нельзя запускать в двух потоках одновременно
+_lock = threading.Lock()
+
+
+class SQLRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "sql": sql,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+                "call_site": call_site(),
+            })
+
+
+def _is_allowed(request):
+    user = getattr(request, "user", None)  # в API-профиле нет AuthenticationMiddleware
+    if (user is None or not user.is_authenticated) and "HTTP_AUTHORIZATION" in request.META:
+        from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+        from .authentication import StatelessJWTAuthentication
+
+        try:
+            authenticated = StatelessJWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            authenticated = None
+        if authenticated:
+            user = authenticated[0]
+    return user is not None and user.is_authenticated and (user.is_staff or user.is_superuser)
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get(PARAM) or request.headers.get(HEADER)
+        if not mode or not getattr(settings, "PROFILER_ENABLED", False) or not _is_allowed(request):
+            return self.get_response(request)
+
+        if PARAM in request.GET:
+            # changelist админки считает незнакомые GET-параметры фильтрами
+            request.GET = request.GET.copy()
+            del request.GET[PARAM]
+
+        if not _lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response[HEADER] = "busy"
+            return response
+        try:
+            profiler, recorder = cProfile.Profile(), SQLRecorder()
+            started = time.perf_counter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                    if hasattr(response, "render") and not response.is_rendered:
+                        response.render()
+                finally:
+                    profiler.disable()
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            _lock.release()
+
+        stats = pstats.Stats(profiler)
+        if mode == "store":
+            response[f"{HEADER}-Id"] = self._store(stats)
+            return response
+        if mode == "json":
+            return JsonResponse(self._as_json(request, response, elapsed, stats, recorder.queries))
+        return HttpResponse(
+            self._as_text(request, response, elapsed, stats, recorder.queries),
+            content_type="text/plain; charset=utf-8",
+        )
+
+    # -----------------------
+    # Отчёты
+    # -----------------------
+    def _store(self, stats):
+        directory = getattr(settings, "PROFILER_DIR", None) or os.path.join(settings.BASE_DIR, "profiles")
+        os.makedirs(directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        stats.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+        return profile_id
+
+    def _as_text(self, request, response, elapsed, stats, queries):
+        sql_ms = sum(query["ms"] for query in queries)
+        out = io.StringIO()
+        out.write(
+            f"{request.method} {request.path} -> {response.status_code}: {elapsed:.1f} ms, "
+            f"{len(queries)} SQL queries ({sql_ms:.1f} ms)\n\n== SQL ==\n"
+        )
+        for number, query in enumerate(queries, 1):
+            out.write(f"{number:4}. {query['ms']:8.2f} ms  {query['call_site']}\n      {query['sql']}\n")
+        out.write(f"\n== cProfile (cumulative, top {TOP_FUNCTIONS}) ==\n")
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        out.write(f"== Callers (top {TOP_FUNCTIONS // 4}) ==\n")
+        stats.print_callers(TOP_FUNCTIONS // 4)
+        return out.getvalue()
+
+    def _as_json(self, request, response, elapsed, stats, queries):
+        stats.sort_stats("cumulative")
+        functions = []
+        for func in stats.fcn_list[:TOP_FUNCTIONS]:
+            calls, primitive_calls, tottime, cumtime, callers = stats.stats[func]
+            filename, line, name = func
+            functions.append({
+                "function": f"{filename}:{line}({name})",
+                "ncalls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+                "callers": [f"{c_file}:{c_line}({c_name})" for c_file, c_line, c_name in callers],
+            })
+        return {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(elapsed, 3),
+            "queries": queries,
+            "functions": functions,
+        }
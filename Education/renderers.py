@@ -0,0 +1,45 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # без orjson — обычный json из стандартной библиотеки
+    orjson = None
+
+
+class ICalendarRenderer(BaseRenderer):
+    """Отдаёт готовый текст календаря (RFC 5545) как text/calendar."""
+    media_type = "text/calendar"
+    format = "ics"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # ошибки (403/404) отдаём простым текстом
+            data = data.get("detail", data)
+        return str(data).encode(self.charset)
+
+
+# типы, которых orjson не знает (Decimal, даты с OPT_PASSTHROUGH_DATETIME и т.п.), —
+# ровно как в JSONEncoder DRF: Decimal вне сериализатора — числом (float)
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Вывод совпадает с JSONRenderer DRF (компактный UTF-8);
+    отступы (?indent, browsable API) и отсутствие orjson — через стандартный рендерер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # как в DRF: \u2028 и \u2029 экранируем, чтобы JSON оставался подмножеством JavaScript
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
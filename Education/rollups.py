@@ -0,0 +1,397 @@
+"""
+Месячные сводки посещаемости и платежей для отчётов.
+
+AttendanceMonthly — отметки present/absent по (месяц урока, группа, учитель
+урока), RevenueMonthly — выставлено/оплачено по (месяц created_at платежа,
+группа, курс). Отчёты (API и админка) суммируют эти строки вместо полного
+прохода по Attendance и Payment.
+
+Сводки обновляются приращениями: сигналы models.py передают сюда старое и
+новое состояние записи (прежнее читается одним запросом в pre_save и только
+при изменении нужных полей), и каждая затронутая строка меняется одной командой
+INSERT ... ON CONFLICT DO UPDATE SET x = x + delta. bulk_create
+сигналов не вызывает, поэтому места массового создания (enrollment.py,
+LessonSerializer, админка) вызывают record_attendances / record_payments
+сами. Перенос урока пересчитывает свои ячейки (группа, месяц) из исходных
+таблиц; полный пересчёт — rebuild() и команда backfill_rollups. Перенос уроков в архив
+(archive.py) сводки не меняет, а пересчёт учитывает и ArchivedLesson.
+
+Удаление: у Attendance и Payment нет получателей сигналов удаления, чтобы
+каскад Django удалял их одной командой. Прямое удаление (delete() записи
+или queryset) вычитает их в Attendance.delete / AttendanceQuerySet.delete
+(и так же для Payment); после каскада пересчитываются ячейки удалённого
+урока (lesson_deleted) и удалённого студента (user_cells). Строки сводок
+удалённых групп, курсов и учителей уходят тем же каскадом.
+"""
+from collections import Counter
+from datetime import date, datetime
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DateField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+STATUS_FIELDS = {"present": "present", "absent": "absent"}
+ATTENDANCE_DIMENSIONS = {"group": "group_id", "course": "course_id", "teacher": "teacher_id"}
+REVENUE_DIMENSIONS = {"group": "group_id", "course": "course_id", "teacher": "course__teacher_id"}
+
+
+def month_of(day):
+    """Первое число месяца для даты урока (date или 'YYYY-MM-DD')."""
+    if isinstance(day, str):
+        day = parse_date(day)
+    if isinstance(day, datetime):
+        day = timezone.localtime(day).date() if timezone.is_aware(day) else day.date()
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _upsert(model, key, deltas, defaults):
+    """INSERT ... ON CONFLICT (key) DO UPDATE SET x = x + EXCLUDED.x — одна команда, без гонки (PostgreSQL, SQLite)."""
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    meta = model._meta
+    values = {**key, **defaults, **deltas}
+    fields = [meta.get_field(name) for name in values]
+    columns = ", ".join(qn(field.column) for field in fields)
+    conflict = ", ".join(qn(meta.get_field(name).column) for name in key)
+    table = qn(meta.db_table)
+    updates = ", ".join(
+        f"{qn(column)} = {table}.{qn(column)} + EXCLUDED.{qn(column)}"
+        for column in (meta.get_field(name).column for name in deltas)
+    )
+    params = [field.get_db_prep_save(values[name], connection) for name, field in zip(values, fields)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}",
+            params,
+        )
+
+
+def _apply(model, key, deltas, defaults=None):
+    """
+    Прибавляет deltas (все счётчики строки, в том числе нулевые) к строке key;
+    создаёт её, если строки нет и приращения неотрицательные.
+    """
+    if not any(deltas.values()):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        # только UPDATE: если строки нет (удалена каскадом вместе с группой), уменьшать нечего
+        model.objects.filter(**key).update(**{field: F(field) + delta for field, delta in deltas.items() if delta})
+    else:
+        _upsert(model, key, deltas, defaults or {})
+
+
+# -----------------------
+# Посещаемость
+# -----------------------
+def _lesson_keys(lesson_ids):
+    """lesson_id → (месяц, group_id, teacher_id, course_id)."""
+    from .models import Lesson
+
+    rows = Lesson.objects.filter(pk__in=set(lesson_ids)).values_list("pk", "date", "group_id", "teacher_id", "group__course_id")
+    return {pk: (month_of(day), group_id, teacher_id, course_id) for pk, day, group_id, teacher_id, course_id in rows}
+
+
+def _apply_attendance(rows):
+    """rows: (lesson_id, status, знак ±1)."""
+    rows = [row for row in rows if row[0] is not None and row[1] in STATUS_FIELDS]
+    if not rows:
+        return
+    keys = _lesson_keys(lesson_id for lesson_id, _, _ in rows)
+    totals = {}
+    for lesson_id, status, sign in rows:
+        if lesson_id in keys:
+            counts = totals.setdefault(keys[lesson_id], dict.fromkeys(STATUS_FIELDS.values(), 0))
+            counts[STATUS_FIELDS[status]] += sign
+
+    from .models import AttendanceMonthly
+
+    for (month, group_id, teacher_id, course_id), counts in totals.items():
+        _apply(AttendanceMonthly, {"month": month, "group_id": group_id, "teacher_id": teacher_id},
+               counts, defaults={"course_id": course_id})
+
+
+def record_attendances(attendances, sign=1):
+    """Учитывает созданные bulk_create (или, с sign=-1, удалённые массово) отметки."""
+    _apply_attendance([(a.lesson_id, a.status, sign) for a in attendances])
+
+
+def attendance_changed(old, new):
+    """
+    old/new — (lesson_id, status) до и после изменения; None — записи не было / больше нет.
+    """
+    if old == new:
+        return
+    rows = []
+    if old is not None:
+        rows.append((*old, -1))
+    if new is not None:
+        rows.append((*new, 1))
+    _apply_attendance(rows)
+
+
+def attendances_deleted(rows):
+    """rows — (lesson_id, status) удалённых отметок."""
+    _apply_attendance([(lesson_id, status, -1) for lesson_id, status in rows])
+
+
+def lesson_deleted(group_id, day):
+    """Пересчитывает ячейку удалённого урока: его отметки удалены каскадом без сигналов."""
+    from .models import AttendanceMonthly
+
+    month = month_of(day)
+    # при удалении группы или учителя строки сводки уже удалены тем же каскадом
+    if AttendanceMonthly.objects.filter(group_id=group_id, month=month).exists():
+        rebuild_attendance({(group_id, month)})
+
+
+def lesson_moved(old, new):
+    """old/new — (дата, group_id, teacher_id) урока до и после сохранения."""
+    if old == new or None in old:
+        return
+    rebuild_attendance({(old[1], month_of(old[0])), (new[1], month_of(new[0]))})
+
+
+def group_course_changed(group_id, course_id):
+    from .models import AttendanceMonthly
+
+    AttendanceMonthly.objects.filter(group_id=group_id).update(course_id=course_id)
+
+
+def rebuild_lessons(lesson_ids):
+    """Пересчитывает ячейки (группа, месяц), в которые входят уроки."""
+    keys = _lesson_keys(lesson_id for lesson_id in lesson_ids if lesson_id is not None)
+    rebuild_attendance({(group_id, month) for month, group_id, _, _ in keys.values()})
+
+
+# -----------------------
+# Платежи
+# -----------------------
+def _payment_row(payment, sign):
+    return (payment.created_at, payment.group_id, payment.course_id, payment.amount_due, payment.is_paid, sign)
+
+
+def _apply_revenue(rows):
+    """rows: (created_at, group_id, course_id, amount_due, is_paid, знак ±1)."""
+    totals = {}
+    for created_at, group_id, course_id, amount_due, is_paid, sign in rows:
+        if created_at is None or group_id is None or course_id is None:
+            continue
+        counts = totals.setdefault((month_of(created_at), group_id, course_id), {
+            "payments": 0, "paid_payments": 0, "amount_due": 0, "amount_paid": 0,
+        })
+        counts["payments"] += sign
+        counts["amount_due"] += sign * amount_due
+        if is_paid:
+            counts["paid_payments"] += sign
+            counts["amount_paid"] += sign * amount_due
+
+    from .models import RevenueMonthly
+
+    for (month, group_id, course_id), counts in totals.items():
+        _apply(RevenueMonthly, {"month": month, "group_id": group_id, "course_id": course_id}, counts)
+
+
+def record_payments(payments, sign=1):
+    """Учитывает созданные bulk_create (или, с sign=-1, удалённые массово) платежи."""
+    _apply_revenue([_payment_row(payment, sign) for payment in payments])
+
+
+def payments_deleted(rows):
+    """rows — (created_at, group_id, course_id, amount_due, is_paid) удалённых платежей."""
+    _apply_revenue([(*row, -1) for row in rows])
+
+
+def payment_changed(old, new):
+    """
+    old/new — (created_at, group_id, course_id, amount_due, is_paid) до и после
+    изменения; None — платежа не было / больше нет.
+    """
+    if old == new:
+        return
+    rows = []
+    if old is not None:
+        rows.append((*old, -1))
+    if new is not None:
+        rows.append((*new, 1))
+    _apply_revenue(rows)
+
+
+# -----------------------
+# Пересчёт из исходных таблиц
+# -----------------------
+def _cells_filter(cells, group_field, date_field):
+    """Q по ячейкам (group_id, month); cells=None — все строки."""
+    if cells is None:
+        return Q()
+    q = Q(pk__in=[])
+    for group_id, month in cells:
+        q |= Q(**{group_field: group_id, f"{date_field}__gte": month, f"{date_field}__lt": next_month(month)})
+    return q
+
+
+def user_cells(user_id):
+    """Ячейки (group_id, month) отметок и платежей пользователя: (посещаемость, выручка)."""
+    from .models import Attendance, Payment
+
+    attendance = (
+        Attendance.objects.filter(student_id=user_id)
+        .annotate(rollup_month=TruncMonth("lesson__date"))
+        .values_list("lesson__group_id", "rollup_month").order_by().distinct()
+    )
+    revenue = (
+        Payment.objects.filter(student_id=user_id)
+        .annotate(rollup_month=TruncMonth("created_at", output_field=DateField()))
+        .values_list("group_id", "rollup_month").order_by().distinct()
+    )
+    return set(attendance), set(revenue)
+
+
+def _archived_attendance(cells):
+    """Отметки архива (archive.py): (месяц, group_id, teacher_id, course_id) → Counter(present=, absent=)."""
+    from .matrix import CODES
+    from .models import ArchivedLesson
+
+    statuses = {code: status for status, code in CODES.items()}
+    totals = {}
+    rows = ArchivedLesson.objects.filter(_cells_filter(cells, "group_id", "date")).values_list(
+        "date", "group_id", "teacher_id", "group__course_id", "attendance",
+    )
+    for day, group_id, teacher_id, course_id, attendance in rows.iterator():
+        counts = totals.setdefault((month_of(day), group_id, teacher_id, course_id), Counter())
+        counts.update(statuses[code] for code in attendance.values() if code in statuses)
+    return totals
+
+
+def rebuild_attendance(cells=None, batch_size=5_000):
+    """
+    Пересчитывает AttendanceMonthly для ячеек (group_id, month) или целиком
+    (cells=None): по Attendance и по архиву уроков завершённых групп.
+    """
+    from .models import Attendance, AttendanceMonthly
+
+    cells = None if cells is None else sorted(cells)
+    if cells == []:
+        return 0
+    rows = (
+        Attendance.objects.filter(_cells_filter(cells, "lesson__group_id", "lesson__date"))
+        .annotate(rollup_month=TruncMonth("lesson__date"))
+        .values("rollup_month", "lesson__group_id", "lesson__teacher_id", "lesson__group__course_id")
+        .annotate(
+            total_present=Count("pk", filter=Q(status="present")),
+            total_absent=Count("pk", filter=Q(status="absent")),
+        )
+        .order_by()
+    )
+    totals = _archived_attendance(cells)
+    for row in rows:
+        key = (row["rollup_month"], row["lesson__group_id"], row["lesson__teacher_id"], row["lesson__group__course_id"])
+        counts = totals.setdefault(key, Counter())
+        counts.update(present=row["total_present"], absent=row["total_absent"])
+    objs = [
+        AttendanceMonthly(month=month, group_id=group_id, teacher_id=teacher_id, course_id=course_id,
+                          present=counts["present"], absent=counts["absent"])
+        for (month, group_id, teacher_id, course_id), counts in totals.items()
+    ]
+    with transaction.atomic():
+        AttendanceMonthly.objects.filter(_cells_filter(cells, "group_id", "month")).delete()
+        AttendanceMonthly.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
+
+
+def rebuild_revenue(cells=None, batch_size=5_000):
+    """Пересчитывает RevenueMonthly для ячеек (group_id, month) или целиком (cells=None)."""
+    from .models import Payment, RevenueMonthly
+
+    cells = None if cells is None else sorted(cells)
+    if cells == []:
+        return 0
+    zero = Value(0, output_field=Payment._meta.get_field("amount_due"))
+    rows = (
+        Payment.objects.filter(_cells_filter(cells, "group_id", "created_at__date"))
+        .annotate(rollup_month=TruncMonth("created_at", output_field=DateField()))
+        .values("rollup_month", "group_id", "course_id")
+        .annotate(
+            total_payments=Count("pk"),
+            total_paid_payments=Count("pk", filter=Q(is_paid=True)),
+            total_due=Coalesce(Sum("amount_due"), zero),
+            total_paid=Coalesce(Sum("amount_due", filter=Q(is_paid=True)), zero),
+        )
+        .order_by()
+    )
+    objs = [
+        RevenueMonthly(
+            month=row["rollup_month"], group_id=row["group_id"], course_id=row["course_id"],
+            payments=row["total_payments"], paid_payments=row["total_paid_payments"],
+            amount_due=row["total_due"], amount_paid=row["total_paid"],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        RevenueMonthly.objects.filter(_cells_filter(cells, "group_id", "month")).delete()
+        RevenueMonthly.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
+
+
+def rebuild(batch_size=5_000):
+    """Полный пересчёт обеих сводок. Возвращает число строк (посещаемость, выручка)."""
+    with transaction.atomic():
+        return rebuild_attendance(batch_size=batch_size), rebuild_revenue(batch_size=batch_size)
+
+
+# -----------------------
+# Отчёты
+# -----------------------
+def _rate(part, total):
+    return round(float(part) / float(total), 4) if total else None
+
+
+def attendance_report(queryset, by=None):
+    """Строки {month, <by>, present, absent, rate} из AttendanceMonthly, по месяцам."""
+    fields = ["month"] + ([ATTENDANCE_DIMENSIONS[by]] if by else [])
+    rows = (
+        queryset.values(*fields)
+        .annotate(total_present=Sum("present"), total_absent=Sum("absent"))
+        .order_by(*fields)
+    )
+    return [
+        {
+            "month": row["month"],
+            **({by: row[ATTENDANCE_DIMENSIONS[by]]} if by else {}),
+            "present": row["total_present"],
+            "absent": row["total_absent"],
+            "rate": _rate(row["total_present"], row["total_present"] + row["total_absent"]),
+        }
+        for row in rows
+    ]
+
+
+def revenue_report(queryset, by=None):
+    """Строки {month, <by>, payments, paid_payments, amount_due, amount_paid, collected_rate} из RevenueMonthly."""
+    fields = ["month"] + ([REVENUE_DIMENSIONS[by]] if by else [])
+    rows = (
+        queryset.values(*fields)
+        .annotate(
+            total_payments=Sum("payments"), total_paid_payments=Sum("paid_payments"),
+            total_due=Sum("amount_due"), total_paid=Sum("amount_paid"),
+        )
+        .order_by(*fields)
+    )
+    return [
+        {
+            "month": row["month"],
+            **({by: row[REVENUE_DIMENSIONS[by]]} if by else {}),
+            "payments": row["total_payments"],
+            "paid_payments": row["total_paid_payments"],
+            "amount_due": row["total_due"],
+            "amount_paid": row["total_paid"],
+            "collected_rate": _rate(row["total_paid"], row["total_due"]),
+        }
+        for row in rows
+    ]
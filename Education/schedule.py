@@ -0,0 +1,203 @@
+"""
+Расписание уроков для учителя и группы.
+
+Расписание строится из Lesson один раз и хранится в кэше целиком
+(список уроков + готовый .ics), поэтому повторные запросы календарных
+клиентов обслуживаются из кэша без обращения к БД. Кэш сбрасывается
+сигналами при изменении уроков (см. models.py), а заполняется чтением с
+primary: отставшая реплика не должна попасть в кэш на сутки.
+
+Ссылка на фид подписана и привязана к пользователю, которому выдана: при
+каждом обращении проверяются его активность, текущее право на расписание
+(роль, состав групп) и версия ссылок User.feed_token_version —
+revoke_feed_tokens() увеличивает её и отзывает все выданные ссылки.
+Проверка идёт по кэшам состояния пользователя (authentication.user_states)
+и области видимости (scope.py), поэтому фид по-прежнему отдаётся без
+запросов к БД; в других процессах отзыв вступает в силу не позже чем через
+JWT_USER_STATE_TTL секунд.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .db_router import primary
+from .metrics import record_cache
+
+TEACHER = "teacher"
+GROUP = "group"
+KINDS = (TEACHER, GROUP)
+
+SCHEDULE_CACHE_TIMEOUT = getattr(settings, "SCHEDULE_CACHE_TIMEOUT", 60 * 60 * 24)
+FEED_TOKEN_SALT = "Education.schedule.feed"
+FEED_TOKEN_MAX_AGE = getattr(settings, "FEED_TOKEN_MAX_AGE", 60 * 60 * 24 * 365)
+
+
+def _cache_key(kind, pk, suffix="lessons"):
+    return f"schedule:{kind}:{pk}:{suffix}"
+
+
+# -----------------------
+# Данные расписания
+# -----------------------
+def get_schedule(kind, pk):
+    """Все уроки учителя/группы, отсортированные по дате (из кэша)."""
+    key = _cache_key(kind, pk)
+    lessons = cache.get(key)
+    record_cache("schedule", lessons is not None)
+    if lessons is None:
+        from .models import Lesson
+
+        with primary():
+            lessons = list(
+                Lesson.objects.filter(**{f"{kind}_id": pk})
+                .order_by("date", "id")
+                .values("id", "topic", "date", "group_id", "group__name", "teacher_id", "teacher__full_name")
+            )
+        cache.set(key, lessons, SCHEDULE_CACHE_TIMEOUT)
+    return lessons
+
+
+def filter_by_dates(lessons, start=None, end=None):
+    return [
+        lesson for lesson in lessons
+        if (start is None or lesson["date"] >= start) and (end is None or lesson["date"] <= end)
+    ]
+
+
+def invalidate_schedule(teacher_ids=(), group_ids=()):
+    keys = []
+    for kind, ids in ((TEACHER, teacher_ids), (GROUP, group_ids)):
+        for pk in set(ids):
+            if pk is not None:
+                keys += [_cache_key(kind, pk), _cache_key(kind, pk, "ics")]
+    if keys:
+        # после COMMIT: иначе параллельный запрос положил бы в кэш на сутки расписание до изменения
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# -----------------------
+# iCalendar (RFC 5545)
+# -----------------------
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Перенос строк длиннее 75 октетов (RFC 5545, 3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], b""
+    for char in line:
+        char_bytes = char.encode("utf-8")
+        limit = 75 if not parts else 74
+        if len(current) + len(char_bytes) > limit:
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += char_bytes
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def build_ics(kind, pk, lessons):
+    stamp = datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Edora//Timetable//RU",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:Edora {kind} {pk}",
+    ]
+    for lesson in lessons:
+        day = lesson["date"]
+        description = f"{lesson['group__name']} — {lesson['teacher__full_name']}"
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:lesson-{lesson['id']}@edora",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+            f"SUMMARY:{_escape(lesson['topic'])}",
+            f"DESCRIPTION:{_escape(description)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def get_ics(kind, pk):
+    """Готовый .ics для учителя/группы (из кэша)."""
+    key = _cache_key(kind, pk, "ics")
+    body = cache.get(key)
+    record_cache("schedule_ics", body is not None)
+    if body is None:
+        body = build_ics(kind, pk, get_schedule(kind, pk))
+        cache.set(key, body, SCHEDULE_CACHE_TIMEOUT)
+    return body
+
+
+# -----------------------
+# Подписанные ссылки на фид
+# -----------------------
+def can_view(user, kind, pk):
+    """Может ли пользователь смотреть расписание учителя/группы pk."""
+    from .models import Role
+    from .scope import get_user_scope
+
+    if user.is_superuser or user.is_staff or user.role == Role.ADMIN:
+        return True
+    if kind == TEACHER:
+        return user.role == Role.TEACHER and user.pk == pk
+    return get_user_scope(user).can_see_group(pk)
+
+
+def make_feed_token(user_id, kind, pk):
+    from .models import User
+
+    with primary():
+        version = User.objects.filter(pk=user_id).values_list("feed_token_version", flat=True).get()
+    return signing.dumps([kind, pk, user_id, version], salt=FEED_TOKEN_SALT, compress=True)
+
+
+def read_feed_token(token):
+    """
+    Возвращает (kind, pk) или None, если токен подделан или истёк, ссылки
+    пользователя отозваны либо он больше не может видеть это расписание.
+    """
+    from .authentication import user_states
+    from .models import User
+
+    try:
+        kind, pk, user_id, version = signing.loads(token, salt=FEED_TOKEN_SALT, max_age=FEED_TOKEN_MAX_AGE)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if kind not in KINDS:
+        return None
+    state = user_states.get(user_id)
+    if state is None or not state["is_active"] or state["feed_token_version"] != version:
+        return None
+    holder = User(pk=user_id, role=state["role"], is_staff=state["is_staff"], is_superuser=state["is_superuser"])
+    if not can_view(holder, kind, pk):
+        return None
+    return kind, pk
+
+
+def revoke_feed_tokens(user_ids):
+    """Отзывает все выданные пользователям ссылки на фиды."""
+    from .authentication import user_states
+    from .models import User
+
+    user_ids = list(user_ids)
+    User.objects.filter(pk__in=user_ids).update(feed_token_version=F("feed_token_version") + 1)
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: user_states.invalidate(user_id))
@@ -0,0 +1,126 @@
+"""
+Область видимости пользователя: какие группы, курсы, студенты и учителя ему доступны.
+
+Множества id считаются одним набором запросов, хранятся в кэше
+(SCOPE_CACHE_TIMEOUT) и на время запроса запоминаются на объекте request,
+поэтому ViewSet-ы, проверки доступа и get_queryset админки фильтруют по
+готовым id (pk__in) вместо собственных join-ов через Group.students и
+Course.teacher. Кэш сбрасывается сигналами при изменении состава групп,
+самих групп и курсов (см. models.py) — после COMMIT транзакции, иначе
+параллельный запрос успел бы положить в кэш состояние до неё; смена роли
+пользователя делает его запись в кэше недействительной автоматически.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .db_router import primary
+from .metrics import record_cache
+
+SCOPE_CACHE_TIMEOUT = getattr(settings, "SCOPE_CACHE_TIMEOUT", 60 * 10)
+
+
+def _cache_key(user_id):
+    return f"scope:user:{user_id}"
+
+
+class Scope:
+    """Видимые пользователю id; для unrestricted (администратор) фильтры не применяются."""
+
+    def __init__(self, user_id, role, unrestricted=False, group_ids=(), course_ids=(), student_ids=(), teacher_ids=()):
+        self.user_id = user_id
+        self.role = role
+        self.unrestricted = unrestricted
+        self.group_ids = frozenset(group_ids)
+        self.course_ids = frozenset(course_ids)
+        self.student_ids = frozenset(student_ids)
+        self.teacher_ids = frozenset(teacher_ids)
+
+    def _filter(self, queryset, ids, field):
+        if self.unrestricted:
+            return queryset
+        return queryset.filter(**{f"{field}__in": sorted(ids)})
+
+    def groups(self, queryset, field="pk"):
+        return self._filter(queryset, self.group_ids, field)
+
+    def courses(self, queryset, field="pk"):
+        return self._filter(queryset, self.course_ids, field)
+
+    def students(self, queryset, field="pk"):
+        return self._filter(queryset, self.student_ids, field)
+
+    def can_see_group(self, group_id):
+        return self.unrestricted or group_id in self.group_ids
+
+
+# -----------------------
+# Вычисление и кэш
+# -----------------------
+def get_scope(request):
+    """Область видимости request.user: один раз за запрос, между запросами — из кэша."""
+    user = request.user
+    scope = getattr(request, "_scope", None)
+    if scope is not None and scope.user_id == user.pk:
+        return scope
+    scope = request._scope = get_user_scope(user)
+    return scope
+
+
+def get_user_scope(user):
+    """Область видимости пользователя из кэша (вне запроса — например, для календарного фида)."""
+    from .models import Role
+
+    role = getattr(user, "role", None)
+    if not user.is_authenticated:
+        return Scope(None, None)
+    if user.is_superuser or role == Role.ADMIN:
+        return Scope(user.pk, role, unrestricted=True)
+    key = _cache_key(user.pk)
+    scope = cache.get(key)
+    record_cache("scope", scope is not None and scope.role == role)
+    if scope is None or scope.role != role:
+        scope = build_scope(user)
+        cache.set(key, scope, SCOPE_CACHE_TIMEOUT)
+    return scope
+
+
+def build_scope(user):
+    from .models import Course, Group, Role
+
+    through = Group.students.through
+    # сразу после записи реплика может отставать, а результат кэшируется надолго
+    with primary():
+        if user.role == Role.TEACHER:
+            course_ids = set(Course.objects.filter(teacher=user).values_list("pk", flat=True))
+            group_ids = set(Group.objects.filter(course_id__in=course_ids).values_list("pk", flat=True))
+            teacher_ids = {user.pk}
+        elif user.role == Role.STUDENT:
+            group_ids = set(through.objects.filter(user_id=user.pk).values_list("group_id", flat=True))
+            groups = Group.objects.filter(pk__in=group_ids, course__isnull=False)
+            pairs = list(groups.values_list("course_id", "course__teacher_id"))
+            course_ids = {course_id for course_id, _ in pairs}
+            teacher_ids = {teacher_id for _, teacher_id in pairs}
+        else:
+            return Scope(user.pk, user.role)
+        student_ids = set(through.objects.filter(group_id__in=group_ids).values_list("user_id", flat=True))
+    return Scope(user.pk, user.role, group_ids=group_ids, course_ids=course_ids,
+                 student_ids=student_ids, teacher_ids=teacher_ids)
+
+
+def invalidate_scope(user_ids):
+    keys = [_cache_key(pk) for pk in set(user_ids) if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def group_audience(group_ids):
+    """Пользователи, чья область видимости зависит от групп: их студенты и учителя курсов."""
+    from .models import Group
+
+    group_ids = list(group_ids)
+    if not group_ids:
+        return set()
+    user_ids = set(Group.students.through.objects.filter(group_id__in=group_ids).values_list("user_id", flat=True))
+    user_ids.update(Group.objects.filter(pk__in=group_ids).values_list("course__teacher_id", flat=True))
+    return user_ids
@@ -0,0 +1,150 @@
+"""
+Индексированный поиск по пользователям, урокам, курсам и группам.
+
+Вместо icontains по нескольким колонкам (полный проход по таблице):
+- PostgreSQL: tsvector + pg_trgm по одному выражению-документу (GIN-индексы);
+- SQLite: FTS5-таблицы с триграммным токенизатором (локально и в тестах).
+Индексы создаются миграциями 0003_search_indexes и 0005 (группы), DDL в
+них скопирован: новый документ или другие поля — новая миграция, причём
+выражение в ней должно совпадать с SearchDocument.pg_document(). Если
+индекса нет (другая СУБД, SQLite без FTS5) или запрос короче 3 символов —
+обычный icontains.
+"""
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+MIN_TERM_LENGTH = 3
+
+
+class SearchDocument:
+    def __init__(self, table, fields):
+        self.table = table
+        self.fields = fields
+
+    @property
+    def fts_table(self):
+        return f"{self.table.lower()}_fts"
+
+    def pg_document(self, qualified=False):
+        prefix = f'"{self.table}".' if qualified else ""
+        return " || ' ' || ".join(f"coalesce({prefix}\"{field}\", '')" for field in self.fields)
+
+
+SEARCH_DOCUMENTS = {
+    "user": SearchDocument("Education_user", ["username", "full_name", "email", "phone"]),
+    "course": SearchDocument("Education_course", ["title", "description"]),
+    "lesson": SearchDocument("Education_lesson", ["topic"]),
+    "group": SearchDocument("Education_group", ["name"]),
+}
+
+
+# -----------------------
+# Бэкенды
+# -----------------------
+class PostgresSearchBackend:
+    def match_sql(self, document, term):
+        doc = document.pg_document()
+        sql = (
+            f'SELECT id FROM "{document.table}" '
+            f"WHERE to_tsvector('simple', {doc}) @@ websearch_to_tsquery('simple', %s) "
+            f"OR ({doc}) ILIKE %s"
+        )
+        return sql, [term, _like_pattern(term)]
+
+    def rank(self, queryset, documents, term):
+        document = SEARCH_DOCUMENTS[documents["pk"]]
+        doc = document.pg_document(qualified=True)
+        sql = (
+            f"ts_rank(to_tsvector('simple', {doc}), websearch_to_tsquery('simple', %s)) "
+            f"+ similarity({doc}, %s)"
+        )
+        return queryset.annotate(search_rank=RawSQL(sql, [term, term])).order_by("-search_rank", "pk")
+
+
+class SQLiteFTSBackend:
+    def match_sql(self, document, term):
+        fts = document.fts_table
+        return f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [_fts_query(term)]
+
+    def rank(self, queryset, documents, term):
+        # bm25() доступен только в самом FTS-запросе, поэтому присоединяем
+        # FTS-таблицу (коррелированный подзапрос повторял бы MATCH на каждую строку).
+        # Join оставляет только совпадения по самой модели, поэтому при поиске
+        # ещё и по связанным документам (курс + учитель) ранжирование не делаем.
+        if len(documents) > 1:
+            return queryset
+        document = SEARCH_DOCUMENTS[documents["pk"]]
+        fts = document.fts_table
+        return queryset.extra(
+            select={"search_rank": f"-bm25({fts})"},
+            tables=[fts],
+            where=[f'{fts}.rowid = "{document.table}"."id"', f"{fts} MATCH %s"],
+            params=[_fts_query(term)],
+        ).order_by("-search_rank", "pk")
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend(),
+    "sqlite": SQLiteFTSBackend(),
+}
+
+_fts_available = {}
+
+
+def get_backend(connection):
+    backend = BACKENDS.get(connection.vendor)
+    if connection.vendor == "sqlite":
+        # SQLite может быть собран без FTS5 — тогда миграция индексы не создаст
+        if connection.alias not in _fts_available:
+            fts_table = SEARCH_DOCUMENTS["user"].fts_table
+            _fts_available[connection.alias] = fts_table in connection.introspection.table_names()
+        if not _fts_available[connection.alias]:
+            return None
+    return backend
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_query(term):
+    # каждое слово — отдельная фраза в кавычках, слова объединяются через AND
+    words = [word for word in term.split() if len(word) >= MIN_TERM_LENGTH]
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+# -----------------------
+# Публичный API
+# -----------------------
+def search_queryset(queryset, term, documents, rank=True):
+    """
+    Фильтрует queryset по поисковой строке.
+
+    documents — {путь: документ}, например {"pk": "user"} для самих
+    пользователей или {"student": "user", "lesson": "lesson"} для посещаемости.
+    Если среди путей есть "pk", результат сортируется по релевантности
+    (на SQLite — только при поиске по одному документу).
+    """
+    term = (term or "").strip()
+    if not term:
+        return queryset
+
+    backend = get_backend(connections[queryset.db])
+    use_index = backend is not None and bool(_fts_query(term))
+
+    condition = Q(pk=int(term)) if term.isdigit() and "pk" in documents else Q()
+    for path, name in documents.items():
+        document = SEARCH_DOCUMENTS[name]
+        if use_index:
+            condition |= Q(**{f"{path}__in": RawSQL(*backend.match_sql(document, term))})
+        else:
+            prefix = "" if path == "pk" else f"{path}__"
+            for field in document.fields:
+                condition |= Q(**{f"{prefix}{field}__icontains": term})
+
+    queryset = queryset.filter(condition)
+    if use_index and rank and "pk" in documents:
+        queryset = backend.rank(queryset, documents, term)
+    return queryset
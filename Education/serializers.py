@@ -40,21 +40,68 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from Education.membership import group_students
+from Education.rollups import record_attendances
 from Education.models import Group, Course
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список id проверяется одним запросом (in_bulk), а не запросом на каждый id; результат — объекты модели."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        pks = []
+        for item in data:
+            if isinstance(item, bool) or not isinstance(item, (int, str)) or not str(item).isdigit():
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            pks.append(int(item))
+        objects = child.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который при many=True проверяет весь список одним запросом."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
 class GroupSerializer(serializers.ModelSerializer):
   
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all(), required=False, allow_null=True)
-    students = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), many=True, required=False)
+    # не студенты отклоняются во view
+    students = BulkPrimaryKeyRelatedField(queryset=User.objects.all(), many=True, required=False)
 
     class Meta:
         model = Group
         fields = ['id', 'name', 'course', 'students']
 
 
+class GroupEnrollmentSerializer(serializers.Serializer):
+    students = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+
+class GroupTransferSerializer(serializers.Serializer):
+    students = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    to = serializers.PrimaryKeyRelatedField(queryset=Group.objects.select_related('course'))
+
+
 
 
 from rest_framework import serializers
@@ -119,16 +166,18 @@ class LessonSerializer(serializers.ModelSerializer):
         # Создаём Lesson
         lesson = super().create(validated_data)
 
-        # Получаем всех студентов из группы
-        group = lesson.group
-        students = group.students.filter(role='student')  # фильтрация по роли
+        # Получаем всех студентов из группы (состав — по индексу, роль — одним запросом)
+        student_ids = User.objects.filter(
+            pk__in=list(group_students(lesson.group_id)), role=Role.STUDENT,
+        ).values_list('pk', flat=True)
 
         # Создаём attendance со статусом 'present'
         attendances = [
-            Attendance(student=student, lesson=lesson, status='present')
-            for student in students
+            Attendance(student_id=student_id, lesson=lesson, status='present')
+            for student_id in student_ids
         ]
 
         Attendance.objects.bulk_create(attendances)
+        record_attendances(attendances)
 
         return lesson
@@ -0,0 +1,144 @@
+"""
+Журнал медленных запросов и SQL (логгер "Education.slow").
+
+- запрос дольше SLOW_LOG["REQUEST_MS"] логируется всегда (это дёшево);
+- SQL отслеживается только в выборке запросов (SLOW_LOG["SAMPLE_RATE"]):
+  медленные statements (дольше QUERY_MS) и повторы одного и того же SQL
+  (REPEAT_THRESHOLD раз и больше — типичный N+1) логируются с местом в коде
+  проекта, откуда пришёл запрос.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("Education.slow")
+
+DEFAULTS = {
+    "REQUEST_MS": 500,
+    "QUERY_MS": 100,
+    "SAMPLE_RATE": 0.05,
+    "REPEAT_THRESHOLD": 5,
+}
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_WRAPPER_ARGS = ("execute", "sql", "params", "many", "context")
+_ORM_DIR = os.path.join("django", "db", "")
+# middleware-обвязка проекта вокруг запроса — тоже не источник SQL
+INSTRUMENTATION_MODULES = ("Education/metrics.py", "Education/slowlog.py", "Education/profiling.py")
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "SLOW_LOG", {})}
+
+
+def fingerprint(sql):
+    # разное число параметров в IN (...) — всё равно один и тот же запрос
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def _is_execute_wrapper(code):
+    # обёртки connection.execute_wrapper (метрики, этот журнал и т.п.) — не источник запроса
+    args = code.co_varnames[:code.co_argcount]
+    return args[-5:] == _WRAPPER_ARGS
+
+
+def call_site():
+    """
+    Первый кадр стека из кода проекта (не Django/DRF/site-packages).
+    Если запрос целиком из библиотек (сессии, админка) — первый кадр вне ORM.
+    """
+    base_dir = str(settings.BASE_DIR)
+    fallback = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        relative = code.co_filename[len(base_dir) + 1:].replace(os.sep, "/")
+        if (
+            code.co_filename.startswith(base_dir)
+            and "site-packages" not in code.co_filename
+            and relative not in INSTRUMENTATION_MODULES
+            and not _is_execute_wrapper(code)
+        ):
+            return f"{relative}:{frame.f_lineno} in {code.co_name}"
+        if (
+            fallback is None
+            and _ORM_DIR not in code.co_filename
+            and relative not in INSTRUMENTATION_MODULES
+            and not _is_execute_wrapper(code)
+        ):
+            library_path = code.co_filename.rsplit("site-packages" + os.sep, 1)[-1]
+            fallback = f"{library_path}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+class QueryTracker:
+    def __init__(self, config):
+        self.query_ms = config["QUERY_MS"]
+        self.slow = []
+        self.repeats = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            key = fingerprint(sql)
+            entry = self.repeats.get(key)
+            if entry is None:
+                # место вызова запоминаем только для первого появления запроса
+                self.repeats[key] = [1, call_site()]
+            else:
+                entry[0] += 1
+            if elapsed >= self.query_ms:
+                self.slow.append((elapsed, sql, self.repeats[key][1]))
+
+
+class SlowLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        tracker = QueryTracker(config) if random.random() < config["SAMPLE_RATE"] else None
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            if tracker is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(tracker))
+            response = self.get_response(request)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+        if elapsed >= config["REQUEST_MS"]:
+            logger.warning(
+                "slow request %s %s (%s): %.0f ms, status %s",
+                request.method, request.path, view, elapsed, response.status_code,
+                extra={"view": view, "duration_ms": elapsed},
+            )
+        if tracker is not None:
+            self._log_queries(tracker, config, view)
+        return response
+
+    def _log_queries(self, tracker, config, view):
+        for elapsed, sql, site in tracker.slow:
+            logger.warning(
+                "slow query in %s at %s: %.0f ms: %s", view, site, elapsed, sql[:1000],
+                extra={"view": view, "call_site": site, "duration_ms": elapsed},
+            )
+        for sql, (count, site) in tracker.repeats.items():
+            if count >= config["REPEAT_THRESHOLD"]:
+                logger.warning(
+                    "repeated query in %s at %s: %d times (N+1?): %s", view, site, count, sql[:1000],
+                    extra={"view": view, "call_site": site, "repeat_count": count},
+                )
@@ -0,0 +1,117 @@
+"""
+Лёгкий режим чтения для ModelViewSet.
+
+?fields=id,status — в ответе только перечисленные поля (list и retrieve).
+Если ни одно из выбранных полей не вычисляемое (SerializerMethodField,
+m2m, вложенные сериализаторы, свойства модели), list сериализуется прямо
+из .values(): без экземпляров моделей и прохода ModelSerializer по строке.
+Вывод совпадает с обычным (см. SparseFieldsTests).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
+from rest_framework.response import Response
+
+FIELDS_PARAM = "fields"
+
+
+def _values_path(model, field):
+    """Путь для .values() или None, если значение поля нельзя взять из строки таблицы."""
+    if isinstance(field, RelatedField) and not isinstance(field, PrimaryKeyRelatedField):
+        return None
+    if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                          serializers.ManyRelatedField)):
+        return None
+    attrs = field.source_attrs
+    if not attrs:  # source="*"
+        return None
+    for i, attr in enumerate(attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None  # свойство или метод модели
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if i == len(attrs) - 1:
+            # FK как значение — только id через PrimaryKeyRelatedField
+            if model_field.is_relation != isinstance(field, PrimaryKeyRelatedField):
+                return None
+            return "__".join(attrs)
+        # через nullable FK сериализатор пропускает поле целиком, .values() дал бы None
+        if not model_field.is_relation or model_field.null:
+            return None
+        model = model_field.related_model
+
+
+def _converter(field):
+    if isinstance(field, PrimaryKeyRelatedField):
+        # .values() уже отдаёт id, а to_representation ждёт объект
+        return field.pk_field.to_representation if field.pk_field is not None else None
+    return field.to_representation
+
+
+def _serialize_row(plan, row):
+    data = {}
+    for name, path, convert in plan:
+        value = row[path]
+        data[name] = value if value is None or convert is None else convert(value)
+    return data
+
+
+class SparseFieldsMixin:
+    def get_requested_fields(self):
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        raw = request.query_params.get(FIELDS_PARAM)
+        if not raw:
+            return None
+        return [name.strip() for name in raw.split(",") if name.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        requested = self.get_requested_fields()
+        if requested is not None:
+            fields = getattr(serializer, "child", serializer).fields
+            readable = [name for name, field in fields.items() if not field.write_only]
+            unknown = [name for name in requested if name not in readable]
+            if unknown:
+                raise ValidationError({
+                    FIELDS_PARAM: f"Неизвестные поля: {', '.join(unknown)}. Доступны: {', '.join(readable)}."
+                })
+            for name in readable:
+                if name not in requested:
+                    fields.pop(name)
+        return serializer
+
+    def get_values_plan(self, serializer):
+        """[(имя в ответе, путь в .values(), преобразование)] или None, если нужен сериализатор."""
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            return None
+        model = getattr(getattr(serializer, "Meta", None), "model", None)
+        if model is None:
+            return None
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            path = _values_path(model, field)
+            if path is None:
+                return None
+            plan.append((name, path, _converter(field)))
+        return plan
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*{path for _, path, _ in plan})
+        page = self.paginate_queryset(rows)
+        data = [_serialize_row(plan, row) for row in (rows if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,14 @@
+from django import template
+
+from Education.dashboard import get_kpis
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def admin_kpis(context):
+    """KPI для главной страницы админки; только администраторам (учителям и студентам — None)."""
+    user = context["request"].user
+    if user.is_superuser or getattr(user, "role", None) == "admin":
+        return get_kpis()
+    return None
@@ -1,3 +1,1407 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import runpy
+import subprocess
+import sys
+import tempfile
+import uuid
+from importlib import import_module
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q, Sum
+from django.db.models.deletion import Collector
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import StatelessJWTAuthentication, add_user_claims, user_states
+from .db_router import PIN_COOKIE, PIN_HEADER, ReplicaMiddleware, ReplicaRouter, primary
+from . import archive, dashboard, membership, metrics, openapi, rollups, schedule, search
+from .scope import get_scope
+from .search import search_queryset
+from .slowlog import SlowLogMiddleware, fingerprint
+from .sparse import SparseFieldsMixin
+from .renderers import FastJSONRenderer
+from .models import ArchivedLesson, Attendance, AttendanceMonthly, Course, Group, Lesson, Payment, RevenueMonthly, Role, User
+from .serializers import GroupSerializer, LessonSerializer
+from .views import AttendanceViewSet, CourseViewSet, GroupViewSet, LessonViewSet, UserViewSet
+
+# Таблицы, которые в проде большие: полный проход или сортировка по ним — регрессия
+BIG_TABLES = {
+    "Education_user",
+    "Education_lesson",
+    "Education_attendance",
+    "Education_payment",
+    "Education_group_students",
+}
+
+# Допустимые сортировки: упорядочивание по имени для заведомо небольшого набора строк
+ALLOWED_SORTS = {
+    "UserAdmin (student)": "одноклассники и учителя ученика, объединение трёх условий по id",
+    "PaymentAdmin (student)": "платежи одного студента, сортировка по названию группы",
+    "AttendanceMonthlyAdmin (teacher)": "сводка по группам учителя (группы × месяцы), сортировка по месяцу",
+    "RevenueMonthlyAdmin (teacher)": "сводка по группам учителя (группы × месяцы), сортировка по месяцу",
+}
+
+VIEWSETS = [UserViewSet, GroupViewSet, CourseViewSet, LessonViewSet, AttendanceViewSet]
+
+
+class QueryPlanTests(TestCase):
+    """
+    Снимает EXPLAIN для querysets вьюх и админки (роли teacher/student)
+    и падает, если по большой таблице идёт последовательное сканирование
+    или отдельная сортировка. Для PostgreSQL seqscan/sort отключаются на
+    время EXPLAIN: на маленькой тестовой базе планировщик иначе выберет
+    seqscan, даже когда подходящий индекс есть.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", full_name="Admin", role=Role.ADMIN)
+        cls.teachers = User.objects.bulk_create([
+            User(username=f"teacher{i}", full_name=f"Teacher {i}", role=Role.TEACHER) for i in range(3)
+        ])
+        cls.students = User.objects.bulk_create([
+            User(username=f"student{i}", full_name=f"Student {i}", role=Role.STUDENT) for i in range(60)
+        ])
+        courses = Course.objects.bulk_create([
+            Course(title=f"Course {i}", teacher=teacher, price=100) for i, teacher in enumerate(cls.teachers)
+        ])
+        groups = Group.objects.bulk_create([
+            Group(name=f"Group {i}", course=courses[i % len(courses)]) for i in range(6)
+        ])
+        memberships, lessons = [], []
+        for i, group in enumerate(groups):
+            members = cls.students[i * 10:(i + 1) * 10]
+            memberships += [Group.students.through(group=group, user=student) for student in members]
+            lessons += [
+                Lesson(topic=f"Topic {n}", date=date(2025, 1, 1) + timedelta(days=n),
+                       teacher=group.course.teacher, group=group)
+                for n in range(12)
+            ]
+        Group.students.through.objects.bulk_create(memberships)
+        Lesson.objects.bulk_create(lessons)
+
+        attendances, payments = [], []
+        for membership in memberships:
+            for lesson in Lesson.objects.filter(group_id=membership.group_id):
+                attendances.append(Attendance(student_id=membership.user_id, lesson=lesson, status="present"))
+            payments.append(Payment(
+                student_id=membership.user_id, group_id=membership.group_id,
+                course_id=groups[0].course_id, cycle_index=1, amount_due=100,
+            ))
+        Attendance.objects.bulk_create(attendances)
+        Payment.objects.bulk_create(payments)
+
+    # -----------------------
+    # EXPLAIN
+    # -----------------------
+    def explain(self, queryset):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("SET LOCAL enable_sort = off")
+        return queryset.explain()
+
+    def plan_problems(self, plan):
+        if connection.vendor == "postgresql":
+            scans = re.findall(r'Seq Scan on "?(\w+)"?', plan)
+            sorts = re.findall(r"^\s*(?:->\s*)?(?:Incremental )?Sort\b", plan, re.MULTILINE)
+        else:
+            # SCAN без ограничения (SEARCH — поиск по индексу, он допустим);
+            # в подзапросах SQLite показывает алиас Django (U0, V1) вместо имени таблицы
+            scans = [
+                "subquery " + table if re.fullmatch(r"[A-Z]\d+", table) else table
+                for table in re.findall(r"\bSCAN (\w+)(?! VIRTUAL)", plan)
+            ]
+            sorts = re.findall(r"USE TEMP B-TREE FOR (?:ORDER BY|DISTINCT)", plan)
+        problems = [
+            f"full scan of {table}" for table in scans
+            if table in BIG_TABLES or table.startswith("subquery ")
+        ]
+        return problems + [f"sort: {sort.strip()}" for sort in sorts]
+
+    def assertIndexedPlan(self, queryset, label):
+        plan = self.explain(queryset)
+        problems = self.plan_problems(plan)
+        if label in ALLOWED_SORTS:
+            problems = [problem for problem in problems if not problem.startswith("sort")]
+        self.assertFalse(problems, f"{label}: {', '.join(problems)}\n{plan}")
+
+    def as_user(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        return request
+
+    def scoped_users(self):
+        return [("teacher", self.teachers[0]), ("student", self.students[0])]
+
+    # -----------------------
+    # Тесты
+    # -----------------------
+    def test_viewset_querysets_use_indexes(self):
+        for viewset in VIEWSETS:
+            for role, user in self.scoped_users():
+                with self.subTest(viewset=viewset.__name__, role=role):
+                    view = viewset(request=self.as_user(user), action="list", format_kwarg=None)
+                    page = view.get_queryset()[:20]
+                    self.assertIndexedPlan(page, f"{viewset.__name__} ({role})")
+
+    def test_admin_querysets_use_indexes(self):
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != "Education":
+                continue
+            for role, user in self.scoped_users():
+                queryset = model_admin.get_queryset(self.as_user(user))
+                if not queryset.query.where:
+                    # роль видит всю таблицу — ограничение не задумано
+                    continue
+                with self.subTest(admin=type(model_admin).__name__, role=role):
+                    self.assertIndexedPlan(queryset[:20], f"{type(model_admin).__name__} ({role})")
+
+    def test_hot_filters_use_indexes(self):
+        teacher, student = self.teachers[0], self.students[0]
+        lesson = Lesson.objects.filter(teacher=teacher).first()
+        hot = {
+            "Lesson(teacher)": Lesson.objects.filter(teacher=teacher),
+            "Lesson(group, date)": Lesson.objects.filter(group=lesson.group_id).order_by("date"),
+            "Attendance(lesson, status)": Attendance.objects.filter(lesson=lesson, status="absent"),
+            "Payment(student, is_paid)": Payment.objects.filter(student=student, is_paid=False),
+            "Group.students by user": Group.objects.filter(students=student),
+        }
+        for label, queryset in hot.items():
+            with self.subTest(label):
+                self.assertIndexedPlan(queryset, label)
+
+
+class SearchTests(TestCase):
+    """Индексированный поиск: FTS5 в SQLite (тесты), SQL для PostgreSQL и совпадение с DDL миграций."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="teacher_ann", full_name="Annabel Lee", role=Role.TEACHER)
+        cls.student = User.objects.create(username="student_bob", full_name="Bob Annex", role=Role.STUDENT)
+        cls.algebra = Course.objects.create(title="Algebra", description="Linear equations", teacher=cls.teacher)
+        cls.geometry = Course.objects.create(title="Geometry", teacher=User.objects.create(username="zed", role=Role.TEACHER))
+
+    def search(self, queryset, term, documents):
+        return list(search_queryset(queryset, term, documents).values_list("pk", flat=True))
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5-бэкенд")
+    def test_sqlite_fts(self):
+        with CaptureQueriesContext(connection) as queries:
+            found = self.search(User.objects.all(), "Anna", {"pk": "user"})
+        self.assertEqual(found, [self.teacher.pk])
+        self.assertIn("education_user_fts MATCH", queries[0]["sql"])
+        # триггеры поддерживают индекс в актуальном состоянии
+        self.student.full_name = "Bob Annabel"
+        self.student.save()
+        self.assertEqual(sorted(self.search(User.objects.all(), "annabel", {"pk": "user"})), [self.teacher.pk, self.student.pk])
+        self.student.delete()
+        self.assertEqual(self.search(User.objects.all(), "annabel", {"pk": "user"}), [self.teacher.pk])
+        # слова объединяются через AND, короткий запрос — обычный icontains
+        self.assertEqual(self.search(Course.objects.all(), "linear algebra", {"pk": "course"}), [self.algebra.pk])
+        self.assertEqual(self.search(Course.objects.all(), "linear geometry", {"pk": "course"}), [])
+        self.assertEqual(self.search(Course.objects.all(), "eo", {"pk": "course"}), [self.geometry.pk])
+
+    def test_related_documents_use_or(self):
+        # курс находится и по названию, и по имени учителя (совпадение только у учителя)
+        documents = {"pk": "course", "teacher": "user"}
+        self.assertEqual(self.search(Course.objects.all(), "Annabel", documents), [self.algebra.pk])
+        self.assertEqual(self.search(Course.objects.all(), "Geometry", documents), [self.geometry.pk])
+
+    def test_postgres_sql_matches_migration_indexes(self):
+        initial = import_module("Education.migrations.0003_search_indexes")
+        groups = import_module("Education.migrations.0005_autocomplete_choices_group_search")
+        backend = search.PostgresSearchBackend()
+        for name, expression in (("user", initial.USER_DOCUMENT), ("course", initial.COURSE_DOCUMENT),
+                                 ("lesson", initial.LESSON_DOCUMENT), ("group", groups.GROUP_DOCUMENT)):
+            document = search.SEARCH_DOCUMENTS[name]
+            self.assertEqual(document.pg_document(), expression)
+            sql, params = backend.match_sql(document, "50%_off")
+            self.assertIn(f"to_tsvector('simple', {expression}) @@ websearch_to_tsquery('simple', %s)", sql)
+            self.assertIn(f"OR ({expression}) ILIKE %s", sql)
+            self.assertEqual(params, ["50%_off", "%50\\%\\_off%"])
+
+
+class TimetableTests(TestCase):
+    """Расписание и .ics из кэша, сброс кэша при изменениях, подписанные ссылки на фид."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="teacher", full_name="Ann Smith", role=Role.TEACHER)
+        cls.other_teacher = User.objects.create(username="other", full_name="Bob", role=Role.TEACHER)
+        cls.student = User.objects.create(username="student", role=Role.STUDENT)
+        cls.course = Course.objects.create(title="Course", teacher=cls.teacher)
+        cls.group = Group.objects.create(name="Group A", course=cls.course)
+        cls.group.students.set([cls.student])
+        cls.lesson = Lesson.objects.create(topic="Fractions; part 1", date=date(2025, 3, 4), teacher=cls.teacher, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        user_states._entries.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def feed_path(self, user, url):
+        feed_url = self.client_for(user).get(url).json()["feed_url"]
+        return feed_url.removeprefix("http://testserver")
+
+    def test_ics_output(self):
+        body = self.client_for(self.teacher).get(f"/api/timetable/teachers/{self.teacher.pk}.ics").content.decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n") and body.endswith("END:VCALENDAR\r\n"))
+        self.assertIn(f"UID:lesson-{self.lesson.pk}@edora\r\n", body)
+        self.assertIn("DTSTART;VALUE=DATE:20250304\r\n", body)
+        self.assertIn("SUMMARY:Fractions\\; part 1\r\n", body)
+        self.assertIn("DESCRIPTION:Group A — Ann Smith\r\n", body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in schedule._fold("x" * 200).split("\r\n")))
+
+    def test_access(self):
+        self.assertEqual(self.client_for(self.other_teacher).get(f"/api/timetable/teachers/{self.teacher.pk}/").status_code, 403)
+        self.assertEqual(self.client_for(self.other_teacher).get(f"/api/timetable/groups/{self.group.pk}/").status_code, 404)
+        lessons = self.client_for(self.student).get(f"/api/timetable/groups/{self.group.pk}/").json()["lessons"]
+        self.assertEqual([lesson["id"] for lesson in lessons], [self.lesson.pk])
+
+    def test_cache_invalidation(self):
+        schedule.get_schedule(schedule.TEACHER, self.teacher.pk)
+        with self.assertNumQueries(0):
+            schedule.get_schedule(schedule.TEACHER, self.teacher.pk)
+        # перенос урока к другому учителю сбрасывает расписание обоих
+        self.lesson.teacher = self.other_teacher
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.save()
+        self.assertEqual(schedule.get_schedule(schedule.TEACHER, self.teacher.pk), [])
+        self.assertEqual([row["id"] for row in schedule.get_schedule(schedule.TEACHER, self.other_teacher.pk)], [self.lesson.pk])
+        self.group.name = "Group B"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.save()
+        self.assertIn("Group B", schedule.get_ics(schedule.TEACHER, self.other_teacher.pk))
+        # сохранение без учителя и группы не читает старые значения
+        with self.assertNumQueries(1):
+            Lesson.objects.get(pk=self.lesson.pk)
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        with CaptureQueriesContext(connection) as queries:
+            lesson.save(update_fields=["topic"])
+        self.assertFalse([q for q in queries if q["sql"].startswith("SELECT")])
+
+    def test_feed_token(self):
+        path = self.feed_path(self.student, f"/api/timetable/groups/{self.group.pk}/")
+        anonymous = APIClient()
+        anonymous.get(path)
+        with self.assertNumQueries(0):
+            response = anonymous.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("SUMMARY:Fractions", response.content.decode())
+        self.assertEqual(anonymous.get(path.replace(".ics", "x.ics")).status_code, 404)
+
+        # студента исключили из группы — ссылка больше не работает
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.students.remove(self.student)
+        self.assertEqual(anonymous.get(path).status_code, 404)
+
+    def test_feed_token_revoked(self):
+        path = self.feed_path(self.teacher, f"/api/timetable/teachers/{self.teacher.pk}/")
+        self.assertEqual(APIClient().get(path).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client_for(self.teacher).post("/api/timetable/feed/revoke/").status_code, 204)
+        self.assertEqual(APIClient().get(path).status_code, 404)
+
+        path = self.feed_path(self.teacher, f"/api/timetable/teachers/{self.teacher.pk}/")
+        self.assertEqual(APIClient().get(path).status_code, 200)
+        # учитель ушёл: деактивация отзывает ссылку
+        self.teacher.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.save()
+        self.assertEqual(APIClient().get(path).status_code, 404)
+
+
+class SeedBulkTests(TestCase):
+    def test_tiny_scale_and_second_run(self):
+        call_command("seed_bulk", scale=0.002, group_size=5, lessons_per_group=13, batch_size=50, stdout=io.StringIO())
+
+        # 0.002 от значений по умолчанию: 200 студентов, 1 учитель, 1 курс, 10 групп
+        self.assertEqual(User.objects.filter(role=Role.STUDENT).count(), 200)
+        self.assertEqual((User.objects.filter(role=Role.TEACHER).count(), Course.objects.count()), (1, 1))
+        self.assertEqual(Group.objects.count(), 10)
+        self.assertEqual(Group.students.through.objects.count(), 50)
+        self.assertEqual(Lesson.objects.count(), 130)
+        self.assertEqual(Attendance.objects.count(), 650)
+        self.assertEqual(Payment.objects.count(), 100)  # 2 цикла на студента группы
+        self.assertEqual(AttendanceMonthly.objects.aggregate(total=Sum(F("present") + F("absent")))["total"], 650)
+
+        with self.assertRaisesMessage(CommandError, "--prefix"):
+            call_command("seed_bulk", scale=0.002, stdout=io.StringIO())
+        self.assertEqual(User.objects.count(), 202)
+
+
+@mock.patch("Education.management.commands.bench.setup_test_environment")  # раннер тестов уже вызвал его
+class BenchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(username="admin", role=Role.ADMIN)
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        student = User.objects.create(username="student", role=Role.STUDENT)
+        group = Group.objects.create(name="Group", course=Course.objects.create(title="Course", teacher=cls.teacher))
+        group.students.set([student])
+        User.objects.create(username="idle", role=Role.TEACHER)
+
+    def test_report_and_rollback(self, setup):
+        output = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+        output.close()
+        self.addCleanup(os.unlink, output.name)
+        call_command("bench", repeat=1, only=["course", "group"], output=output.name, stdout=io.StringIO())
+
+        with open(output.name, encoding="utf-8") as fh:
+            report = json.load(fh)
+        self.assertEqual(report["meta"]["users"], {"admin": "admin", "teacher": "teacher", "student": "student"})
+        self.assertEqual(report["results"]["course.list.admin"]["status"], {"200": 1})
+        self.assertIn("group.create.admin", report["results"])
+        self.assertEqual((Course.objects.count(), Group.objects.count()), (1, 1))  # записи откатились
+
+    def test_teacher_without_groups(self, setup):
+        with self.assertRaisesMessage(CommandError, "seed_bulk"):
+            call_command("bench", teacher="idle", output=os.devnull, stdout=io.StringIO())
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Решения роутера реплик в рамках одного HTTP-запроса (без обращений к БД)."""
+
+    router = ReplicaRouter()
+
+    def run_request(self, method, view, cookies=None, headers=None):
+        request = getattr(RequestFactory(), method.lower())("/", headers=headers)
+        request.COOKIES.update(cookies or {})
+        seen = []
+
+        def get_response(request):
+            view(seen)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(get_response)(request)
+        return seen, response
+
+    def read(self, seen):
+        seen.append(self.router.db_for_read(User))
+
+    def test_safe_request_reads_from_replica(self):
+        seen, response = self.run_request("GET", self.read)
+        self.assertEqual(seen, ["replica"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_request_to_primary(self):
+        def view(seen):
+            self.read(seen)
+            self.router.db_for_write(User)
+            self.read(seen)
+
+        seen, response = self.run_request("GET", view)
+        self.assertEqual(seen, ["replica", "default"])
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response[PIN_HEADER], "5")
+
+    def test_unsafe_method_and_pin_cookie_use_primary(self):
+        self.assertEqual(self.run_request("POST", self.read)[0], ["default"])
+        self.assertEqual(self.run_request("GET", self.read, {PIN_COOKIE: "1"})[0], ["default"])
+
+    def test_pin_header_for_api_clients(self):
+        self.assertEqual(self.run_request("GET", self.read, headers={PIN_HEADER: "1"})[0], ["default"])
+        self.assertEqual(self.run_request("GET", self.read, headers={PIN_HEADER: "0"})[0], ["replica"])
+
+    def test_cache_fills_read_from_primary(self):
+        def view(seen):
+            with mock.patch.object(dashboard.cache, "get_many", return_value={}), \
+                    mock.patch.object(dashboard.cache, "set"), \
+                    mock.patch.object(dashboard, "compute_kpis", side_effect=lambda today: self.read(seen) or {}):
+                dashboard.get_kpis()
+            with mock.patch.object(schedule.cache, "get", return_value=None), \
+                    mock.patch.object(schedule.cache, "set"), \
+                    mock.patch("Education.models.Lesson.objects.filter", side_effect=lambda **kw: self.read(seen) or mock.MagicMock()):
+                schedule.get_schedule("group", 1)
+
+        self.assertEqual(self.run_request("GET", view)[0], ["default", "default"])
+
+    def test_primary_block_and_outside_request(self):
+        def view(seen):
+            with primary():
+                self.read(seen)
+            self.read(seen)
+
+        self.assertEqual(self.run_request("GET", view)[0], ["default", "replica"])
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= и list через .values() дают тот же JSON, что и ModelSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", full_name="Admin", role=Role.ADMIN)
+        teacher = User.objects.create(username="teacher", full_name="Teacher", role=Role.TEACHER)
+        students = [
+            User.objects.create(username=f"student{i}", full_name=f"Student {i}", role=Role.STUDENT, phone=None)
+            for i in range(2)
+        ]
+        course = Course.objects.create(title="Course", teacher=teacher, price=Decimal("450.50"))
+        group = Group.objects.create(name="Group", course=course)
+        group.students.set(students)
+        lesson = Lesson.objects.create(topic="Topic", date=date(2025, 1, 1), teacher=teacher, group=group)
+        Attendance.objects.create(student=students[0], lesson=lesson, status="absent", comment="late")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url, fast=True):
+        if fast:
+            return self.client.get(url)
+        with mock.patch.object(SparseFieldsMixin, "get_values_plan", return_value=None):
+            return self.client.get(url)
+
+    def test_values_path_matches_serializer(self):
+        for url in ["/api/users/", "/api/courses/", "/api/lessons/", "/api/attendances/",
+                    "/api/groups/?fields=id,name", "/api/users/?fields=username,date_joined"]:
+            with self.subTest(url):
+                self.assertEqual(self.get(url).json(), self.get(url, fast=False).json())
+
+    def test_fields_param(self):
+        rows = self.get("/api/attendances/?fields=id, status").json()["results"]
+        self.assertEqual([set(row) for row in rows], [{"id", "status"}])
+        # вычисляемое поле (m2m) — обычный сериализатор
+        rows = self.get("/api/groups/?fields=students").json()["results"]
+        self.assertEqual(len(rows[0]["students"]), 2)
+        self.assertEqual(self.get("/api/users/?fields=password").status_code, 400)
+
+
+class StatelessJWTTests(TestCase):
+    """Пользователь берётся из claims токена; деактивация и смена роли отзывают старый токен."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username="teacher", password="pw", role=Role.TEACHER)
+
+    def setUp(self):
+        user_states._entries.clear()
+        response = APIClient().post("/api/auth/token/", {"username": "teacher", "password": "pw"}, format="json")
+        self.token = response.json()["access"]
+        self.request = RequestFactory().get("/api/lessons/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def authenticate(self):
+        return StatelessJWTAuthentication().authenticate(self.request)[0]
+
+    def test_user_from_claims(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.username, user.role), (self.teacher.pk, "teacher", Role.TEACHER))
+        self.assertFalse(user.is_staff or user.is_superuser)
+
+    def test_deactivated_and_role_change(self):
+        self.authenticate()
+        self.teacher.role = Role.ADMIN
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.save()
+        self.assertEqual(self.authenticate().role, Role.ADMIN)  # claims устарели — пользователь из БД
+        self.teacher.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class ScopeTests(TestCase):
+    """Кэш области видимости сбрасывается при изменении состава групп и курсов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        cls.other_teacher = User.objects.create(username="other", role=Role.TEACHER)
+        cls.student = User.objects.create(username="student", role=Role.STUDENT)
+        cls.classmate = User.objects.create(username="classmate", role=Role.STUDENT)
+        cls.course = Course.objects.create(title="Course", teacher=cls.teacher)
+        cls.group = Group.objects.create(name="Group", course=cls.course)
+        cls.group.students.set([cls.classmate])
+
+    def setUp(self):
+        cache.clear()
+
+    def scope(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        return get_scope(request)
+
+    def test_enrollment_and_course_changes(self):
+        self.assertEqual(self.scope(self.student).group_ids, set())
+        self.assertEqual(self.scope(self.teacher).student_ids, {self.classmate.pk})
+
+        # до COMMIT кэш не сбрасывается: иначе параллельный запрос закэшировал бы состояние до коммита
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.group.students.add(self.student)
+            self.assertEqual(self.scope(self.student).group_ids, set())
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        student_scope = self.scope(self.student)
+        self.assertEqual((student_scope.group_ids, student_scope.course_ids, student_scope.teacher_ids),
+                         ({self.group.pk}, {self.course.pk}, {self.teacher.pk}))
+        self.assertEqual(self.scope(self.teacher).student_ids, {self.student.pk, self.classmate.pk})
+        self.assertEqual(self.scope(self.classmate).student_ids, {self.student.pk, self.classmate.pk})
+
+        self.course.teacher = self.other_teacher
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+        self.assertEqual(self.scope(self.teacher).group_ids, set())
+        self.assertEqual(self.scope(self.other_teacher).group_ids, {self.group.pk})
+        self.assertEqual(self.scope(self.student).teacher_ids, {self.other_teacher.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        self.assertEqual(self.scope(self.student).course_ids, set())
+
+    def test_cached_between_requests(self):
+        client = APIClient()
+        client.force_authenticate(self.classmate)
+        client.get("/api/groups/")
+        with self.assertNumQueries(2):  # count + страница, без запросов области видимости
+            rows = client.get("/api/groups/?fields=id").json()["results"]
+        self.assertEqual(rows, [{"id": self.group.pk}])
+
+    def test_deferred_fields_not_loaded_on_init(self):
+        with self.assertNumQueries(1):
+            list(Group.objects.only("name"))
+        with self.assertNumQueries(1):
+            list(Course.objects.only("title"))
+
+        # отложенный course_id при сохранении считается изменённым
+        group = Group.objects.only("name").get()
+        group.course = Course.objects.create(title="Other", teacher=self.other_teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            group.save()
+        self.assertEqual(self.scope(self.other_teacher).student_ids, {self.classmate.pk})
+
+
+class MembershipTests(TestCase):
+    """Индекс состава групп отвечает без запросов и сбрасывается при изменениях."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN)
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        cls.students = [User.objects.create(username=f"student{i}", role=Role.STUDENT) for i in range(3)]
+        cls.group = Group.objects.create(name="Group")
+        cls.group.students.set(cls.students[:2])
+
+    def setUp(self):
+        cache.clear()
+        membership._local.clear()
+
+    def test_is_member(self):
+        membership.is_member(self.group.pk, self.students[0].pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(membership.is_member(self.group.pk, self.students[1].pk))
+            self.assertFalse(membership.is_member(self.group.pk, self.students[2].pk))
+            self.assertFalse(membership.is_member(None, self.students[0].pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.group.students.remove(self.students[0])
+            self.group.students.add(self.students[2])
+        # до COMMIT индекс прежний
+        self.assertEqual(list(membership.group_students(self.group.pk)), [s.pk for s in self.students[:2]])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(membership.group_students(self.group.pk)), [s.pk for s in self.students[1:]])
+
+    def test_group_create_validates_students_in_bulk(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        student_ids = [s.pk for s in self.students]
+        response = client.post("/api/groups/", {"name": "New", "students": student_ids}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(response.json()["students"]), student_ids)
+
+        response = client.post("/api/groups/", {"name": "Bad", "students": [self.teacher.pk]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("teacher", str(response.json()))
+        # несуществующий id — ошибка валидации, а не IntegrityError
+        response = client.post("/api/groups/", {"name": "Bad", "students": [student_ids[0], 10 ** 6]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(10 ** 6), str(response.json()["students"]))
+
+        serializer = GroupSerializer(data={"name": "Bulk", "students": student_ids})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        self.assertTrue(all(isinstance(user, User) for user in serializer.validated_data["students"]))
+
+
+class AdminAutocompleteTests(TestCase):
+    """Автодополнение админки: фильтр по роли поля, индексированный поиск, страницы по 20."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw", full_name="Admin", role=Role.ADMIN)
+        cls.teacher = User.objects.create(username="teacher_ann", full_name="Ann", role=Role.TEACHER)
+        User.objects.bulk_create([User(username=f"student_{i}", full_name=f"Student {i}", role=Role.STUDENT) for i in range(25)])
+        course = Course.objects.create(title="Algebra", teacher=cls.teacher)
+        Group.objects.create(name="Evening algebra", course=course)
+        Group.objects.create(name="Morning")
+
+    def autocomplete(self, model_name, field_name, term=""):
+        self.client.force_login(self.admin)
+        return self.client.get("/admin/autocomplete/", {
+            "app_label": "Education", "model_name": model_name, "field_name": field_name, "term": term,
+        }).json()
+
+    def test_role_and_pagination(self):
+        students = self.autocomplete("group", "students")
+        self.assertEqual(len(students["results"]), 20)
+        self.assertTrue(students["pagination"]["more"])
+        self.assertEqual(self.autocomplete("group", "students", "teacher_ann")["results"], [])
+        teachers = self.autocomplete("course", "teacher", "teacher_ann")["results"]
+        self.assertEqual([row["id"] for row in teachers], [str(self.teacher.pk)])
+
+    def test_group_search(self):
+        groups = self.autocomplete("lesson", "group", "algebra")["results"]
+        self.assertEqual([row["text"] for row in groups], ["Evening algebra"])
+
+
+class EnrollmentTests(TestCase):
+    """Зачисление и перевод: bulk-операции и пропорциональные платежи за текущий цикл."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN)
+        teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        cls.students = [User.objects.create(username=f"student{i}", role=Role.STUDENT) for i in range(6)]
+        course = Course.objects.create(title="Course", teacher=teacher, price=Decimal("1200"))
+        cls.source = Group.objects.create(name="Source", course=course)
+        cls.target = Group.objects.create(name="Target", course=course)
+        Lesson.objects.bulk_create([Lesson(topic="T", date=date(2025, 1, 1), teacher=teacher, group=cls.target)] * 5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def post(self, url, data):
+        return self.client.post(url, data, format="json")
+
+    def test_enroll_queries_do_not_grow(self):
+        ids = [s.pk for s in self.students]
+        url = f"/api/groups/{self.source.pk}/enroll/"
+        with CaptureQueriesContext(connection) as two:
+            self.post(url, {"students": ids[:2]})
+        with CaptureQueriesContext(connection) as four:
+            response = self.post(url, {"students": ids[2:]})
+        self.assertEqual(len(two), len(four))
+        self.assertEqual(response.json(), {"added": ids[2:], "removed": [], "invalid": []})
+        self.assertEqual(Payment.objects.filter(group=self.source, amount_due=Decimal("1200")).count(), 6)
+
+        response = self.post(url, {"remove": ids[:1]})
+        self.assertEqual(response.json()["removed"], ids[:1])
+        response = self.post(url, {"students": [self.admin.pk]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_transfer_prorates(self):
+        self.source.students.set(self.students[:3])
+        ids = [s.pk for s in self.students[:2]]
+        response = self.post(f"/api/groups/{self.source.pk}/transfer/", {"students": ids, "to": self.target.pk})
+        self.assertEqual(response.json(), {"moved": ids, "not_members": []})
+        self.assertEqual(list(self.source.students.values_list("pk", flat=True)), [self.students[2].pk])
+        # 5 уроков из 12 прошло: 7/12 цены
+        amounts = Payment.objects.filter(group=self.target).values_list("amount_due", flat=True)
+        self.assertEqual(list(amounts), [Decimal("700.00")] * 2)
+
+        response = self.post(f"/api/groups/{self.source.pk}/transfer/", {"students": ids, "to": self.target.pk})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchTests(TestCase):
+    """/api/batch/: подзапросы с аутентификацией внешнего запроса, откат при atomic."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN)
+        cls.course = Course.objects.create(title="Course", teacher=User.objects.create(username="t", role=Role.TEACHER))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def batch(self, requests, **extra):
+        return self.client.post("/api/batch/", {"requests": requests, **extra}, format="json").json()
+
+    def test_sub_requests(self):
+        result = self.batch([
+            {"path": "/api/groups/?fields=id"},
+            {"method": "POST", "path": "/api/groups/", "body": {"name": "New", "course": self.course.pk}},
+            {"path": "/api/missing/"},
+            {"path": "/api/batch/"},
+        ])
+        self.assertEqual([r["status"] for r in result["responses"]], [200, 201, 404, 400])
+        self.assertEqual(result["responses"][1]["body"]["name"], "New")
+        self.assertEqual(self.client.post("/api/batch/", {"requests": [{"path": "/admin/"}]}, format="json").status_code, 400)
+
+    def test_atomic_rollback(self):
+        result = self.batch([
+            {"method": "POST", "path": "/api/groups/", "body": {"name": "Rolled back"}},
+            {"method": "POST", "path": "/api/groups/", "body": {"course": 999}},
+            {"path": "/api/groups/"},
+        ], atomic=True)
+        self.assertEqual((result["committed"], [r["status"] for r in result["responses"]]), (False, [201, 400]))
+        self.assertFalse(Group.objects.exists())
+
+
+class AttendanceMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        cls.students = [User.objects.create(username=f"s{i}", full_name=f"S{i}", role=Role.STUDENT) for i in range(2)]
+        course = Course.objects.create(title="Course", teacher=cls.teacher)
+        cls.group = Group.objects.create(name="Group", course=course)
+        cls.group.students.set(cls.students)
+        lessons = [Lesson.objects.create(topic=f"L{i}", date=date(2025, 1, 1 + i), teacher=cls.teacher, group=cls.group)
+                   for i in range(3)]
+        Attendance.objects.create(student=cls.students[0], lesson=lessons[0], status="present")
+        Attendance.objects.create(student=cls.students[0], lesson=lessons[2], status="absent")
+        Attendance.objects.create(student=cls.students[1], lesson=lessons[1], status="present")
+
+    def setUp(self):
+        cache.clear()
+        membership._local.clear()
+        self.client = APIClient()
+
+    def matrix(self, user, query=""):
+        self.client.force_authenticate(user)
+        return self.client.get(f"/api/groups/{self.group.pk}/attendance-matrix/{query}").json()
+
+    def test_matrix(self):
+        data = self.matrix(self.teacher)
+        self.assertEqual([lesson["topic"] for lesson in data["lessons"]], ["L0", "L1", "L2"])
+        self.assertEqual(data["matrix"], ["P-A", "-P-"])
+        self.assertEqual(self.matrix(self.teacher, "?start=2025-01-02")["matrix"], ["-A", "P-"])
+        own = self.matrix(self.students[1])
+        self.assertEqual((own["students"], own["matrix"]), ([{"id": self.students[1].pk, "full_name": "S1"}], ["-P-"]))
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN)
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        cls.other_teacher = User.objects.create(username="other", role=Role.TEACHER)
+        cls.students = [User.objects.create(username=f"s{i}", role=Role.STUDENT) for i in range(3)]
+        cls.course = Course.objects.create(title="Course", teacher=cls.teacher, price=Decimal("120"))
+        cls.other_course = Course.objects.create(title="Other", teacher=cls.other_teacher, price=Decimal("50"))
+
+    def setUp(self):
+        cache.clear()
+        membership._local.clear()
+        self.group = Group.objects.create(name="Group", course=self.course)
+        self.group.students.set(self.students)
+        self.january = Lesson.objects.create(topic="Jan", date=date(2025, 1, 10), teacher=self.teacher, group=self.group)
+        self.february = Lesson.objects.create(topic="Feb", date=date(2025, 2, 3), teacher=self.teacher, group=self.group)
+
+    def snapshot(self):
+        attendance = sorted(AttendanceMonthly.objects.filter(Q(present__gt=0) | Q(absent__gt=0))
+                            .values_list("month", "group_id", "teacher_id", "course_id", "present", "absent"))
+        revenue = sorted(RevenueMonthly.objects.filter(payments__gt=0)
+                         .values_list("month", "group_id", "course_id", "payments", "paid_payments", "amount_due", "amount_paid"))
+        return attendance, revenue
+
+    def assert_matches_rebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_attendance_changes(self):
+        marks = [Attendance.objects.create(student=s, lesson=self.january, status="present") for s in self.students]
+        marks[0].status = "absent"
+        marks[0].save()
+        self.assertEqual(
+            list(AttendanceMonthly.objects.values_list("month", "present", "absent")),
+            [(date(2025, 1, 1), 2, 1)],
+        )
+        marks[1].delete()
+        Attendance.objects.create(student=self.students[1], lesson=self.february, status="absent")
+        self.assert_matches_rebuild()
+
+        # перенос урока в другой месяц и к другому учителю
+        self.january.date, self.january.teacher = date(2025, 3, 1), self.other_teacher
+        self.january.save()
+        self.assert_matches_rebuild()
+
+        self.group.course = self.other_course
+        self.group.save()
+        self.assertEqual(set(AttendanceMonthly.objects.values_list("course_id", flat=True)), {self.other_course.pk})
+
+    def test_payments_and_bulk_paths(self):
+        self.assertEqual(RevenueMonthly.objects.get().payments, 3)  # bulk_create при зачислении
+        payment = Payment.objects.filter(group=self.group).first()
+        payment.is_paid = True
+        payment.save()
+        LessonSerializer().create({"topic": "Mar", "date": date(2025, 3, 3), "teacher": self.teacher, "group": self.group})
+        self.assert_matches_rebuild()
+
+        row = RevenueMonthly.objects.get()
+        self.assertEqual((row.paid_payments, row.amount_due, row.amount_paid), (1, Decimal("360"), Decimal("120")))
+        payment.delete()
+        self.assertEqual(RevenueMonthly.objects.get().payments, 2)
+        self.assert_matches_rebuild()
+
+    def test_saved_state_read_only_on_save(self):
+        mark = Attendance.objects.create(student=self.students[0], lesson=self.january, status="present")
+        with self.assertNumQueries(1):  # выборка — без запросов на строку
+            marks = list(Attendance.objects.only("comment"))
+        marks[0].comment = "опоздал"
+        with self.assertNumQueries(1):  # UPDATE, сводки не трогаются
+            marks[0].save(update_fields=["comment"])
+
+        mark.status = "absent"
+        with CaptureQueriesContext(connection) as queries:
+            mark.save()
+        self.assertEqual(sum('FROM "Education_attendance"' in query["sql"] for query in queries), 1)  # прежнее состояние
+        self.assertEqual(list(AttendanceMonthly.objects.values_list("present", "absent")), [(0, 1)])
+
+    def test_cascade_deletes(self):
+        # без получателей сигналов удаления каскад удаляет отметки и платежи одной командой
+        collector = Collector(using="default")
+        self.assertTrue(collector.can_fast_delete(Attendance.objects.all()))
+        self.assertTrue(collector.can_fast_delete(Payment.objects.all()))
+
+        other_group = Group.objects.create(name="Other", course=self.other_course)
+        other_group.students.set(self.students[:2])
+        other_lesson = Lesson.objects.create(topic="Other", date=date(2025, 1, 20), teacher=self.other_teacher, group=other_group)
+        for lesson in (self.january, self.february, other_lesson):
+            for i, student in enumerate(lesson.group.students.order_by("pk")):
+                Attendance.objects.create(student=student, lesson=lesson, status="present" if i else "absent")
+        self.assert_matches_rebuild()
+
+        Attendance.objects.filter(lesson=self.february, status="present").delete()
+        self.assert_matches_rebuild()
+        self.february.delete()
+        self.assert_matches_rebuild()
+        Payment.objects.filter(student=self.students[2]).delete()
+        self.assert_matches_rebuild()
+
+        # студент: его отметки и платежи в обеих группах
+        self.students[0].delete()
+        self.assert_matches_rebuild()
+        self.assertEqual(AttendanceMonthly.objects.get(group=other_group).present, 1)
+
+        other_group.delete()
+        self.assertFalse(AttendanceMonthly.objects.filter(group_id=other_group.pk).exists())
+        self.assert_matches_rebuild()
+        self.teacher.delete()
+        self.assertFalse(AttendanceMonthly.objects.exists())
+        self.assert_matches_rebuild()
+
+    def test_report_endpoints(self):
+        for student in self.students:
+            Attendance.objects.create(student=student, lesson=self.january, status="present")
+        Attendance.objects.create(student=self.students[0], lesson=self.february, status="absent")
+        other_group = Group.objects.create(name="Other", course=self.other_course)
+        Lesson.objects.create(topic="X", date=date(2025, 1, 5), teacher=self.other_teacher, group=other_group)
+        rollups.record_attendances([Attendance(student=self.students[0], lesson=other_group.lessons.get(), status="absent")])
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        rows = client.get("/api/reports/attendance/?by=course").json()["rows"]
+        self.assertEqual([(r["month"], r["course"], r["present"], r["absent"]) for r in rows], [
+            ("2025-01-01", self.course.pk, 3, 0), ("2025-01-01", self.other_course.pk, 0, 1), ("2025-02-01", self.course.pk, 0, 1),
+        ])
+        with self.assertNumQueries(1):
+            rows = client.get("/api/reports/attendance/?start=2025-01-15&end=2025-01-31").json()["rows"]
+        self.assertEqual(rows, [{"month": "2025-01-01", "present": 3, "absent": 1, "rate": 0.75}])
+        self.assertEqual(Decimal(client.get("/api/reports/revenue/?by=teacher").json()["rows"][0]["amount_due"]), 360)
+        self.assertEqual(client.get("/api/reports/revenue/?by=student").status_code, 400)
+
+        client.force_authenticate(self.teacher)
+        rows = client.get("/api/reports/attendance/").json()["rows"]
+        self.assertEqual([(r["present"], r["absent"]) for r in rows], [(3, 0), (0, 1)])
+        client.force_authenticate(self.students[0])
+        self.assertEqual(client.get("/api/reports/revenue/").status_code, 403)
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN, is_staff=True, is_superuser=True)
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER, is_staff=True)
+        cls.students = [User.objects.create(username=f"s{i}", role=Role.STUDENT) for i in range(3)]
+        course = Course.objects.create(title="Course", teacher=cls.teacher, price=Decimal("100"))
+        cls.group = Group.objects.create(name="Group", course=course)
+        cls.group.students.set(cls.students[:2])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_kpis_cached_until_ttl(self):
+        lesson = Lesson.objects.create(topic="Today", date=timezone.localdate(), teacher=self.teacher, group=self.group)
+        Attendance.objects.create(student=self.students[0], lesson=lesson, status="present")
+        Attendance.objects.create(student=self.students[1], lesson=lesson, status="absent")
+        kpis = dashboard.get_kpis()
+        self.assertEqual(
+            (kpis["active_students"], kpis["groups"], kpis["lessons_today"], kpis["attendance_rate"], kpis["debt"]),
+            (2, 1, 1, 0.5, Decimal("200")),
+        )
+        with self.assertNumQueries(0):
+            dashboard.get_kpis()
+
+        # изменения не сбрасывают кэш: KPI обновятся по истечении TTL
+        payment = Payment.objects.get(student=self.students[0])
+        payment.is_paid = True
+        payment.save()
+        self.assertEqual(dashboard.get_kpis()["debt"], Decimal("200"))
+        cache.delete(dashboard.CACHE_KEY)
+        self.assertEqual(dashboard.get_kpis()["debt"], Decimal("100"))
+
+    def test_admin_index(self):
+        self.client.force_login(self.admin)
+        response = self.client.get("/admin/")
+        self.assertContains(response, "Непогашенный долг")
+        self.client.force_login(self.teacher)
+        self.assertNotContains(self.client.get("/admin/"), "Непогашенный долг")
+
+    def admin_groups(self):
+        content = self.client.get("/admin/").content.decode()
+        return int(re.search(r"<h3>(\d+)</h3>\s*<p>Группы</p>", content).group(1))
+
+    def test_new_group_resets_kpis(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.admin_groups(), 1)
+
+        with mock.patch.object(dashboard, "DASHBOARD_REFRESH_INTERVAL", 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                group = Group.objects.create(name="New", course=self.group.course)
+            self.assertEqual(self.admin_groups(), 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                group.students.add(self.students[2])
+            self.assertEqual(dashboard.get_kpis()["active_students"], 3)
+            with self.assertNumQueries(0):
+                dashboard.get_kpis()
+
+        # пересчёт не чаще раза в DASHBOARD_REFRESH_INTERVAL секунд
+        with mock.patch.object(dashboard, "DASHBOARD_REFRESH_INTERVAL", 3600):
+            with self.captureOnCommitCallbacks(execute=True):
+                group.delete()
+            self.assertEqual(dashboard.get_kpis()["groups"], 2)
+        with mock.patch.object(dashboard, "DASHBOARD_REFRESH_INTERVAL", 0):
+            self.assertEqual(dashboard.get_kpis()["groups"], 1)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN, is_staff=True, is_superuser=True)
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        cls.students = [User.objects.create(username=f"s{i}", role=Role.STUDENT) for i in range(3)]
+        cls.course = Course.objects.create(title="Course", teacher=cls.teacher, price=Decimal("100"))
+
+    def setUp(self):
+        cache.clear()
+        membership._local.clear()
+        self.group = self.make_group("Old", lessons=5)
+
+    def make_group(self, name, lessons):
+        group = Group.objects.create(name=name, course=self.course)
+        group.students.set(self.students)
+        for n in range(lessons):
+            lesson = Lesson.objects.create(topic=f"{name} {n}", date=date(2024, 1, 1) + timedelta(days=7 * n),
+                                           teacher=self.teacher, group=group)
+            for i, student in enumerate(self.students):
+                Attendance.objects.create(student=student, lesson=lesson, status="absent" if i == n % 3 else "present",
+                                          comment="болел" if i == n % 3 else None)
+        return group
+
+    def test_archive_group(self):
+        report = rollups.attendance_report(AttendanceMonthly.objects.all())
+        self.assertEqual(archive.completed_groups(), [self.group.pk])
+
+        result = archive.archive_group(self.group.pk, batch_size=2)
+        self.assertEqual(result, {"lessons": 5, "attendance": 15})
+        self.assertFalse(Lesson.objects.filter(group=self.group).exists())
+        self.assertFalse(Attendance.objects.exists())
+        lesson = ArchivedLesson.objects.order_by("date").first()
+        self.assertEqual(lesson.attendance, {str(self.students[0].pk): "A", str(self.students[1].pk): "P", str(self.students[2].pk): "P"})
+        self.assertEqual(lesson.comments, {str(self.students[0].pk): "болел"})
+
+        # отчёты не меняются ни сразу, ни после полного пересчёта сводок
+        self.assertEqual(rollups.attendance_report(AttendanceMonthly.objects.all()), report)
+        rollups.rebuild()
+        self.assertEqual(rollups.attendance_report(AttendanceMonthly.objects.all()), report)
+        self.assertEqual(archive.archive_group(self.group.pk), {"lessons": 0, "attendance": 0})
+
+    def test_fast_delete_queries_do_not_grow(self):
+        small, large = self.make_group("Small", lessons=1), self.make_group("Large", lessons=8)
+        with CaptureQueriesContext(connection) as one:
+            archive.fast_delete_groups([small.pk])
+        with CaptureQueriesContext(connection) as eight:
+            deleted = archive.fast_delete_groups([large.pk])
+        self.assertEqual(len(one), len(eight))
+        self.assertEqual((deleted["lessons"], deleted["attendance"], deleted["groups"]), (8, 24, 1))
+
+        deleted = archive.fast_delete_courses([self.course.pk])
+        self.assertEqual((deleted["groups"], deleted["courses"]), (1, 1))
+        for model in (Group, Lesson, Attendance, Payment, AttendanceMonthly, RevenueMonthly):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+    def test_admin_delete_uses_fast_path(self):
+        self.client.force_login(self.admin)
+        url = f"/admin/Education/group/{self.group.pk}/delete/"
+        self.assertContains(self.client.get(url), "15")  # отметок посещаемости в подтверждении
+        with mock.patch.object(archive, "_raw_delete", wraps=archive._raw_delete) as raw_delete:
+            self.client.post(url, {"post": "yes"})
+        self.assertTrue(raw_delete.called)
+        self.assertFalse(Group.objects.exists())
+
+    def test_api_delete_uses_fast_path(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        other = self.make_group("Other", lessons=2)
+        lesson = Lesson.objects.filter(group=self.group).order_by("date").first()
+        with mock.patch.object(archive, "_raw_delete", wraps=archive._raw_delete) as raw_delete:
+            self.assertEqual(client.delete(f"/api/lessons/{lesson.pk}/").status_code, 204)
+            self.assertEqual(client.delete(f"/api/groups/{other.pk}/").status_code, 204)
+        self.assertTrue(raw_delete.called)
+        self.assertEqual((Lesson.objects.count(), Attendance.objects.count()), (4, 12))
+
+        # сводки после удаления совпадают с полным пересчётом
+        report = rollups.attendance_report(AttendanceMonthly.objects.all(), by="group")
+        self.assertEqual(sum(row["present"] + row["absent"] for row in report), 12)
+        rollups.rebuild()
+        self.assertEqual(rollups.attendance_report(AttendanceMonthly.objects.all(), by="group"), report)
+
+        self.assertEqual(client.delete(f"/api/courses/{self.course.pk}/").status_code, 204)
+        for model in (Course, Group, Lesson, Attendance, AttendanceMonthly):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+    def test_archive_action_skips_active_groups(self):
+        active = self.make_group("Active", lessons=1)
+        Lesson.objects.filter(group=active).update(date=timezone.localdate())
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            "/admin/Education/group/",
+            {"action": "archive_lessons", "_selected_action": [self.group.pk, active.pk]},
+            follow=True,
+        )
+        self.assertContains(response, "уроков: 5")
+        self.assertContains(response, "Active")
+        self.assertFalse(Lesson.objects.filter(group=self.group).exists())
+        self.assertTrue(Lesson.objects.filter(group=active).exists())
+        self.assertFalse(ArchivedLesson.objects.filter(group=active).exists())
+
+    def test_archive_command_and_active_groups(self):
+        active = self.make_group("Active", lessons=1)
+        Lesson.objects.filter(group=active).update(date=timezone.localdate())
+        with self.assertRaises(ValueError):
+            archive.archive_group(active.pk)
+
+        out = io.StringIO()
+        call_command("archive_groups", "--group", str(active.pk), "--group", str(self.group.pk), stdout=out)
+        self.assertIn(f"Пропущены незавершённые группы (уроки за последние {archive.ARCHIVE_AFTER_DAYS} дней "
+                      f"или нет уроков): [{active.pk}]", out.getvalue())
+        self.assertFalse(Lesson.objects.filter(group=self.group).exists())
+        self.assertEqual(Lesson.objects.filter(group=active).count(), 1)
+        self.assertEqual(Attendance.objects.filter(lesson__group=active).count(), 3)
+
+    def test_archived_attendance_survives_teacher_delete(self):
+        substitute = User.objects.create(username="substitute", role=Role.TEACHER)
+        Lesson.objects.filter(group=self.group).update(teacher=substitute)
+        rollups.rebuild()
+        report = rollups.attendance_report(AttendanceMonthly.objects.all())
+        archive.archive_group(self.group.pk)
+
+        substitute.delete()
+        self.assertEqual(rollups.attendance_report(AttendanceMonthly.objects.all()), report)
+        rollups.rebuild()
+        self.assertEqual(rollups.attendance_report(AttendanceMonthly.objects.all()), report)
+        self.assertEqual(rollups.attendance_report(AttendanceMonthly.objects.all(), by="teacher")[0]["teacher"], None)
+
+
+class MetricsTests(SimpleTestCase):
+    """Файлы метрик воркеров в METRICS_DIR: умершие складываются в aggregate.json."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        overrides = override_settings(METRICS_DIR=self.directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.registry = metrics.Registry()
+
+    def write_worker(self, pid, instance, requests, connections_open=1, host=metrics.HOST):
+        metrics._write(os.path.join(self.directory, f"{host}-{pid}.json"), {"instance": instance, "values": [
+            ["edora_http_requests_total", [["route", "lesson-list"]], requests],
+            ["edora_db_connections_open", [["alias", "default"]], connections_open],
+        ]})
+
+    def requests_total(self):
+        return self.registry.collect().get(("edora_http_requests_total", (("route", "lesson-list"),)))
+
+    def test_dead_worker_is_folded(self):
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        self.write_worker(dead.pid, "uuid:dead", requests=3)
+        self.write_worker(dead.pid + 10**7, "uuid:gone", requests=4)
+
+        self.assertEqual(self.requests_total(), 7)
+        self.assertNotIn(("edora_db_connections_open", (("alias", "default"),)), self.registry.collect())
+        self.assertEqual({name for name in os.listdir(self.directory) if name.endswith(".json")},
+                         {metrics._worker_file(os.getpid()), "aggregate.json"})
+        self.assertEqual(self.requests_total(), 7)  # сложено один раз
+
+    def test_other_container_and_child_exit(self):
+        # pid воркера другого контейнера (общий том) здесь не проверить: файл суммируется как есть
+        self.write_worker(10**7, "start:1", requests=2, connections_open=3, host="api")
+        self.assertEqual(self.requests_total(), 2)
+        self.assertEqual(self.registry.collect()[("edora_db_connections_open", (("alias", "default"),))], 3)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f"api-{10**7}.json")))
+
+        # мастер gunicorn складывает файл своего завершившегося воркера
+        self.write_worker(10**7 + 1, "start:2", requests=5)
+        metrics.fold_worker(10**7 + 1)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, metrics._worker_file(10**7 + 1))))
+        self.assertEqual(self.requests_total(), 7)
+
+    def test_reused_pid_keeps_old_counters(self):
+        # файл с нашим pid, но от другого (умершего) процесса
+        self.write_worker(os.getpid(), "start:0", requests=5)
+        self.registry.inc("edora_http_requests_total", {"route": "lesson-list"})
+        self.assertEqual(self.requests_total(), 6)
+        with open(os.path.join(self.directory, metrics._worker_file(os.getpid()))) as fh:
+            self.assertEqual(json.load(fh)["instance"], self.registry._instance)
+
+
+@override_settings(API_GZIP_MIN_BYTES=0)
+class CompressionTests(TestCase):
+    """gzip JSON-ответов API и совпадение FastJSONRenderer с JSONRenderer DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="secret", role=Role.ADMIN, is_staff=True)
+        teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+        # GZipMiddleware не сжимает ответы короче 200 байт
+        Course.objects.bulk_create(Course(title=f"Course {n}", teacher=teacher) for n in range(10))
+
+    def setUp(self):
+        self.client = APIClient(HTTP_ACCEPT_ENCODING="gzip")
+        self.credentials = {"username": "admin", "password": "secret"}
+
+    def test_secrets_are_not_compressed(self):
+        response = self.client.post("/api/auth/token/", self.credentials, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.client.post("/api/auth/token/refresh/", {"refresh": response.json()["refresh"]}, format="json")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get("/api/courses/")["Content-Encoding"], "gzip")
+        batch = {"requests": [{"method": "GET", "path": "/api/courses/"}]}
+        self.assertEqual(self.client.post("/api/batch/", batch, format="json")["Content-Encoding"], "gzip")
+        batch["requests"].append({"method": "POST", "path": "/api/auth/token/", "body": self.credentials})
+        self.assertFalse(self.client.post("/api/batch/", batch, format="json").has_header("Content-Encoding"))
+
+    def test_renderer_matches_drf(self):
+        data = {
+            "amount": Decimal("1234.50"),
+            "rate": [Decimal("0.1"), Decimal("1E+2")],
+            "created_at": timezone.make_aware(datetime(2024, 5, 1, 9, 30, 15, 123456)),
+            "naive": datetime(2024, 5, 1, 9, 30),
+            "date": date(2024, 5, 1),
+            "time": time(9, 30, 15, 500),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "text": "урок\u2028",
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class ProfilerTests(TestCase):
+    """?_profile= для staff: только при включённом PROFILER_ENABLED."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", role=Role.ADMIN, is_staff=True)
+        cls.teacher = User.objects.create(username="teacher", role=Role.TEACHER)
+
+    def client_for(self, user):
+        # JWT в заголовке: middleware профилировщика проверяет его сам
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {add_user_claims(AccessToken.for_user(user), user)}")
+        return client
+
+    def test_disabled_by_default(self):
+        response = self.client_for(self.admin).get("/api/courses/?_profile=json")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("functions", response.json())
+
+    @override_settings(PROFILER_ENABLED=True)
+    def test_profile_staff_only(self):
+        report = self.client_for(self.admin).get("/api/courses/?_profile=json").json()
+        self.assertEqual((report["path"], report["status"]), ("/api/courses/", 200))
+        self.assertTrue(report["queries"] and report["functions"])
+        self.assertIn("== SQL ==", self.client_for(self.admin).get("/api/courses/?_profile=1").content.decode())
+        self.assertNotIn("functions", self.client_for(self.teacher).get("/api/courses/?_profile=json").json())
+
+
+@override_settings(SLOW_LOG={"REQUEST_MS": 0, "QUERY_MS": 0, "SAMPLE_RATE": 1, "REPEAT_THRESHOLD": 3})
+class SlowLogTests(TestCase):
+    """Журнал медленных запросов: пороги, повторы SQL и место вызова в коде проекта."""
+
+    def test_slow_request_query_and_repeats(self):
+        def view(request):
+            for size in (1, 2, 3):
+                list(User.objects.filter(pk__in=range(size)))  # один SQL с разным числом параметров в IN
+            return HttpResponse()
+
+        with self.assertLogs("Education.slow", "WARNING") as logs:
+            SlowLogMiddleware(view)(RequestFactory().get("/"))
+        messages = "\n".join(logs.output)
+        self.assertIn("slow request GET / (unmatched)", messages)
+        self.assertIn("slow query in unmatched at Education/tests.py:", messages)
+        self.assertRegex(messages, r"repeated query in unmatched at Education/tests.py:\d+ in view: 3 times")
+        self.assertEqual(fingerprint('"id" IN (%s, %s, %s)'), '"id" IN (...)')
+
+    @override_settings(SLOW_LOG={"REQUEST_MS": 10_000, "SAMPLE_RATE": 0})
+    def test_fast_unsampled_request_is_silent(self):
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertNoLogs("Education.slow"):
+            SlowLogMiddleware(view)(RequestFactory().get("/"))
+
+
+class SchemaTests(SimpleTestCase):
+    """manage.py build_schema и отдача готового файла на /api/schema/."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(OPENAPI_SCHEMA_DIR=directory.name, DEBUG=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        openapi._loaded.clear()
+        self.addCleanup(openapi._loaded.clear)
+
+    def test_build_and_serve(self):
+        call_command("build_schema", stdout=io.StringIO())
+        with open(openapi.schema_path("json"), "rb") as fh:
+            content = fh.read()
+        schema = json.loads(content)
+        self.assertIn("/api/lessons/", schema["paths"])
+        self.assertIn("/api/batch/", schema["paths"])
+        # наши подклассы simplejwt описаны как исходные (расширения в openapi.py)
+        self.assertEqual(schema["components"]["securitySchemes"]["jwtAuth"]["scheme"], "bearer")
+        self.assertEqual(schema["paths"]["/api/lessons/"]["get"]["security"], [{"jwtAuth": []}])
+        token_schema = schema["components"]["schemas"]["ClaimsTokenObtainPair"]["properties"]
+        self.assertEqual(set(token_schema), {"username", "password", "access", "refresh"})
+        self.assertTrue(os.path.getsize(openapi.schema_path("yaml")))
+
+        response = self.client.get("/api/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json")
+        self.assertEqual(response.content, content)
+        self.assertIn("max-age", response["Cache-Control"])
+        response = self.client.get("/api/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json",
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+# Запускается в отдельном процессе: INSTALLED_APPS и urlconf API-профиля нельзя подменить в текущем
+API_PROFILE_SCRIPT = """
+import json, sys
+import django
+django.setup()
+from django.apps import apps
+from django.conf import settings
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import Resolver404, resolve
+
+setup_test_environment()
+response = Client().get("/api/lessons/")  # без токена: 401 без обращения к БД
+try:
+    resolve("/admin/")
+    admin_url = True
+except Resolver404:
+    admin_url = False
+print(json.dumps({
+    "apps": [app for app in ("django.contrib.admin", "django.contrib.sessions", "drf_spectacular")
+             if apps.is_installed(app)],
+    "modules": [name for name in ("jazzmin", "drf_spectacular.views") if name in sys.modules],
+    "admin_url": admin_url,
+    "middleware": [name for name in settings.MIDDLEWARE if "session" in name.lower() or "csrf" in name.lower()],
+    "response": [response.status_code, response["Content-Type"]],
+}))
+"""
+
+
+class ApiProfileTests(SimpleTestCase):
+    """Воркер с DJANGO_SETTINGS_MODULE=base.settings_api: API без админки, сессий и drf-spectacular."""
+
+    def test_api_profile_starts_and_serves(self):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "base.settings_api"}
+        result = subprocess.run([sys.executable, "-c", API_PROFILE_SCRIPT], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), {
+            "apps": [],
+            "modules": [],
+            "admin_url": False,
+            "middleware": [],
+            "response": [401, "application/json"],
+        })
+
+
+class DeployTests(TestCase):
+    """gunicorn.conf.py и manage.py prestart (запуск контейнера)."""
+
+    def load_gunicorn_conf(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, "gunicorn.conf.py"))
+
+    def test_gunicorn_conf(self):
+        conf = self.load_gunicorn_conf(GUNICORN_WORKERS="3")
+        self.assertEqual((conf["worker_class"], conf["threads"], conf["workers"]), ("gthread", 4, 3))
+        self.assertEqual(conf["wsgi_app"], "base.wsgi:application")
+        self.assertTrue(conf["preload_app"])
+        self.assertLess(conf["max_requests_jitter"], conf["max_requests"])
+
+        conf = self.load_gunicorn_conf(GUNICORN_WORKER_CLASS="uvicorn")
+        self.assertEqual((conf["worker_class"], conf["threads"]), ("uvicorn.workers.UvicornWorker", 1))
+        self.assertEqual(conf["wsgi_app"], "base.asgi:application")
+
+        # после загрузки в мастере: соединения закрыты, объекты заморожены для copy-on-write
+        gc = mock.Mock()
+        with mock.patch.dict(conf["when_ready"].__globals__, gc=gc), \
+                mock.patch("django.db.connections.close_all") as close_all:
+            conf["when_ready"](server=None)
+        close_all.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+
+    def test_prestart_skips_unchanged(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        with override_settings(STATIC_ROOT=static_root.name):
+            first, second = io.StringIO(), io.StringIO()
+            call_command("prestart", stdout=first)
+            call_command("prestart", stdout=second)
+        self.assertIn("migrate: все миграции применены", first.getvalue())
+        self.assertIn("collectstatic: готово", first.getvalue())
+        self.assertIn("collectstatic: статика не менялась", second.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(static_root.name, "admin", "css", "base.css")))
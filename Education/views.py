@@ -1,11 +1,31 @@
 from django.shortcuts import render
-from Education.models import Group, Course, Lesson, Attendance, Role, User
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
+from Education.models import Group, Course, Lesson, Attendance, Role, User, AttendanceMonthly, RevenueMonthly
 from django.contrib.auth import get_user_model
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated, BasePermission
-from rest_framework.exceptions import PermissionDenied, ValidationError
-from .serializers import UserSerializer, CourseSerializer, GroupSerializer, LessonSerializer, AttendanceSerializer
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, BasePermission, AllowAny
+from rest_framework.exceptions import PermissionDenied, ValidationError, NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from .serializers import (
+    UserSerializer, CourseSerializer, GroupSerializer, LessonSerializer, AttendanceSerializer,
+    GroupEnrollmentSerializer, GroupTransferSerializer,
+)
+from .matrix import build_attendance_matrix
 from .permissions import GroupPermission
+from .renderers import ICalendarRenderer
+from .scope import get_scope
+from .sparse import SparseFieldsMixin
+from . import archive, enrollment, metrics, rollups, schedule
 
 User = get_user_model()
 
@@ -20,30 +40,40 @@ class IsAdminUserRole(BasePermission):
             u and (u.is_superuser or u.is_staff or getattr(u, "role", None) == Role.ADMIN)
         )
 
+# -----------------------
+# Параметры запроса
+# -----------------------
+def get_date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValidationError({name: "Ожидается дата в формате YYYY-MM-DD."})
+    return parsed
+
 # -----------------------
 # Пользователи
 # -----------------------
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    search_documents = {"pk": "user"}
     queryset = User.objects.all().order_by("id")
 
     def get_queryset(self):
         user = self.request.user
+        scope = get_scope(self.request)
 
         if user.role == Role.ADMIN:
             return User.objects.all()
 
         elif user.role == Role.TEACHER:
-            return User.objects.filter(
-                role=Role.STUDENT,
-                student_groups__course__teacher=user
-            ).distinct()
+            return scope.students(User.objects.filter(role=Role.STUDENT))
 
         elif user.role == Role.STUDENT:
-            return User.objects.filter(
-                student_groups__in=user.student_groups.all()
-            ).distinct()
+            # одногруппники (включая самого студента)
+            return scope.students(User.objects.all())
 
         return User.objects.none()
 
@@ -67,18 +97,14 @@ class UserViewSet(viewsets.ModelViewSet):
 # -----------------------
 # Группы
 # -----------------------
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = GroupSerializer
     permission_classes = [GroupPermission]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == Role.ADMIN:
+        if self.request.user.role == Role.ADMIN:
             return Group.objects.all()
-        elif user.role == Role.TEACHER:
-            return Group.objects.filter(course__teacher=user)
-        else:  # student
-            return Group.objects.filter(students=user)
+        return get_scope(self.request).groups(Group.objects.all())
 
     def perform_create(self, serializer):
         students = serializer.validated_data.get('students') or []
@@ -98,13 +124,57 @@ class GroupViewSet(viewsets.ModelViewSet):
             )
         serializer.save()
 
+    def perform_destroy(self, instance):
+        # уроки, посещаемость и платежи — пачками, без каскада Django (archive.py)
+        archive.fast_delete_groups([instance.pk])
+
+    @extend_schema(request=GroupEnrollmentSerializer, responses=OpenApiTypes.OBJECT)
+    @action(detail=True, methods=["post"], permission_classes=[IsAdminUserRole])
+    def enroll(self, request, pk=None):
+        """Зачислить (students) и отчислить (remove) студентов одной транзакцией."""
+        serializer = GroupEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = enrollment.enroll(self.get_object(), serializer.validated_data["students"], serializer.validated_data["remove"])
+        if result["invalid"]:
+            raise ValidationError({"students": f"Эти пользователи не студенты или не существуют: {result['invalid']}"})
+        return Response(result)
+
+    @extend_schema(request=GroupTransferSerializer, responses=OpenApiTypes.OBJECT)
+    @action(detail=True, methods=["post"], permission_classes=[IsAdminUserRole])
+    def transfer(self, request, pk=None):
+        """Перевести студентов из этой группы в группу to."""
+        serializer = GroupTransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        source, target = self.get_object(), serializer.validated_data["to"]
+        if source.pk == target.pk:
+            raise ValidationError({"to": "Студенты уже в этой группе."})
+        result = enrollment.transfer(source, target, serializer.validated_data["students"])
+        if result["not_members"]:
+            raise ValidationError({"students": f"Эти студенты не состоят в группе: {result['not_members']}"})
+        return Response(result)
+
+    @extend_schema(
+        parameters=[OpenApiParameter("start", OpenApiTypes.DATE), OpenApiParameter("end", OpenApiTypes.DATE)],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(detail=True, methods=["get"], url_path="attendance-matrix")
+    def attendance_matrix(self, request, pk=None):
+        """Посещаемость группы сеткой: строка статусов на студента, символ на урок (?start=&end=)."""
+        group = self.get_object()
+        start, end = get_date_param(request, "start"), get_date_param(request, "end")
+        # студент видит только свою строку
+        student_ids = [request.user.pk] if request.user.role == Role.STUDENT else None
+        data = build_attendance_matrix(group, start, end, student_ids)
+        return Response({"group": group.pk, "start": start, "end": end, **data})
+
 # -----------------------
 # Курсы
 # -----------------------
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated]
+    search_documents = {"pk": "course", "teacher": "user"}
 
     def get_queryset(self):
         user = self.request.user
@@ -113,7 +183,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         elif user.role == Role.TEACHER:
             return Course.objects.filter(teacher=user)
         elif user.role == Role.STUDENT:
-            return Course.objects.filter(groups__students=user).distinct()
+            return get_scope(self.request).courses(Course.objects.all())
         return Course.objects.none()
 
     def perform_create(self, serializer):
@@ -129,15 +199,16 @@ class CourseViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         if self.request.user.role != Role.ADMIN:
             raise PermissionDenied("Только администратор может удалять курсы.")
-        instance.delete()
+        archive.fast_delete_courses([instance.pk])
 
 # -----------------------
 # Уроки
 # -----------------------
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
+    search_documents = {"pk": "lesson"}
 
     def get_queryset(self):
         user = self.request.user
@@ -146,7 +217,7 @@ class LessonViewSet(viewsets.ModelViewSet):
         elif user.role == Role.TEACHER:
             return Lesson.objects.filter(teacher=user)
         elif user.role == Role.STUDENT:
-            return Lesson.objects.filter(group__students=user)
+            return get_scope(self.request).groups(Lesson.objects.all(), field="group_id")
         return Lesson.objects.none()
 
     def perform_create(self, serializer):
@@ -171,21 +242,19 @@ class LessonViewSet(viewsets.ModelViewSet):
 
     def perform_destroy(self, instance):
         user = self.request.user
-        if user.role == Role.ADMIN:
-            instance.delete()
-        elif user.role == Role.TEACHER:
-            if instance.teacher != user:
-                raise PermissionDenied("Вы можете удалять только свои уроки.")
-            instance.delete()
-        else:
+        if user.role == Role.TEACHER and instance.teacher_id != user.pk:
+            raise PermissionDenied("Вы можете удалять только свои уроки.")
+        if user.role not in [Role.TEACHER, Role.ADMIN]:
             raise PermissionDenied("У вас нет прав для удаления урока.")
+        archive.fast_delete_lessons([instance.pk])
 
 # -----------------------
 # Посещаемость
 # -----------------------
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
+    search_documents = {"student": "user", "lesson": "lesson"}
 
     def get_queryset(self):
         user = self.request.user
@@ -219,3 +288,154 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             if instance.lesson.teacher != self.request.user:
                 raise PermissionDenied("Вы можете удалять только посещаемость своих уроков.")
             instance.delete()
+
+# -----------------------
+# Расписание
+# -----------------------
+class TimetableView(APIView):
+    """
+    Расписание учителя/группы: JSON или .ics (суффикс .ics / Accept: text/calendar).
+    Необязательные ?start=YYYY-MM-DD&end=YYYY-MM-DD ограничивают период.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [ICalendarRenderer]
+    kind = None
+
+    def check_owner_access(self, user, pk):
+        if not schedule.can_view(user, self.kind, pk):
+            raise NotFound()
+
+    def _get_date_param(self, name):
+        return get_date_param(self.request, name)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request, pk, format=None):
+        self.check_owner_access(request.user, pk)
+        start, end = self._get_date_param("start"), self._get_date_param("end")
+
+        if request.accepted_renderer.format == ICalendarRenderer.format:
+            if start is None and end is None:
+                return Response(schedule.get_ics(self.kind, pk))
+            lessons = schedule.filter_by_dates(schedule.get_schedule(self.kind, pk), start, end)
+            return Response(schedule.build_ics(self.kind, pk, lessons))
+
+        lessons = schedule.filter_by_dates(schedule.get_schedule(self.kind, pk), start, end)
+        feed_url = reverse("timetable-feed", args=[schedule.make_feed_token(request.user.pk, self.kind, pk)])
+        return Response({
+            self.kind: pk,
+            "feed_url": request.build_absolute_uri(feed_url),
+            "lessons": lessons,
+        })
+
+
+class TeacherTimetableView(TimetableView):
+    kind = schedule.TEACHER
+
+    def check_owner_access(self, user, pk):
+        if not schedule.can_view(user, self.kind, pk):
+            raise PermissionDenied("Вы можете смотреть только своё расписание.")
+
+
+class GroupTimetableView(TimetableView):
+    kind = schedule.GROUP
+
+
+class TimetableFeedView(APIView):
+    """
+    Календарный фид по подписанной ссылке (без JWT — календарные клиенты
+    не умеют передавать заголовки). Ссылка проверяется и отдаётся из кэша
+    без запросов к БД (см. schedule.read_feed_token).
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [ICalendarRenderer]
+    FEED_MAX_AGE = 15 * 60
+
+    @extend_schema(responses={(200, "text/calendar"): OpenApiTypes.STR})
+    def get(self, request, token):
+        owner = schedule.read_feed_token(token)
+        if owner is None:
+            raise NotFound()
+        response = Response(schedule.get_ics(*owner))
+        patch_cache_control(response, private=True, max_age=self.FEED_MAX_AGE)
+        return response
+
+
+class TimetableFeedRevokeView(APIView):
+    """Отзывает все ссылки на фиды, выданные текущему пользователю (например, если ссылка утекла)."""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        schedule.revoke_feed_tokens([request.user.pk])
+        return Response(status=204)
+
+# -----------------------
+# Отчёты (месячные сводки)
+# -----------------------
+class ReportView(APIView):
+    """
+    Месячный отчёт из сводок rollups.py: ?start/?end=YYYY-MM-DD (месяцы
+    включительно) и ?by=group|course|teacher — разбивка внутри месяца.
+    Администратор видит всё, учитель — свои группы, студенту отчёты недоступны.
+    """
+    permission_classes = [IsAuthenticated]
+    model = None
+    dimensions = ()
+    report = None  # staticmethod: (queryset, by) -> строки отчёта
+
+    def build(self, queryset, by):
+        return self.report(queryset, by)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("start", OpenApiTypes.DATE),
+            OpenApiParameter("end", OpenApiTypes.DATE),
+            OpenApiParameter("by", OpenApiTypes.STR, enum=["group", "course", "teacher"]),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def get(self, request, format=None):
+        scope = get_scope(request)
+        if not scope.unrestricted and scope.role != Role.TEACHER:
+            raise PermissionDenied("Отчёты доступны только администраторам и учителям.")
+        by = request.query_params.get("by") or None
+        if by is not None and by not in self.dimensions:
+            raise ValidationError({"by": f"Допустимые значения: {', '.join(self.dimensions)}."})
+
+        queryset = scope.groups(self.model.objects.all(), field="group_id")
+        start, end = get_date_param(request, "start"), get_date_param(request, "end")
+        if start is not None:
+            queryset = queryset.filter(month__gte=rollups.month_of(start))
+        if end is not None:
+            queryset = queryset.filter(month__lte=end)
+        return Response({"by": by, "rows": self.build(queryset, by)})
+
+
+class AttendanceReportView(ReportView):
+    model = AttendanceMonthly
+    dimensions = tuple(rollups.ATTENDANCE_DIMENSIONS)
+    report = staticmethod(rollups.attendance_report)
+
+
+class RevenueReportView(ReportView):
+    model = RevenueMonthly
+    dimensions = tuple(rollups.REVENUE_DIMENSIONS)
+    report = staticmethod(rollups.revenue_report)
+
+# -----------------------
+# Метрики
+# -----------------------
+def metrics_view(request):
+    """
+    Метрики в формате Prometheus. Доступ: staff/superuser (сессия админки)
+    или заголовок Authorization: Bearer <METRICS_TOKEN> для сборщика.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    header = request.headers.get("Authorization", "")
+    has_token = bool(token) and constant_time_compare(header, f"Bearer {token}")
+    user = getattr(request, "user", None)  # в API-профиле сессий нет — только токен
+    is_staff = user is not None and user.is_authenticated and (user.is_staff or user.is_superuser)
+    if not (has_token or is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -44,12 +44,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Education.metrics.MetricsMiddleware',
+    'Education.slowlog.SlowLogMiddleware',
+    'Education.db_router.ReplicaMiddleware',
+    'Education.compression.JSONGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Education.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -93,9 +98,123 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "educational_password"),
         "HOST": os.environ.get("POSTGRES_HOST", "db"),
         "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # воркер держит соединение POSTGRES_CONN_MAX_AGE секунд (0 — новое на каждый запрос)
+        # и перед повторным использованием проверяет, что оно живо
+        "CONN_MAX_AGE": int(os.environ.get("POSTGRES_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.environ.get("POSTGRES_CONN_HEALTH_CHECKS", "True") == "True",
     }
 }
 
+# Пул соединений psycopg 3 (POSTGRES_POOL_MAX_SIZE > 0). Нужен пакет psycopg[pool]
+# вместо psycopg2; пул сам переиспользует соединения, поэтому CONN_MAX_AGE = 0.
+if int(os.environ.get("POSTGRES_POOL_MAX_SIZE", "0")):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ["POSTGRES_POOL_MAX_SIZE"]),
+            "timeout": int(os.environ.get("POSTGRES_POOL_TIMEOUT", "10")),
+        },
+    }
+
+# Реплики только для чтения: POSTGRES_REPLICA_HOSTS=replica1,replica2:5433
+# (остальные параметры — как у default). Безопасные запросы API и админки
+# читают с реплики, пока не запишут что-нибудь (см. Education/db_router.py).
+#
+# Локальная проверка на двух SQLite-файлах (реплика — копия db.sqlite3):
+# DATABASES = {
+#     "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db.sqlite3"},
+#     "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db.replica.sqlite3"},
+# }
+# DATABASE_REPLICAS = ["replica"]
+
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")), 1):
+    replica_host, _, replica_port = replica_host.strip().partition(":")
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+
+DATABASE_ROUTERS = ["Education.db_router.ReplicaRouter"]
+
+# Сколько секунд после записи клиент читает только с primary (задержка репликации)
+REPLICA_PIN_SECONDS = int(os.environ.get("DJANGO_REPLICA_PIN_SECONDS", "5"))
+
+
+# Cache
+# Кэш должен быть общим для всех gunicorn-воркеров и контейнеров web и api
+# (иначе сброс по сигналу виден только в одном процессе) — в проде задаётся
+# через окружение (общий том, см. docker-compose.prod.yml).
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "edora"),
+    }
+}
+
+# Расписание хранится в кэше до изменения уроков
+SCHEDULE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Область видимости пользователя (группы/курсы/студенты, scope.py); сбрасывается сигналами
+SCOPE_CACHE_TIMEOUT = 60 * 10
+
+# Индекс состава групп (membership.py): сколько секунд воркер доверяет локальной копии
+MEMBERSHIP_LOCAL_TTL = 5
+
+# /api/batch/: максимум подзапросов в одном вызове
+BATCH_MAX_REQUESTS = 20
+
+# KPI на главной странице админки (dashboard.py): сколько секунд показываются из кэша
+# и как часто (не чаще) пересчитываются после изменений групп, уроков и состава
+DASHBOARD_CACHE_TIMEOUT = 60
+DASHBOARD_REFRESH_INTERVAL = 5
+
+# Архив завершённых групп и быстрое удаление (archive.py)
+ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_BATCH_SIZE = 500
+FAST_DELETE_CHUNK_SIZE = 5_000
+
+
+# Metrics (/metrics)
+# Общая папка (том web и api), куда каждый gunicorn-воркер сбрасывает свои
+# метрики; без неё /metrics показывает только текущий процесс.
+
+METRICS_DIR = os.environ.get("DJANGO_METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get("DJANGO_METRICS_TOKEN", "")
+
+
+# Slow request / slow SQL log (логгер "Education.slow")
+
+SLOW_LOG = {
+    "REQUEST_MS": int(os.environ.get("DJANGO_SLOW_REQUEST_MS", "500")),
+    "QUERY_MS": int(os.environ.get("DJANGO_SLOW_QUERY_MS", "100")),
+    "SAMPLE_RATE": float(os.environ.get("DJANGO_SLOW_LOG_SAMPLE_RATE", "0.05")),
+    "REPEAT_THRESHOLD": 5,
+}
+
+# Профилирование запроса по ?_profile=1 (только staff/superuser).
+# По умолчанию выключено: включается на время разбора DJANGO_PROFILER_ENABLED=True
+
+PROFILER_ENABLED = os.environ.get("DJANGO_PROFILER_ENABLED", "False") == "True"
+PROFILER_DIR = os.environ.get("DJANGO_PROFILER_DIR") or None
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "Education.slow": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -202,26 +321,48 @@ SIMPLE_JWT = {
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    # роль и флаги staff/superuser в токене: API не загружает пользователя на каждый запрос
+    'TOKEN_OBTAIN_SERIALIZER': 'Education.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'Education.authentication.ClaimsTokenRefreshSerializer',
 }
 
+# сколько секунд воркер доверяет закэшированным is_active/роли пользователя (деактивация,
+# смена роли); изменения в этом же процессе сбрасывают кэш сразу
+JWT_USER_STATE_TTL = int(os.getenv("DJANGO_JWT_USER_STATE_TTL", "30"))
+
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "Education.authentication.StatelessJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
-        "rest_framework.filters.SearchFilter",
+        "Education.filters.IndexedSearchFilter",
         "rest_framework.filters.OrderingFilter",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "Education.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "Education.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
 }
 
+# Готовая OpenAPI-схема (manage.py build_schema); вне DEBUG /api/schema/ отдаёт её
+OPENAPI_SCHEMA_DIR = BASE_DIR / "openapi"
+
+# JSON-ответы API больше этого размера сжимаются gzip (Education.compression)
+API_GZIP_MIN_BYTES = 1024
+
 SPECTACULAR_SETTINGS = {    
     "TITLE": "Learning Center API",
     "DESCRIPTION": "CRUD API for Users, Courses, Groups, Lessons, Attendance",
@@ -0,0 +1,47 @@
+"""
+Профиль воркеров только для API: DJANGO_SETTINGS_MODULE=base.settings_api.
+
+Без админки, jazzmin, сессий, сообщений и документации (drf-spectacular) —
+воркер быстрее стартует и занимает меньше памяти. Админка, /api/docs/ и
+/api/schema/ остаются на обычных воркерах (base.settings), nginx делит
+трафик по пути. Замер: manage.py measure_startup.
+"""
+from .settings import *  # noqa: F401,F403
+
+API_EXCLUDED_APPS = {
+    "jazzmin",
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "drf_spectacular",
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_EXCLUDED_APPS]
+
+# JWT проверяется в DRF; сессии, CSRF, сообщения и X-Frame-Options нужны только HTML-страницам
+API_EXCLUDED_MIDDLEWARE = {
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+}
+MIDDLEWARE = [name for name in MIDDLEWARE if name not in API_EXCLUDED_MIDDLEWARE]
+
+ROOT_URLCONF = "base.urls_api"
+
+# только JSON (и .ics расписания): browsable API тянет шаблоны и статику
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ("Education.renderers.FastJSONRenderer",),
+    "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
+}
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {"context_processors": []},
+    },
+]
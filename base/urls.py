@@ -1,32 +1,20 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path
 from django.views.generic import RedirectView
-from rest_framework.routers import DefaultRouter
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from Education.views import UserViewSet,GroupViewSet,CourseViewSet,AttendanceViewSet,LessonViewSet
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework.routers import DefaultRouter
+from drf_spectacular.views import SpectacularSwaggerView
+from Education.openapi import PrecomputedSchemaView
+from base import urls_api
 
-router = DefaultRouter()
-router.register("users", UserViewSet, basename="user")
-router.register(r'groups', GroupViewSet, basename='group')
-router.register(r'courses', CourseViewSet, basename='course')
-router.register(r'attendances', AttendanceViewSet, basename='attendance')
-router.register(r'lessons', LessonViewSet,basename="lesson")
 urlpatterns = [
 
       # Документация (по желанию, но полезно)
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", PrecomputedSchemaView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
 
 
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='/admin/')),
 
-        # Наш API
-    path("api/", include(router.urls)),
-
-    # JWT (получение токена/обновление)
-    path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    # API, JWT, расписание и /metrics (см. base/urls_api.py)
+    *urls_api.urlpatterns,
 ]
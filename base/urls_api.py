@@ -0,0 +1,44 @@
+"""
+URL-ы API без админки и документации.
+
+Подключаются в base/urls.py, а в API-профиле (base/settings_api.py) служат
+корневым urlconf: такие воркеры не импортируют admin, jazzmin и drf-spectacular.
+"""
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from rest_framework.urlpatterns import format_suffix_patterns
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from Education.views import UserViewSet, GroupViewSet, CourseViewSet, AttendanceViewSet, LessonViewSet
+from Education.batch import BatchView
+from Education.views import TeacherTimetableView, GroupTimetableView, TimetableFeedView, TimetableFeedRevokeView, metrics_view
+from Education.views import AttendanceReportView, RevenueReportView
+
+router = DefaultRouter()
+router.register("users", UserViewSet, basename="user")
+router.register(r'groups', GroupViewSet, basename='group')
+router.register(r'courses', CourseViewSet, basename='course')
+router.register(r'attendances', AttendanceViewSet, basename='attendance')
+router.register(r'lessons', LessonViewSet,basename="lesson")
+
+# Расписание (JSON и .ics)
+timetable_urls = format_suffix_patterns([
+    path("teachers/<int:pk>/", TeacherTimetableView.as_view(), name="timetable-teacher"),
+    path("groups/<int:pk>/", GroupTimetableView.as_view(), name="timetable-group"),
+], allowed=["json", "ics"])
+
+urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
+
+        # Наш API
+    path("api/", include(router.urls)),
+    path("api/timetable/", include(timetable_urls)),
+    path("api/timetable/feed/<str:token>.ics", TimetableFeedView.as_view(), name="timetable-feed"),
+    path("api/timetable/feed/revoke/", TimetableFeedRevokeView.as_view(), name="timetable-feed-revoke"),
+    path("api/batch/", BatchView.as_view(), name="batch"),
+    path("api/reports/attendance/", AttendanceReportView.as_view(), name="report-attendance"),
+    path("api/reports/revenue/", RevenueReportView.as_view(), name="report-revenue"),
+
+    # JWT (получение токена/обновление)
+    path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+]
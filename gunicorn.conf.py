@@ -0,0 +1,71 @@
+"""
+Конфигурация gunicorn (подхватывается автоматически из рабочей папки: `gunicorn`).
+
+GUNICORN_WORKER_CLASS:
+- gthread (по умолчанию) — процессы с потоками: пока один поток ждёт PostgreSQL,
+  другие обслуживают запросы;
+- sync — один запрос на процесс (как было раньше);
+- uvicorn — ASGI (base.asgi). Все view и middleware проекта синхронные, а ASGI-
+  обработчик Django вызывает их через sync_to_async(thread_sensitive=True): в
+  каждом воркере запросы выполняются по одному в общем потоке, так что воркер
+  обслуживает столько же запросов одновременно, сколько sync, плюс накладные
+  расходы цикла событий. Имеет смысл только для асинхронных view.
+
+Приложение загружается в мастере до fork (preload_app), после чего объекты
+«замораживаются» (gc.freeze), чтобы сборщик мусора в воркерах не трогал их
+страницы памяти и они оставались общими (copy-on-write). Воркеры плавно
+перезапускаются после max_requests запросов (со случайным разбросом).
+"""
+import gc
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn.workers.UvicornWorker",
+}
+
+worker_model = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+worker_class = WORKER_CLASSES[worker_model]
+wsgi_app = "base.asgi:application" if worker_model == "uvicorn" else "base.wsgi:application"
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "4")) if worker_model == "gthread" else 1
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+# тайм-ауты: зависший воркер убивается, при перезапуске запросы дорабатываются
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# плавный перезапуск воркеров (утечки памяти); разброс — чтобы не все сразу
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# heartbeat воркеров — в памяти, а не на overlay-диске контейнера
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # соединения, открытые при загрузке приложения, не должны достаться воркерам
+    from django.db import connections
+
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # метрики завершившегося воркера — в общий aggregate.json (Education/metrics.py)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "base.settings")
+    from Education.metrics import fold_worker
+
+    fold_worker(worker.pid)